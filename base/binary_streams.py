@@ -0,0 +1,105 @@
+"""Module contains helpers for binary files made of a header and aligned arrays.
+
+Arrays of unknown length are written by chunks into temporary files next to
+the output file and joined after the header once all of them are finished,
+so writing never keeps whole arrays in memory. All numbers are little-endian
+and every array starts at an offset aligned to 8 bytes, so readers can map
+arrays with `numpy.memmap` directly.
+"""
+import os
+import shutil
+import sys
+from array import array
+from typing import List
+
+# Number of values buffered by writers and read at once by readers
+CHUNK_SIZE = 1 << 16
+
+
+def aligned(offset: int) -> int:
+    """Align the offset to 8 bytes.
+
+    Args:
+        offset (int): Offset in the file.
+
+    Returns:
+        int: The nearest aligned offset, which isn't lower.
+    """
+    return (offset + 7) & ~7
+
+
+class StreamWriter:
+    """Chunked writer of one array into a temporary file.
+
+    Attributes:
+        path (str): Path to the temporary file.
+        count (int): Number of written values.
+        itemsize (int): Size of one value in bytes.
+    """
+
+    def __init__(self, path: str, typecode: str):
+        self.path = path
+        self.count = 0
+        self._file = open(path, "wb")
+        self._buffer = array(typecode)
+        self.itemsize = self._buffer.itemsize
+
+    def append(self, value: int) -> None:
+        """Append one value.
+
+        Args:
+            value (int): Appended value.
+        """
+        buffer = self._buffer
+        buffer.append(value)
+        if len(buffer) >= CHUNK_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write buffered values to the file."""
+        buffer = self._buffer
+        if sys.byteorder == "big":
+            buffer.byteswap()
+        buffer.tofile(self._file)
+        self.count += len(buffer)
+        del buffer[:]
+
+    def close(self) -> None:
+        """Flush buffered values and close the file."""
+        self.flush()
+        self._file.close()
+
+
+def join_streams(path: str, header: bytes, streams: List[StreamWriter]) -> None:
+    """Write the header and all closed streams to the file and remove their files.
+
+    Args:
+        path (str): Path to the output file.
+        header (bytes): Header, its length should be aligned to 8 bytes.
+        streams (List[StreamWriter]): Closed streams in the order of the file.
+    """
+    with open(path, "wb") as file:
+        file.write(header)
+        for stream in streams:
+            file.write(b"\0" * (aligned(file.tell()) - file.tell()))
+            with open(stream.path, "rb") as stream_file:
+                shutil.copyfileobj(stream_file, file)
+            os.remove(stream.path)
+
+
+def array_offsets(start: int, sizes: List[int]) -> List[int]:
+    """Compute offsets of arrays written by `join_streams`.
+
+    Args:
+        start (int): Size of the header.
+        sizes (List[int]): Sizes of all arrays in bytes.
+
+    Returns:
+        List[int]: Offset of every array.
+    """
+    offsets = []
+    offset = aligned(start)
+    for size in sizes:
+        offsets.append(offset)
+        offset = aligned(offset + size)
+    return offsets
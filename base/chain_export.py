@@ -0,0 +1,249 @@
+"""Module contains streaming binary export of final blockchains.
+
+Blocks are stored as runs of consecutive blocks of the same miner and type
+(run-length encoding), so the file is much smaller than the list of blocks
+and it is written block by block without building any intermediate objects.
+Blocks can have children with their own miners, weak headers of Strongchain
+blocks or fruits of Fruitchain blocks, which are stored as the number of children
+of every block and runs of miners of all children in the order of blocks.
+
+The file starts with a header followed by arrays (see `base.binary_streams`):
+
++ `run_miners` (int32), `run_weak` (uint8), `run_lengths` (uint32) -- runs of blocks
++ `child_counts` (uint32) -- number of children of every block (empty without children)
++ `child_run_miners` (int32), `child_run_lengths` (uint32) -- runs of children
+
+`ChainArchive` maps arrays with `numpy.memmap`, so archived chains of long runs
+are analysed without loading them into memory.
+"""
+import struct
+from typing import Any, Callable, Dict, Iterable, Optional, Sequence
+
+from base.binary_streams import StreamWriter, array_offsets, join_streams
+
+# Magic bytes and version of chain files
+CHAIN_MAGIC = b"SMCHAIN1"
+
+# Header: magic, protocol, number of blocks, runs of blocks, children and runs
+# of children, flag of stored children (72 bytes, so arrays are aligned)
+_HEADER = struct.Struct("<8s24sQQQQ?7x")
+
+# Names, type codes of writers and NumPy types of arrays in the order of the file
+ARRAYS = (
+    ("run_miners", "i", "<i4"),
+    ("run_weak", "B", "u1"),
+    ("run_lengths", "I", "<u4"),
+    ("child_counts", "I", "<u4"),
+    ("child_run_miners", "i", "<i4"),
+    ("child_run_lengths", "I", "<u4"),
+)
+
+
+class _RunLengthEncoder:
+    """Streaming encoder of runs of miners (and types) of blocks."""
+
+    def __init__(
+        self,
+        miners: StreamWriter,
+        lengths: StreamWriter,
+        weak: Optional[StreamWriter] = None,
+    ):
+        self._miners = miners
+        self._lengths = lengths
+        self._weak = weak
+        self._current = None
+        self._length = 0
+
+    def add(self, miner_id: int, is_weak: bool = False) -> None:
+        """Add the next block of the chain.
+
+        Args:
+            miner_id (int): ID of the miner of the block.
+            is_weak (bool, optional): The block is weak. Defaults to False.
+        """
+        key = (miner_id, is_weak)
+        if key != self._current:
+            self.finish()
+            self._current = key
+        self._length += 1
+
+    def finish(self) -> None:
+        """Write the current run, it has to be called after the last block."""
+        if not self._length:
+            return
+        self._miners.append(self._current[0])
+        if self._weak is not None:
+            self._weak.append(self._current[1])
+        self._lengths.append(self._length)
+        self._length = 0
+
+
+def export_chain(
+    path: str,
+    protocol: str,
+    chain: Iterable[Any],
+    children: Optional[Callable[[Any], Sequence[int]]] = None,
+) -> None:
+    """Write the blockchain to the binary file.
+
+    Args:
+        path (str): Path to the output file.
+        protocol (str): Name of the protocol, e.g. `strongchain`.
+        chain (Iterable[Any]): Blocks with `miner_id` and `is_weak` attributes.
+        children (Optional[Callable[[Any], Sequence[int]]], optional): Function
+            returning miner IDs of children of the block. Defaults to None.
+    """
+    streams = {
+        name: StreamWriter(f"{path}.{name}", typecode) for name, typecode, _ in ARRAYS
+    }
+    blocks = _RunLengthEncoder(
+        streams["run_miners"], streams["run_lengths"], streams["run_weak"]
+    )
+    child_blocks = _RunLengthEncoder(
+        streams["child_run_miners"], streams["child_run_lengths"]
+    )
+    add_child_count = streams["child_counts"].append
+
+    blocks_count = 0
+    children_count = 0
+    for block in chain:
+        blocks_count += 1
+        blocks.add(block.miner_id, bool(block.is_weak))
+        if children is not None:
+            miner_ids = children(block)
+            add_child_count(len(miner_ids))
+            children_count += len(miner_ids)
+            for miner_id in miner_ids:
+                child_blocks.add(miner_id)
+
+    blocks.finish()
+    child_blocks.finish()
+    for stream in streams.values():
+        stream.close()
+
+    header = _HEADER.pack(
+        CHAIN_MAGIC,
+        protocol.encode(),
+        blocks_count,
+        streams["run_lengths"].count,
+        children_count,
+        streams["child_run_lengths"].count,
+        children is not None,
+    )
+    join_streams(path, header, list(streams.values()))
+
+
+class ChainArchive:
+    # pylint: disable=too-many-instance-attributes
+    """Memory-mapped blockchain exported by `export_chain`.
+
+    Attributes:
+        path (str): Path to the file.
+        protocol (str): Name of the protocol.
+        blocks (int): Number of blocks.
+        runs (int): Number of runs of blocks.
+        children (int): Number of children of all blocks.
+        child_runs (int): Number of runs of children.
+        has_children (bool): Children of blocks are stored.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as file:
+            header = file.read(_HEADER.size)
+        if len(header) < _HEADER.size or not header.startswith(CHAIN_MAGIC):
+            raise ValueError(f"{path} is not an exported chain file")
+
+        (
+            _,
+            protocol,
+            self.blocks,
+            self.runs,
+            self.children,
+            self.child_runs,
+            self.has_children,
+        ) = _HEADER.unpack(header)
+        self.path = path
+        self.protocol = protocol.rstrip(b"\0").decode()
+
+        lengths = {
+            "run_miners": self.runs,
+            "run_weak": self.runs,
+            "run_lengths": self.runs,
+            "child_counts": self.blocks if self.has_children else 0,
+            "child_run_miners": self.child_runs,
+            "child_run_lengths": self.child_runs,
+        }
+        self._arrays = {}
+        offsets = array_offsets(
+            _HEADER.size,
+            [lengths[name] * struct.calcsize(typecode) for name, typecode, _ in ARRAYS],
+        )
+        for (name, _, dtype), offset in zip(ARRAYS, offsets):
+            self._arrays[name] = (dtype, offset, lengths[name])
+
+    def array(self, name: str) -> Any:
+        """Map the array into memory.
+
+        Args:
+            name (str): Name of the array, e.g. `run_miners`.
+
+        Returns:
+            numpy.ndarray: Read-only array (memory-mapped if it isn't empty).
+        """
+        # pylint: disable=import-outside-toplevel
+        import numpy as np
+
+        dtype, offset, length = self._arrays[name]
+        if not length:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(
+            self.path, dtype=dtype, mode="r", offset=offset, shape=(length,)
+        )
+
+    def miner_ids(self) -> Any:
+        """Expand runs to miner IDs of all blocks, which loads them into memory.
+
+        Returns:
+            numpy.ndarray: Miner ID of every block.
+        """
+        # pylint: disable=import-outside-toplevel
+        import numpy as np
+
+        return np.repeat(self.array("run_miners"), self.array("run_lengths"))
+
+    def block_counts(self, weak: Optional[bool] = None) -> Dict[int, int]:
+        """Count blocks of all miners from runs.
+
+        Args:
+            weak (Optional[bool], optional): Count only weak (True) or strong (False)
+                                             blocks, None counts all. Defaults to None.
+
+        Returns:
+            Dict[int, int]: Block counts keyed by miner IDs.
+        """
+        miners = self.array("run_miners")
+        lengths = self.array("run_lengths")
+        if weak is not None:
+            selected = self.array("run_weak") == weak
+            miners, lengths = miners[selected], lengths[selected]
+        return self._count_runs(miners, lengths)
+
+    def child_counts(self) -> Dict[int, int]:
+        """Count children of blocks (weak headers, fruits) of all miners from runs.
+
+        Returns:
+            Dict[int, int]: Children counts keyed by miner IDs.
+        """
+        return self._count_runs(
+            self.array("child_run_miners"), self.array("child_run_lengths")
+        )
+
+    @staticmethod
+    def _count_runs(miners: Any, lengths: Any) -> Dict[int, int]:
+        # pylint: disable=import-outside-toplevel
+        import numpy as np
+
+        if miners.size == 0:
+            return {}
+        counts = np.bincount(miners, weights=lengths)
+        return {int(miner_id): int(counts[miner_id]) for miner_id in np.unique(miners)}
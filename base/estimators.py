@@ -0,0 +1,313 @@
+"""Module contains estimators of revenue shares from replicated simulations.
+
+Replicas of configurations run with common random numbers (`--crn`) consume the
+same uniform numbers for leader choices and block type draws, so their results
+are positively correlated and the variance of their paired differences is much
+lower than the variance of differences of independent runs.
+
+Shares of one configuration are estimated with variance reduction:
+
++ control variate -- the share of rounds won by a miner (`winns`) is strongly correlated
+  with its final share and its expectation is known exactly from its mining power
++ antithetic pairs -- the second replica of every pair (`--antithetic`) uses mirrored
+  uniform numbers `1 - u`, so the replicas are negatively correlated and
+  the pairs are averaged before estimation
+"""
+import math
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Tuple
+
+from base.results import SimulationResult
+
+# Protocols, in which leaders of some blocks aren't chosen by mining power
+# (Fruitchain selects leaders in forks by fruit counts), so the expectation
+# of the control variate is not known
+NO_CONTROL_VARIATE = {"fruitchain"}
+
+
+@dataclass
+class PairedDifference:
+    """Dataclass with the estimate of the difference of shares of one miner.
+
+    Attributes:
+        config_index (int): Index of the compared simulation in the config.
+        miner_index (int): Position of the miner in the simulation (0 is the honest miner).
+        mean (float): Mean of the paired differences of shares against the baseline.
+        std_error (float): Standard error of the mean of paired differences.
+        independent_std_error (float): Standard error of the same difference, which
+            ignores the pairing, i.e. the error of independent runs.
+        replicas (int): Number of paired replicas.
+    """
+
+    config_index: int
+    miner_index: int
+    mean: float
+    std_error: float
+    independent_std_error: float
+    replicas: int
+
+
+@dataclass
+class ShareEstimate:
+    # pylint: disable=too-many-instance-attributes
+    """Dataclass with the estimate of the share of one miner in one configuration.
+
+    Attributes:
+        config_index (int): Index of the simulation in the config.
+        miner_index (int): Position of the miner in the simulation (0 is the honest miner).
+        mean (float): Variance-reduced estimate of the share in percents.
+        std_error (float): Standard error of the variance-reduced estimate.
+        plain_mean (float): Plain Monte Carlo mean of shares of all replicas.
+        plain_std_error (float): Standard error of the plain mean, which treats
+            all replicas as independent.
+        replicas (int): Number of replicas.
+        method (str): Applied variance reduction, e.g. `antithetic+control variate`.
+    """
+
+    config_index: int
+    miner_index: int
+    mean: float
+    std_error: float
+    plain_mean: float
+    plain_std_error: float
+    replicas: int
+    method: str
+
+
+def mean_and_std_error(values: Sequence[float]) -> Tuple[float, float]:
+    """Compute the sample mean and its standard error.
+
+    Args:
+        values (Sequence[float]): Samples, e.g. shares from replicas.
+
+    Returns:
+        Tuple[float, float]: Mean and its standard error (NaN for less than 2 samples).
+    """
+    count = len(values)
+    mean = sum(values) / count
+    if count < 2:
+        return mean, math.nan
+
+    variance = sum((value - mean) ** 2 for value in values) / (count - 1)
+    return mean, math.sqrt(variance / count)
+
+
+def pair_by_spawn_key(
+    baseline: Sequence[SimulationResult], other: Sequence[SimulationResult]
+) -> List[Tuple[SimulationResult, SimulationResult]]:
+    """Pair results with the same seed and spawn key, e.g. from two result files.
+
+    Args:
+        baseline (Sequence[SimulationResult]): Results of the baseline configuration.
+        other (Sequence[SimulationResult]): Results of the compared configuration.
+
+    Returns:
+        List[Tuple[SimulationResult, SimulationResult]]: Pairs of results.
+    """
+    by_key: Dict[Tuple, SimulationResult] = {
+        (result.seed, tuple(result.spawn_key), result.antithetic): result
+        for result in baseline
+    }
+    pairs = []
+    for result in other:
+        key = (result.seed, tuple(result.spawn_key), result.antithetic)
+        if key in by_key:
+            pairs.append((by_key[key], result))
+
+    return pairs
+
+
+def paired_differences(
+    pairs: Sequence[Tuple[SimulationResult, SimulationResult]], config_index: int = 1
+) -> List[PairedDifference]:
+    """Estimate differences of shares of all miners from paired replicas.
+
+    Miners are matched by their position, so the compared configurations should
+    have the same number of miners.
+
+    Args:
+        pairs (Sequence[Tuple[SimulationResult, SimulationResult]]): Replicas of
+            the baseline and of the compared configuration.
+        config_index (int, optional): Index of the compared configuration. Defaults to 1.
+
+    Returns:
+        List[PairedDifference]: One estimate per miner.
+    """
+    miners_count = min(
+        min(len(baseline.miners), len(other.miners)) for baseline, other in pairs
+    )
+
+    differences = []
+    for miner_index in range(miners_count):
+        baseline_shares = [baseline.miners[miner_index].share for baseline, _ in pairs]
+        other_shares = [other.miners[miner_index].share for _, other in pairs]
+        mean, std_error = mean_and_std_error(
+            [share - base for base, share in zip(baseline_shares, other_shares)]
+        )
+        baseline_error = mean_and_std_error(baseline_shares)[1]
+        other_error = mean_and_std_error(other_shares)[1]
+        differences.append(
+            PairedDifference(
+                config_index=config_index,
+                miner_index=miner_index,
+                mean=mean,
+                std_error=std_error,
+                independent_std_error=math.sqrt(baseline_error ** 2 + other_error ** 2),
+                replicas=len(pairs),
+            )
+        )
+
+    return differences
+
+
+def control_variate_estimate(
+    values: Sequence[float], controls: Sequence[float]
+) -> Tuple[float, float, bool]:
+    """Estimate mean of values with the control variate of zero expectation.
+
+    Optimal coefficient `beta = cov(value, control) / var(control)` is estimated
+    from the same samples, so the standard error has `n - 2` degrees of freedom.
+    With less than 3 samples or a constant control, the plain mean is returned.
+
+    Args:
+        values (Sequence[float]): Samples of the estimated value.
+        controls (Sequence[float]): Samples of the control variate with zero expectation.
+
+    Returns:
+        Tuple[float, float, bool]: Estimated mean, its standard error and whether
+            the control variate was applied.
+    """
+    count = len(values)
+    mean_value = sum(values) / count
+    mean_control = sum(controls) / count
+    control_variance = sum((control - mean_control) ** 2 for control in controls)
+    if count < 3 or control_variance == 0:
+        return (*mean_and_std_error(values), False)
+
+    covariance = sum(
+        (value - mean_value) * (control - mean_control)
+        for value, control in zip(values, controls)
+    )
+    beta = covariance / control_variance
+    mean = mean_value - beta * mean_control
+    residual_variance = sum(
+        (value - mean_value - beta * (control - mean_control)) ** 2
+        for value, control in zip(values, controls)
+    ) / (count - 2)
+    return mean, math.sqrt(residual_variance / count), True
+
+
+def estimate_shares(
+    results: Sequence[SimulationResult],
+    config_index: int = 0,
+    antithetic: bool = False,
+) -> List[ShareEstimate]:
+    """Estimate shares of all miners from replicas of one configuration.
+
+    Control variate of a miner is the difference of its share of won rounds and
+    its mining power, which has zero expectation.
+
+    Args:
+        results (Sequence[SimulationResult]): Replicas of the configuration,
+            antithetic replicas follow their twins.
+        config_index (int, optional): Index of the configuration. Defaults to 0.
+        antithetic (bool, optional): Results are antithetic pairs. Defaults to False.
+
+    Returns:
+        List[ShareEstimate]: One estimate per miner.
+    """
+    use_control = results[0].consensus_name.lower() not in NO_CONTROL_VARIATE
+    group = 2 if antithetic else 1
+
+    estimates = []
+    for miner_index, miner in enumerate(results[0].miners):
+        shares = [result.miners[miner_index].share for result in results]
+        controls = []
+        for result in results:
+            total_wins = sum(result_miner.wins for result_miner in result.miners)
+            wins_share = 100 * result.miners[miner_index].wins / total_wins
+            controls.append(wins_share - miner.mining_power)
+
+        # antithetic pairs are averaged, so the pairs are independent samples
+        values = [
+            sum(shares[index : index + group]) / group
+            for index in range(0, len(shares), group)
+        ]
+        controls = [
+            sum(controls[index : index + group]) / group
+            for index in range(0, len(controls), group)
+        ]
+        control_applied = False
+        if use_control:
+            mean, std_error, control_applied = control_variate_estimate(
+                values, controls
+            )
+        else:
+            mean, std_error = mean_and_std_error(values)
+        methods = (["antithetic"] if antithetic else []) + (
+            ["control variate"] if control_applied else []
+        )
+
+        plain_mean, plain_std_error = mean_and_std_error(shares)
+        estimates.append(
+            ShareEstimate(
+                config_index=config_index,
+                miner_index=miner_index,
+                mean=mean,
+                std_error=std_error,
+                plain_mean=plain_mean,
+                plain_std_error=plain_std_error,
+                replicas=len(results),
+                method="+".join(methods) or "plain",
+            )
+        )
+
+    return estimates
+
+
+def format_share_estimates(estimates: Sequence[ShareEstimate]) -> str:
+    """Format share estimates as a text table.
+
+    Args:
+        estimates (Sequence[ShareEstimate]): Estimated shares.
+
+    Returns:
+        str: Formatted table.
+    """
+    lines = [
+        "Estimated shares [%]",
+        f"{'sim':>4} {'miner':>6} {'mean':>10} {'std err':>10} {'plain mean':>11} "
+        f"{'plain err':>10} {'n':>5}  method",
+    ]
+    for estimate in estimates:
+        lines.append(
+            f"{estimate.config_index:>4} {estimate.miner_index:>6} "
+            f"{estimate.mean:>10.4f} {estimate.std_error:>10.4f} "
+            f"{estimate.plain_mean:>11.4f} {estimate.plain_std_error:>10.4f} "
+            f"{estimate.replicas:>5}  {estimate.method}"
+        )
+
+    return "\n".join(lines)
+
+
+def format_paired_differences(differences: Sequence[PairedDifference]) -> str:
+    """Format paired differences as a text table.
+
+    Args:
+        differences (Sequence[PairedDifference]): Estimated differences.
+
+    Returns:
+        str: Formatted table.
+    """
+    lines = [
+        "Paired differences of shares against simulation 0 [%]",
+        f"{'sim':>4} {'miner':>6} {'mean':>10} {'std err':>10} {'indep. err':>11} {'n':>5}",
+    ]
+    for difference in differences:
+        lines.append(
+            f"{difference.config_index:>4} {difference.miner_index:>6} "
+            f"{difference.mean:>10.4f} {difference.std_error:>10.4f} "
+            f"{difference.independent_std_error:>11.4f} {difference.replicas:>5}"
+        )
+
+    return "\n".join(lines)
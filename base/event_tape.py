@@ -0,0 +1,201 @@
+"""Module contains recording and replay of random events of a run on a binary tape.
+
+The tape keeps three streams of random events:
+
++ `leaders` -- index of the leader of every round in the list of miners
++ `block_types` -- uniform numbers of block type draws (weak/strong, fruit/block)
++ `tie_breaks` -- draws of the generator shared with miners (matches, forks, ...)
+
+Uniform numbers are stored exactly as 53-bit integers and `getrandbits` draws
+as they are, so a replayed run consumes the same values as the recorded one.
+Leader indexes don't depend on the protocol, so a tape recorded with one protocol can
+drive another one with the same miners for like-for-like comparison. Block type draws
+are replayed if the tape contains them, and tie-breaks only for the same protocol.
+Other draws come from the seeded generators of the run.
+
+The file starts with a header followed by streams (see `base.binary_streams`).
+Streams are written by chunks during recording and read through `numpy.memmap`
+during replay, so tapes of long runs never have to fit into memory.
+NumPy is imported only for replay.
+"""
+import random
+import struct
+from itertools import chain
+from typing import Any, Iterator
+
+from base.binary_streams import CHUNK_SIZE, StreamWriter, array_offsets, join_streams
+
+# Magic bytes and version of tape files
+TAPE_MAGIC = b"SMTAPE01"
+
+# Header: magic, protocol, number of miners, bytes of leader indexes,
+# lengths of leader, block type and tie-break streams (64 bytes, so streams are aligned)
+_HEADER = struct.Struct("<8s24sIIQQQ")
+
+# Uniform numbers of `random.Random` are multiples of 2^-53
+_UNIFORM_SCALE = 1 << 53
+_UNIFORM_STEP = 1.0 / _UNIFORM_SCALE
+
+STREAMS = ("leaders", "block_types", "tie_breaks")
+
+
+class RecordingRandom(random.Random):
+    """Random generator writing all draws of another generator to the tape stream.
+
+    It defines `getrandbits`, so `choice` and similar methods draw integers
+    the same way as `random.Random` and recorded runs don't change.
+    """
+
+    def __init__(self, source: random.Random, stream: StreamWriter):
+        super().__init__(0)
+        self._source = source
+        self._append = stream.append
+
+    def random(self) -> float:
+        value = self._source.random()
+        self._append(int(value * _UNIFORM_SCALE))
+        return value
+
+    def getrandbits(self, k: int) -> int:
+        value = self._source.getrandbits(k)
+        self._append(value)
+        return value
+
+
+class ReplayRandom(random.Random):
+    """Random generator returning draws read from the tape stream."""
+
+    def __init__(self, draws: Iterator[int], stream: str):
+        super().__init__(0)
+        self._draws = draws
+        self._stream = stream
+
+    def _next_draw(self) -> int:
+        value = next(self._draws, None)
+        if value is None:
+            raise ValueError(f"Event tape has no more {self._stream} draws")
+        return value
+
+    def random(self) -> float:
+        return self._next_draw() * _UNIFORM_STEP
+
+    def getrandbits(self, k: int) -> int:
+        value = self._next_draw()
+        if value >> k:
+            raise ValueError(
+                f"Event tape has {self._stream} draw {value}, which has more than {k} bits"
+            )
+        return value
+
+
+class EventTapeWriter:
+    """Writer of the event tape of one run.
+
+    Streams are written into temporary files next to the tape and joined by `close`.
+
+    Attributes:
+        path (str): Path to the tape.
+        protocol (str): Name of the recorded protocol.
+        miners (int): Number of miners.
+        leaders (StreamWriter): Stream of leader indexes.
+        block_types (StreamWriter): Stream of block type draws.
+        tie_breaks (StreamWriter): Stream of tie-break draws.
+    """
+
+    def __init__(self, path: str, protocol: str, miners: int):
+        self.path = path
+        self.protocol = protocol
+        self.miners = miners
+        self.leaders = StreamWriter(f"{path}.leaders", "B" if miners <= 256 else "H")
+        self.block_types = StreamWriter(f"{path}.block_types", "Q")
+        self.tie_breaks = StreamWriter(f"{path}.tie_breaks", "Q")
+
+    def close(self) -> None:
+        """Write the header and join all streams into the tape file."""
+        streams = [getattr(self, name) for name in STREAMS]
+        for stream in streams:
+            stream.close()
+
+        header = _HEADER.pack(
+            TAPE_MAGIC,
+            self.protocol.encode(),
+            self.miners,
+            self.leaders.itemsize,
+            *(stream.count for stream in streams),
+        )
+        join_streams(self.path, header, streams)
+
+
+class EventTape:
+    """Memory-mapped event tape for replay.
+
+    Attributes:
+        path (str): Path to the tape.
+        protocol (str): Name of the recorded protocol.
+        miners (int): Number of miners.
+        counts (Dict[str, int]): Number of values of every stream.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as file:
+            header = file.read(_HEADER.size)
+        if len(header) < _HEADER.size or not header.startswith(TAPE_MAGIC):
+            raise ValueError(f"{path} is not an event tape file")
+
+        _, protocol, self.miners, leader_bytes, *counts = _HEADER.unpack(header)
+        self.path = path
+        self.protocol = protocol.rstrip(b"\0").decode()
+        self.counts = dict(zip(STREAMS, counts))
+        self._dtypes = dict(
+            zip(STREAMS, ("<u1" if leader_bytes == 1 else "<u2", "<u8", "<u8"))
+        )
+        self._offsets = dict(
+            zip(
+                STREAMS,
+                array_offsets(
+                    _HEADER.size,
+                    [
+                        self.counts[name] * itemsize
+                        for name, itemsize in zip(STREAMS, (leader_bytes, 8, 8))
+                    ],
+                ),
+            )
+        )
+
+    def array(self, stream: str) -> Any:
+        """Map the stream into memory.
+
+        Args:
+            stream (str): Name of the stream.
+
+        Returns:
+            numpy.memmap: Read-only array of the stream.
+        """
+        # pylint: disable=import-outside-toplevel
+        import numpy as np
+
+        return np.memmap(
+            self.path,
+            dtype=self._dtypes[stream],
+            mode="r",
+            offset=self._offsets[stream],
+            shape=(self.counts[stream],),
+        )
+
+    def draws(self, stream: str) -> Iterator[int]:
+        """Iterate over values of the stream, which are read from the disk by chunks.
+
+        Args:
+            stream (str): Name of the stream.
+
+        Returns:
+            Iterator[int]: Values of the stream.
+        """
+        if not self.counts[stream]:
+            return iter(())
+
+        values = self.array(stream)
+        return chain.from_iterable(
+            values[start : start + CHUNK_SIZE].tolist()
+            for start in range(0, len(values), CHUNK_SIZE)
+        )
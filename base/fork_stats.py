@@ -0,0 +1,193 @@
+"""Module contains counters and histograms of forks, reorganizations and orphaned blocks.
+
+Statistics are maintained incrementally during the run:
+
++ reorganization depth -- number of public blocks replaced by every override
+  of the public blockchain with a private chain
++ replaced blocks -- public blocks of every miner replaced by overrides
++ orphaned blocks -- mined blocks of every miner, which are not in the final
+  blockchain, i.e. replaced or discarded with abandoned (adopted) private chains
++ forks and matches -- number of forks (periods with an ongoing fork) and number
+  of selfish miners matching the public chain when forks start
++ fork duration -- number of rounds of every finished fork
+
+Overrides and mined blocks are recorded by wrapping methods of the public blockchain
+and of blockchains of miners, so runs without statistics have no overhead.
+Histograms have a fixed number of buckets, the last one counts all larger values.
+"""
+from functools import wraps
+from typing import Any, Dict, Iterable, List
+
+from base.blockchain_base import BlockchainBase
+
+# Number of buckets of histograms
+HISTOGRAM_BUCKETS = 32
+
+
+class Histogram:
+    """Histogram of non-negative integers with fixed buckets.
+
+    Attributes:
+        counts (List[int]): Count of every value, the last bucket includes larger values.
+        total (int): Sum of all added values.
+    """
+
+    def __init__(self, buckets: int = HISTOGRAM_BUCKETS):
+        self.counts = [0] * buckets
+        self.total = 0
+
+    def add(self, value: int) -> None:
+        """Add one value.
+
+        Args:
+            value (int): Added value.
+        """
+        self.counts[min(value, len(self.counts) - 1)] += 1
+        self.total += value
+
+    def mean(self) -> float:
+        """Get mean of added values.
+
+        Returns:
+            float: Mean, 0 if there is no value.
+        """
+        count = sum(self.counts)
+        return self.total / count if count else 0.0
+
+
+class ForkStatistics:
+    # pylint: disable=too-many-instance-attributes
+    """Fork statistics of one simulation.
+
+    Attributes:
+        overrides (int): Number of overrides of the public blockchain.
+        reorg_depth (Histogram): Number of replaced public blocks per override.
+        mined (Dict[int, int]): Mined blocks keyed by miner IDs.
+        replaced (Dict[int, int]): Public blocks replaced by overrides keyed by miner IDs.
+        orphaned (Dict[int, int]): Mined blocks, which are not in the final blockchain,
+            keyed by miner IDs. They are counted by `finish`.
+        forks (int): Number of started forks.
+        matches (int): Number of selfish miners matching the public chain at fork starts.
+        fork_duration (Histogram): Rounds of finished forks.
+        fork_rounds (int): Number of rounds with an ongoing fork.
+    """
+
+    def __init__(self, miner_ids: Iterable[int]):
+        self.overrides = 0
+        self.reorg_depth = Histogram()
+        self.mined: Dict[int, int] = {miner_id: 0 for miner_id in miner_ids}
+        self.replaced: Dict[int, int] = {miner_id: 0 for miner_id in self.mined}
+        self.orphaned: Dict[int, int] = {miner_id: 0 for miner_id in self.mined}
+        self.forks = 0
+        self.matches = 0
+        self.fork_duration = Histogram()
+        self.fork_rounds = 0
+        self._current_fork = 0
+
+    def instrument(self, manager: Any) -> None:
+        """Record overrides of the public blockchain and all mined blocks.
+
+        Args:
+            manager (Any): Fully initialized simulation manager.
+        """
+        public_blockchain = manager.public_blockchain
+        override_chain = public_blockchain.override_chain
+
+        @wraps(override_chain)
+        def recorded_override(attacker):
+            chain = public_blockchain.chain
+            length = len(chain)
+            # the attacker overrides at most as many blocks as it publishes
+            tail = chain[-(len(attacker.blockchain.chain) + 2) :]
+            override_chain(attacker)
+            self.record_override(
+                tail,
+                length,
+                len(public_blockchain.chain) - len(attacker.blockchain.chain),
+            )
+
+        public_blockchain.override_chain = recorded_override
+
+        # blocks are created only by `add_block` of public and private blockchains
+        for owner in [manager] + list(manager.miners):
+            for blockchain in list(vars(owner).values()):
+                if isinstance(blockchain, BlockchainBase):
+                    self._instrument_blockchain(blockchain)
+
+    def _instrument_blockchain(self, blockchain: BlockchainBase) -> None:
+        add_block = blockchain.add_block
+
+        @wraps(add_block)
+        def recorded_add_block(*args, **kwargs):
+            miner_id = kwargs["miner_id"] if "miner_id" in kwargs else args[2]
+            self.mined[miner_id] += 1
+            add_block(*args, **kwargs)
+
+        blockchain.add_block = recorded_add_block
+
+    def record_override(self, tail: List[Any], length: int, index: int) -> None:
+        """Record one override of the public blockchain.
+
+        Args:
+            tail (List[Any]): Last blocks of the public blockchain before the override.
+            length (int): Length of the public blockchain before the override.
+            index (int): Position, from which blocks were replaced.
+        """
+        depth = max(length - index, 0)
+        self.overrides += 1
+        self.reorg_depth.add(depth)
+        for block in tail[max(len(tail) - depth, 0) :]:
+            self.replaced[block.miner_id] += 1
+
+    def record_round(self, ongoing_fork: bool, matches: int) -> None:
+        """Record the fork state after one round.
+
+        Args:
+            ongoing_fork (bool): There is an ongoing fork.
+            matches (int): Number of selfish miners matching the public chain.
+        """
+        if ongoing_fork:
+            if not self._current_fork:
+                self.forks += 1
+                self.matches += matches
+            self._current_fork += 1
+            self.fork_rounds += 1
+        elif self._current_fork:
+            self.fork_duration.add(self._current_fork)
+            self._current_fork = 0
+
+    def finish(self, chain: List[Any]) -> None:
+        """Count orphaned blocks of all miners.
+
+        Args:
+            chain (List[Any]): Final blockchain, in which blocks are counted for results.
+        """
+        final = {miner_id: 0 for miner_id in self.mined}
+        for block in chain:
+            final[block.miner_id] += 1
+        for miner_id, mined in self.mined.items():
+            self.orphaned[miner_id] = mined - final[miner_id]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert statistics to a dictionary for result records.
+
+        Returns:
+            Dict[str, Any]: Counters and bucket counts of histograms.
+        """
+        return {
+            "overrides": self.overrides,
+            "reorg_depth": self.reorg_depth.counts,
+            "mean_reorg_depth": self.reorg_depth.mean(),
+            "mined": {str(miner_id): count for miner_id, count in self.mined.items()},
+            "replaced": {
+                str(miner_id): count for miner_id, count in self.replaced.items()
+            },
+            "orphaned": {
+                str(miner_id): count for miner_id, count in self.orphaned.items()
+            },
+            "forks": self.forks,
+            "matches": self.matches,
+            "fork_duration": self.fork_duration.counts,
+            "mean_fork_duration": self.fork_duration.mean(),
+            "fork_rounds": self.fork_rounds,
+        }
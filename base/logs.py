@@ -1,18 +1,71 @@
 """Module logs for customized logger creation.
 
+Logging is configured once per process. Messages below the configured level are
+dropped before any formatting, and structlog is not even imported if nothing is logged.
+Per-round logging on the simulation hot path is guarded by the `ROUND_LOGGING`
+constant, which is resolved at import time from the `SMASF_ROUND_LOGGING`
+environment variable, so it costs just one branch if it is turned off:
+
+    if ROUND_LOGGING:
+        self.log.debug("Miner %s is leader of round %s", miner_id, mining_round)
+
 Author: Jan Jakub Kubik (xkubik32)
 Date: 12.3.2023
 """
 
 import logging
-from typing import Callable, Union
+import os
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Optional, Union
+
+if TYPE_CHECKING:
+    import structlog
+
+# Per-round logging is compiled in only if it is requested before the import
+ROUND_LOGGING: bool = os.environ.get("SMASF_ROUND_LOGGING", "0") == "1"
+
+LOG_LEVELS = {
+    "debug": logging.DEBUG,
+    "info": logging.INFO,
+    "warning": logging.WARNING,
+    "error": logging.ERROR,
+}
+
+
+@dataclass
+class _LoggingState:
+    """Logging configuration of the process.
+
+    Attributes:
+        level (int): Minimal level of logged messages.
+        structlog_configured (bool): Structlog is imported and configured.
+    """
+
+    level: int
+    structlog_configured: bool = False
+
 
-import structlog
+_STATE = _LoggingState(
+    LOG_LEVELS[
+        os.environ.get(
+            "SMASF_LOG_LEVEL", "debug" if ROUND_LOGGING else "warning"
+        ).lower()
+    ]
+)
+
+
+def set_log_level(level: Union[int, str]) -> None:
+    """Set the minimal level of logged messages for the whole process.
+
+    Args:
+        level (Union[int, str]): Logging level or its name, e.g. `info`.
+    """
+    _STATE.level = LOG_LEVELS[level.lower()] if isinstance(level, str) else level
 
 
 def _create(
     name: str, get_logger_func: Callable, logging_options=logging
-) -> Union[logging.Logger, structlog.BoundLogger]:
+) -> Union[logging.Logger, "structlog.BoundLogger"]:
     """Create a logger with the given name.
 
     Args:
@@ -29,10 +82,10 @@ def _create(
     return logger
 
 
-def create_logger(name: str) -> structlog.BoundLogger:
-    """Create a logger with the given name.
+def _create_structlog_logger(name: str) -> "structlog.BoundLogger":
+    """Create a structlog logger object with the given name.
 
-    Create a structlog logger object with the given name.
+    Structlog is imported and configured just once, when the first message is logged.
 
     Args:
         name (str): Name of the logger.
@@ -40,15 +93,83 @@ def create_logger(name: str) -> structlog.BoundLogger:
     Returns:
         structlog.BoundLogger: Structlog logger object with the given name.
     """
-    # Same as default processors, just without timestamps
-    structlog.configure(
-        processors=[
-            structlog.processors.StackInfoRenderer(),
-            structlog.processors.format_exc_info,
-            # structlog.processors.TimeStamper(fmt="%Y-%m-%d %H:%M:%S", utc=True),
-            structlog.dev.set_exc_info,
-            structlog.dev.ConsoleRenderer(colors=True),
-        ],
-        wrapper_class=structlog.BoundLogger,
-    )
+    # pylint: disable=import-outside-toplevel
+    import structlog
+
+    if not _STATE.structlog_configured:
+        # Same as default processors, just without timestamps.
+        # Levels are filtered by LazyLogger, so structlog logs everything it gets.
+        structlog.configure(
+            processors=[
+                structlog.processors.StackInfoRenderer(),
+                structlog.processors.format_exc_info,
+                # structlog.processors.TimeStamper(fmt="%Y-%m-%d %H:%M:%S", utc=True),
+                structlog.dev.set_exc_info,
+                structlog.dev.ConsoleRenderer(colors=True),
+            ],
+            wrapper_class=structlog.make_filtering_bound_logger(logging.DEBUG),
+            cache_logger_on_first_use=True,
+        )
+        _STATE.structlog_configured = True
+
     return _create(name, structlog.getLogger)
+
+
+class LazyLogger:
+    """Logger proxy, which creates the structlog logger on its first use.
+
+    Messages are checked against the process log level before they are passed
+    to structlog. Positional arguments are formatted into the message with `%`
+    only if the message is really logged.
+
+    Attributes:
+        name (str): Name of the logger.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._logger: Optional["structlog.BoundLogger"] = None
+
+    def _get_logger(self) -> "structlog.BoundLogger":
+        if self._logger is None:
+            self._logger = _create_structlog_logger(self.name)
+
+        return self._logger
+
+    def debug(self, event: Any, *args: Any, **kwargs: Any) -> None:
+        """Log a debug message."""
+        if logging.DEBUG >= _STATE.level:
+            self._get_logger().debug(event, *args, **kwargs)
+
+    def info(self, event: Any, *args: Any, **kwargs: Any) -> None:
+        """Log an info message."""
+        if logging.INFO >= _STATE.level:
+            self._get_logger().info(event, *args, **kwargs)
+
+    def warning(self, event: Any, *args: Any, **kwargs: Any) -> None:
+        """Log a warning message."""
+        if logging.WARNING >= _STATE.level:
+            self._get_logger().warning(event, *args, **kwargs)
+
+    def error(self, event: Any, *args: Any, **kwargs: Any) -> None:
+        """Log an error message."""
+        if logging.ERROR >= _STATE.level:
+            self._get_logger().error(event, *args, **kwargs)
+
+    def __getattr__(self, attribute: str) -> Any:
+        return getattr(self._get_logger(), attribute)
+
+
+def create_logger(name: str) -> LazyLogger:
+    """Create a logger with the given name.
+
+    Create a proxy of structlog logger object with the given name. Structlog is
+    imported and configured when the first message is logged.
+
+    Args:
+        name (str): Name of the logger.
+
+    Returns:
+        LazyLogger: Proxy of structlog logger object with the given name.
+    """
+    return LazyLogger(name)
@@ -4,10 +4,11 @@ and general properties and actions for them.
 Author: Jan Jakub Kubik (xkubik32)
 Date: 15.3.2023
 """
+import random
 from abc import ABC, abstractmethod
 from enum import Enum
 from itertools import count
-from typing import Any, List
+from typing import Any, List, Optional
 
 from base.logs import create_logger
 
@@ -43,15 +44,18 @@ class MinerStrategyBase(ABC):
         mining_power (float): The mining power of the miner.
         miner_id (int): The unique identifier of the miner.
         log (Any): Logger instance for logging events.
+        rng (random.Random): Random generator of the miner, usually shared
+                             with the simulation manager.
     """
 
     counter = count(start=1)
 
-    def __init__(self, mining_power: float):
+    def __init__(self, mining_power: float, rng: Optional[random.Random] = None):
         self.action = None
         self.mining_power = mining_power
         self.miner_id = next(self.counter)
         self.log = create_logger(str(self.miner_id))
+        self.rng = rng if rng is not None else random.Random()
 
     # pylint: disable=too-many-arguments
     @abstractmethod
@@ -101,8 +105,8 @@ class HonestMinerStrategyBase(MinerStrategyBase, ABC):
         miner_type (MinerType): The type of the miner.
     """
 
-    def __init__(self, mining_power: float):
-        super().__init__(mining_power)
+    def __init__(self, mining_power: float, rng: Optional[random.Random] = None):
+        super().__init__(mining_power, rng)
         self.miner_type = MinerType.HONEST
 
 
@@ -113,8 +117,8 @@ class SelfishMinerStrategyBase(MinerStrategyBase, ABC):
         miner_type (MinerType): The type of the miner.
     """
 
-    def __init__(self, mining_power: float):
-        super().__init__(mining_power)
+    def __init__(self, mining_power: float, rng: Optional[random.Random] = None):
+        super().__init__(mining_power, rng)
         self.miner_type = MinerType.SELFISH
 
     @abstractmethod
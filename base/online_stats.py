@@ -0,0 +1,256 @@
+"""Module contains online confidence intervals of shares within a single run.
+
+Shares are ratio estimates: blocks of a miner divided by all blocks. Their confidence
+intervals are computed from independent samples of block counts:
+
++ regenerative cycles -- rounds between two quiet states (no private chains and
+  no fork) are independent and identically distributed, so blocks added to
+  the public blockchain during every cycle are one sample
++ batch means -- protocols without clean regeneration points split the public
+  blockchain into equally long batches, which are approximately independent
+
+With the requested precision, the simulation stops as soon as the half-width of the
+confidence interval of every selfish miner's share is below it.
+"""
+import math
+from dataclasses import dataclass, field
+from statistics import NormalDist
+from typing import List, Optional, Sequence
+
+# Default confidence level of intervals
+CONFIDENCE = 0.95
+
+# Number of batches of batch means
+BATCHES = 30
+
+# Minimal number of cycles or batches, before the precision is checked
+MIN_SAMPLES = 30
+
+# Precision is checked after the first interval and then whenever
+# the number of rounds grows by the given factor, so checks of batch means,
+# which count the whole blockchain, take linear time in total
+FIRST_CHECK = 1_000
+CHECK_GROWTH = 1.1
+
+
+@dataclass
+class CycleStatistics:
+    # pylint: disable=too-many-instance-attributes
+    """Sufficient statistics of regenerative cycles or batches of one simulation.
+
+    For every cycle `Y` is the number of blocks of a miner and `Z` the number
+    of all blocks added to the public blockchain during the cycle.
+
+    Attributes:
+        miners (int): Number of miners.
+        cycles (int): Number of finished cycles.
+        rounds (int): Number of rounds in finished cycles.
+        block_sums (List[float]): Sum of `Y` per miner.
+        block_squares (List[float]): Sum of `Y^2` per miner.
+        block_cross (List[float]): Sum of `Y * Z` per miner.
+        total_sum (float): Sum of `Z`.
+        total_square (float): Sum of `Z^2`.
+    """
+
+    miners: int
+    cycles: int = 0
+    rounds: int = 0
+    block_sums: List[float] = field(default_factory=list)
+    block_squares: List[float] = field(default_factory=list)
+    block_cross: List[float] = field(default_factory=list)
+    total_sum: float = 0.0
+    total_square: float = 0.0
+
+    def __post_init__(self) -> None:
+        for values in (self.block_sums, self.block_squares, self.block_cross):
+            if not values:
+                values.extend([0.0] * self.miners)
+
+    @classmethod
+    def from_samples(cls, samples: Sequence[Sequence[float]]) -> "CycleStatistics":
+        """Create statistics of the given samples, e.g. batches.
+
+        Args:
+            samples (Sequence[Sequence[float]]): Blocks of every miner in every sample.
+
+        Returns:
+            CycleStatistics: Statistics of the samples.
+        """
+        statistics = cls(miners=len(samples[0]))
+        for blocks in samples:
+            statistics.add_cycle(blocks)
+        return statistics
+
+    def add_cycle(self, blocks: Sequence[float], rounds: int = 0) -> None:
+        """Add one finished cycle.
+
+        Args:
+            blocks (Sequence[float]): Blocks of every miner added during the cycle.
+            rounds (int, optional): Number of rounds of the cycle. Defaults to 0.
+        """
+        total = sum(blocks)
+        self.cycles += 1
+        self.rounds += rounds
+        self.total_sum += total
+        self.total_square += total * total
+        for index, count in enumerate(blocks):
+            self.block_sums[index] += count
+            self.block_squares[index] += count * count
+            self.block_cross[index] += count * total
+
+    def merge(self, other: "CycleStatistics") -> None:
+        """Add statistics of cycles from another run.
+
+        Args:
+            other (CycleStatistics): Statistics of another run of the same simulation.
+        """
+        self.cycles += other.cycles
+        self.rounds += other.rounds
+        self.total_sum += other.total_sum
+        self.total_square += other.total_square
+        for index in range(self.miners):
+            self.block_sums[index] += other.block_sums[index]
+            self.block_squares[index] += other.block_squares[index]
+            self.block_cross[index] += other.block_cross[index]
+
+    def share(self, miner_index: int) -> float:
+        """Get ratio estimate of the share of the miner in percents.
+
+        Args:
+            miner_index (int): Position of the miner (0 is the honest miner).
+
+        Returns:
+            float: Estimated share.
+        """
+        if self.total_sum == 0:
+            return math.nan
+        return 100 * self.block_sums[miner_index] / self.total_sum
+
+    def share_ci(self, miner_index: int, confidence: float = CONFIDENCE) -> float:
+        """Get half-width of the confidence interval of the share of the miner.
+
+        Variance of the ratio estimator is computed by the delta method
+        from the residuals `Y - R * Z` of all cycles.
+
+        Args:
+            miner_index (int): Position of the miner (0 is the honest miner).
+            confidence (float, optional): Confidence level. Defaults to 0.95.
+
+        Returns:
+            float: Half-width of the interval in percents (NaN for less than 2 cycles).
+        """
+        if self.cycles < 2 or self.total_sum == 0:
+            return math.nan
+
+        ratio = self.block_sums[miner_index] / self.total_sum
+        residual_squares = (
+            self.block_squares[miner_index]
+            - 2 * ratio * self.block_cross[miner_index]
+            + ratio * ratio * self.total_square
+        )
+        variance = max(residual_squares, 0.0) / (self.cycles - 1)
+        mean_total = self.total_sum / self.cycles
+        std_error = math.sqrt(variance / self.cycles) / mean_total
+        quantile = NormalDist().inv_cdf(0.5 + confidence / 2)
+        return 100 * quantile * std_error
+
+
+def split_batches(chain: Sequence, batches: int = BATCHES) -> List[Sequence]:
+    """Split the blockchain into equally long batches.
+
+    Args:
+        chain (Sequence): List of blocks.
+        batches (int, optional): Number of batches. Defaults to 30.
+
+    Returns:
+        List[Sequence]: Batches, the last one includes remaining blocks.
+    """
+    size = len(chain) // batches
+    if size == 0:
+        return [chain]
+    return [
+        chain[index * size : (index + 1) * size if index < batches - 1 else None]
+        for index in range(batches)
+    ]
+
+
+class ShareMonitor:
+    """Online monitor of confidence intervals of shares of one running simulation.
+
+    Attributes:
+        precision (Optional[float]): Requested half-width of intervals of selfish
+            miners' shares in percentage points, None disables early stopping.
+        confidence (float): Confidence level of intervals.
+        cycles (Optional[CycleStatistics]): Statistics of regenerative cycles.
+        cycle_start (int): Position in the public blockchain, where the current cycle starts.
+        cycle_rounds (int): Number of rounds of the current cycle.
+        next_check (int): Number of rounds of the next precision check.
+    """
+
+    def __init__(self, precision: Optional[float], confidence: float = CONFIDENCE):
+        self.precision = precision
+        self.confidence = confidence
+        self.cycles: Optional[CycleStatistics] = None
+        self.cycle_start = 0
+        self.cycle_rounds = 0
+        self.next_check = FIRST_CHECK
+
+    def add_cycle(self, blocks: Sequence[float], end: int) -> None:
+        """Add the finished regenerative cycle and start the next one.
+
+        Args:
+            blocks (Sequence[float]): Blocks of every miner added during the cycle.
+            end (int): Position in the public blockchain, where the next cycle starts.
+        """
+        if self.cycles is None:
+            self.cycles = CycleStatistics(miners=len(blocks))
+        self.cycles.add_cycle(blocks, self.cycle_rounds)
+        self.cycle_start = end
+        self.cycle_rounds = 0
+
+    def should_check(self, rounds: int) -> bool:
+        """Check if the precision should be checked after the given number of rounds.
+
+        Args:
+            rounds (int): Number of finished rounds.
+
+        Returns:
+            bool: True if the precision is requested and the check is due.
+        """
+        if self.precision is None or rounds < self.next_check:
+            return False
+
+        self.next_check = max(int(rounds * CHECK_GROWTH), rounds + 1)
+        return True
+
+    def intervals(self, statistics: CycleStatistics) -> List[float]:
+        """Get half-widths of confidence intervals of shares of all miners.
+
+        Args:
+            statistics (CycleStatistics): Statistics of cycles or batches.
+
+        Returns:
+            List[float]: Half-widths in percentage points.
+        """
+        return [
+            statistics.share_ci(index, self.confidence)
+            for index in range(statistics.miners)
+        ]
+
+    def precision_reached(self, statistics: Optional[CycleStatistics]) -> bool:
+        """Check if intervals of all selfish miners are narrow enough.
+
+        Args:
+            statistics (Optional[CycleStatistics]): Statistics of cycles or batches,
+                                                    the honest miner is the first one.
+
+        Returns:
+            bool: True if the simulation can stop.
+        """
+        if statistics is None or statistics.cycles < MIN_SAMPLES:
+            return False
+
+        return all(
+            half_width <= self.precision
+            for half_width in self.intervals(statistics)[1:]
+        )
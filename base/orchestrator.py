@@ -0,0 +1,366 @@
+"""Module contains the asyncio orchestrator of simulation sweeps.
+
+Every job is a command of a simulation process, e.g. `main.py --progress machine ...`.
+Jobs are admitted by `JobQueue` of the scheduler (longest first, within limits
+of workers and memory) and outputs of all processes are read in one event loop:
+
++ `smasf-progress` lines on stderr update the aggregated progress, other lines
+  are passed through and kept in the outcome of the job
++ stdout of the process is kept in the outcome, which is passed to the callback
+  and written to the journal as soon as the job is finished
++ failed jobs (non-zero exit code) are started again, at most `retries` times
++ a summary with finished jobs, throughput and ETA is printed every `interval` seconds
+
+Ctrl-C (SIGINT) or SIGTERM cancels the sweep: running processes are terminated and
+outcomes of finished jobs are kept. Processes run in their own sessions, so Ctrl-C
+in the terminal reaches only the orchestrator. The journal is a JSON Lines file
+with metadata of the sweep (e.g. its root seed) on the first line and one outcome
+per line, so an interrupted sweep is resumed by skipping jobs completed in it.
+"""
+import asyncio
+import json
+import os
+import signal
+import sys
+import time
+from asyncio.subprocess import Process
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, TextIO
+
+from base.progress import AggregateProgress, parse_machine_line
+from base.scheduler import Job, JobQueue
+
+# Seconds between termination and kill of cancelled processes
+TERMINATE_TIMEOUT = 5.0
+
+
+@dataclass
+class SweepCommand:
+    """Command of one simulation process, used as the payload of `Job`.
+
+    Attributes:
+        key (str): Unique and stable identifier of the job, e.g. its output file.
+        args (List[str]): Program and its arguments.
+        rounds (int): Number of simulated rounds for the aggregated progress.
+    """
+
+    key: str
+    args: List[str]
+    rounds: int = 0
+
+
+@dataclass
+class JobOutcome:
+    """Outcome of the last attempt of the job.
+
+    Attributes:
+        key (str): Identifier of the job.
+        returncode (int): Exit code of the process.
+        attempts (int): Number of started attempts.
+        duration (float): Wall time of the last attempt in seconds.
+        stdout (str): Standard output of the process.
+        stderr (str): Standard error of the process without progress lines.
+    """
+
+    key: str
+    returncode: int
+    attempts: int
+    duration: float
+    stdout: str = ""
+    stderr: str = ""
+
+    @property
+    def succeeded(self) -> bool:
+        """Check if the process exited successfully.
+
+        Returns:
+            bool: True for the zero exit code.
+        """
+        return self.returncode == 0
+
+
+class SweepJournal:
+    """Append-only JSON Lines journal of job outcomes.
+
+    Attributes:
+        path (str): Path to the journal.
+        metadata (Dict[str, Any]): Metadata of the sweep, e.g. its root seed.
+        completed (Set[str]): Keys of successfully finished jobs.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        resume: bool = False,
+    ):
+        self.path = path
+        self.metadata = metadata or {}
+        self.completed: Set[str] = set()
+
+        if resume and os.path.exists(path):
+            with open(path, "r") as file:
+                entries = []
+                for line in file:
+                    try:
+                        entries.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # the last line is incomplete if the sweep was killed
+                        continue
+            if entries and "metadata" in entries[0]:
+                self.metadata = entries[0]["metadata"]
+            self.completed = {
+                entry["key"]
+                for entry in entries
+                if "key" in entry and entry.get("returncode") == 0
+            }
+            self._file = open(path, "a")
+        else:
+            self._file = open(path, "w")
+            self._write({"metadata": self.metadata})
+
+    def record(self, outcome: JobOutcome) -> None:
+        """Append the outcome of the finished job.
+
+        Args:
+            outcome (JobOutcome): Outcome of the job.
+        """
+        if outcome.succeeded:
+            self.completed.add(outcome.key)
+        self._write(asdict(outcome))
+
+    def _write(self, entry: Dict[str, Any]) -> None:
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        """Close the journal file."""
+        self._file.close()
+
+
+class SweepOrchestrator:
+    # pylint: disable=too-many-instance-attributes
+    """Runs jobs of the sweep in child processes of one event loop.
+
+    Attributes:
+        workers (Optional[int]): Maximal number of running jobs, all CPUs if None.
+        memory_limit (Optional[float]): Memory for all running jobs in bytes,
+                                        a fraction of the available memory if None.
+        retries (int): Maximal number of repeated attempts of a failed job.
+        interval (float): Seconds between two summaries.
+        journal (Optional[SweepJournal]): Journal of outcomes, its completed jobs
+                                          are skipped.
+        on_finished (Optional[Callable[[JobOutcome], Any]]): Callback of finished jobs.
+        stream (TextIO): Output stream of summaries, stdout by default.
+        outcomes (List[JobOutcome]): Outcomes of jobs finished in the last run.
+        cancelled (bool): The sweep was cancelled.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        memory_limit: Optional[float] = None,
+        retries: int = 2,
+        interval: float = 30.0,
+        journal: Optional[SweepJournal] = None,
+        on_finished: Optional[Callable[[JobOutcome], Any]] = None,
+        stream: Optional[TextIO] = None,
+    ):
+        self.workers = workers
+        self.memory_limit = memory_limit
+        self.retries = retries
+        self.interval = interval
+        self.journal = journal
+        self.on_finished = on_finished
+        self.stream = sys.stdout if stream is None else stream
+
+        self.outcomes: List[JobOutcome] = []
+        self.cancelled = False
+        self._attempts: Dict[str, int] = {}
+        self._processes: Set[Process] = set()
+        self._progress = AggregateProgress(0)
+        self._total = 0
+        self._main_task: Optional[asyncio.Task] = None
+
+    def run(self, jobs: Sequence[Job]) -> List[JobOutcome]:
+        """Run all jobs, which aren't completed in the journal.
+
+        Args:
+            jobs (Sequence[Job]): Jobs with `SweepCommand` payloads.
+
+        Returns:
+            List[JobOutcome]: Outcomes of jobs finished in this run.
+        """
+        completed = self.journal.completed if self.journal is not None else set()
+        pending = [job for job in jobs if job.payload.key not in completed]
+        if len(pending) < len(jobs):
+            self._log(
+                f"Skipped: {len(jobs) - len(pending)} jobs completed in the journal"
+            )
+        return asyncio.run(self._run(pending))
+
+    async def _run(self, jobs: Sequence[Job]) -> List[JobOutcome]:
+        self._main_task = asyncio.current_task()
+        self.outcomes = []
+        self.cancelled = False
+        self._total = len(jobs)
+        self._progress = AggregateProgress(
+            sum(job.payload.rounds for job in jobs), interval=float("inf")
+        )
+        queue = JobQueue(jobs, self.workers, self.memory_limit)
+
+        loop = asyncio.get_running_loop()
+        handled_signals = []
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signal_number, self._cancel)
+                handled_signals.append(signal_number)
+            except (NotImplementedError, RuntimeError):
+                # signal handlers of event loops aren't available on Windows
+                pass
+
+        reporter = asyncio.create_task(self._report_periodically())
+        tasks: Set[asyncio.Task] = set()
+        try:
+            while queue.pending or tasks:
+                job = queue.take()
+                while job is not None:
+                    tasks.add(asyncio.create_task(self._attempt(queue, job)))
+                    job = queue.take()
+                done, tasks = await asyncio.wait(
+                    tasks, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    task.result()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            reporter.cancel()
+            for signal_number in handled_signals:
+                loop.remove_signal_handler(signal_number)
+
+        self._log(self._summary())
+        if self.cancelled:
+            self._log(
+                f"Cancelled: {self._total - len(self.outcomes)} jobs weren't finished"
+            )
+        return self.outcomes
+
+    def _cancel(self) -> None:
+        if not self.cancelled:
+            self.cancelled = True
+            self._log("Cancelling, running simulations are terminated...")
+            self._main_task.cancel()
+        else:
+            # the second interrupt doesn't wait for terminated processes
+            for process in self._processes:
+                if process.returncode is None:
+                    process.kill()
+
+    async def _attempt(self, queue: JobQueue, job: Job) -> None:
+        command = job.payload
+        attempts = self._attempts.get(command.key, 0) + 1
+        self._attempts[command.key] = attempts
+        self._progress.update(command.key, 0)
+
+        start = time.monotonic()
+        try:
+            returncode, stdout, stderr = await self._execute(command)
+        finally:
+            queue.release(job)
+        if self.cancelled:
+            # processes killed by the cancellation aren't failures
+            raise asyncio.CancelledError()
+
+        outcome = JobOutcome(
+            command.key,
+            returncode,
+            attempts,
+            time.monotonic() - start,
+            stdout,
+            stderr,
+        )
+        if not outcome.succeeded and attempts <= self.retries:
+            self._log(
+                f"Failed: {command.key} (exit code {returncode}), "
+                f"retry {attempts}/{self.retries}"
+            )
+            queue.put_back(job)
+            return
+
+        self.outcomes.append(outcome)
+        if self.journal is not None:
+            self.journal.record(outcome)
+        status = "Finished" if outcome.succeeded else "Failed"
+        self._log(f"{status}: {len(self.outcomes)}/{self._total} {command.key}")
+        if self.on_finished is not None:
+            self.on_finished(outcome)
+
+    async def _execute(self, command: SweepCommand) -> tuple:
+        process = await asyncio.create_subprocess_exec(
+            *command.args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True,
+        )
+        self._processes.add(process)
+        try:
+            stdout, stderr = await asyncio.gather(
+                process.stdout.read(), self._read_stderr(command.key, process.stderr)
+            )
+            returncode = await process.wait()
+        except asyncio.CancelledError:
+            await self._terminate(process)
+            raise
+        finally:
+            self._processes.discard(process)
+        return returncode, stdout.decode(errors="replace"), stderr
+
+    async def _read_stderr(self, key: str, stream: asyncio.StreamReader) -> str:
+        lines = []
+        async for raw_line in stream:
+            line = raw_line.decode(errors="replace")
+            progress = parse_machine_line(line)
+            if progress is None:
+                # keep warnings and errors of simulations visible
+                sys.stderr.write(line)
+                lines.append(line)
+            else:
+                self._progress.update(key, progress[0])
+        return "".join(lines)
+
+    @staticmethod
+    async def _terminate(process: Process) -> None:
+        if process.returncode is not None:
+            return
+        process.terminate()
+        try:
+            await asyncio.wait_for(process.wait(), TERMINATE_TIMEOUT)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+
+    async def _report_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            self._log(self._summary())
+
+    def _summary(self) -> str:
+        failed = sum(not outcome.succeeded for outcome in self.outcomes)
+        summary = (
+            f"Jobs: {len(self.outcomes)}/{self._total} finished, "
+            f"{len(self._processes)} running, {failed} failed"
+        )
+        if self._progress.total:
+            summary += f" | {self._progress.summary()}"
+        return summary
+
+    def _log(self, message: str) -> None:
+        date_time = datetime.now().strftime("%m-%d-%Y %H:%M:%S")
+        self.stream.write(f"[{date_time}] {message}\n")
+        self.stream.flush()
@@ -0,0 +1,131 @@
+"""Module contains optional phase-level profiling of simulations.
+
+Profiling has no cost if it is not enabled, because methods of the simulation
+manager and its miners are wrapped by timing functions only on the profiled instances:
+
+    profiler = PhaseProfiler()
+    sim_manager.enable_profiling(profiler)
+    sim_manager.run()
+    print(profiler.format_report("Nakamoto"))
+
+On the command line it is enabled by `python main.py --profile <blockchain>`
+or `python main.py --profile-out profile.json <blockchain>`.
+
+Times are inclusive, so time of nested phases (e.g. `resolve_overrides` called
+in the override loop) is part of the time of the outer phase too.
+"""
+import functools
+import json
+import time
+from typing import Any, Callable, Dict, Iterable, List
+
+
+class PhaseProfiler:
+    """Accumulator of time and call counts of simulation phases.
+
+    Attributes:
+        phases (Dict[str, List[float]]): Total time in seconds and call count keyed
+                                         by phase names.
+        total_phase (str): Phase, to which are all other phases compared.
+    """
+
+    def __init__(self, total_phase: str = "run_simulation"):
+        self.phases: Dict[str, List[float]] = {}
+        self.total_phase = total_phase
+
+    def wrap(self, func: Callable, phase: str) -> Callable:
+        """Wrap the function by timing of the given phase.
+
+        Args:
+            func (Callable): Function or bound method for wrapping.
+            phase (str): Name of the phase.
+
+        Returns:
+            Callable: Wrapped function.
+        """
+        stats = self.phases.setdefault(phase, [0.0, 0])
+        perf_counter = time.perf_counter
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stats[0] += perf_counter() - start
+                stats[1] += 1
+
+        return wrapper
+
+    def instrument(self, obj: Any, methods: Iterable[str], prefix: str = "") -> None:
+        """Replace methods of the object instance by their timed versions.
+
+        Missing methods are skipped, so one list of methods can be used
+        for all miners of a protocol.
+
+        Args:
+            obj (Any): Profiled object, e.g. simulation manager or miner.
+            methods (Iterable[str]): Names of profiled methods.
+            prefix (str, optional): Prefix of phase names. Defaults to "".
+        """
+        for method in methods:
+            func = getattr(obj, method, None)
+            if func is not None:
+                setattr(obj, method, self.wrap(func, prefix + method))
+
+    def report(self) -> List[Dict[str, Any]]:
+        """Get breakdown of all phases sorted by their total time.
+
+        Returns:
+            List[Dict[str, Any]]: One record per phase with its call count, total time,
+                mean time of one call and share of the total phase time.
+        """
+        total = self.phases.get(self.total_phase, [0.0, 0])[0]
+        records = []
+        for phase, (seconds, calls) in self.phases.items():
+            if not calls:
+                continue
+            records.append(
+                {
+                    "phase": phase,
+                    "calls": calls,
+                    "total_s": seconds,
+                    "mean_us": seconds / calls * 1e6,
+                    "percentage": 100 * seconds / total if total else 0.0,
+                }
+            )
+
+        return sorted(records, key=lambda record: record["total_s"], reverse=True)
+
+    def format_report(self, title: str = "") -> str:
+        """Format breakdown of all phases as a text table.
+
+        Args:
+            title (str, optional): Title of the table. Defaults to "".
+
+        Returns:
+            str: Formatted table.
+        """
+        lines = [
+            f"Profile {title}".rstrip(),
+            f"{'phase':<32} {'calls':>10} {'total [s]':>10} {'mean [us]':>10} {'%':>6}",
+        ]
+        for record in self.report():
+            lines.append(
+                f"{record['phase']:<32} {record['calls']:>10} {record['total_s']:>10.3f} "
+                f"{record['mean_us']:>10.2f} {record['percentage']:>6.1f}"
+            )
+
+        return "\n".join(lines)
+
+
+def save_profiles(profiles: List[Dict[str, Any]], path: str) -> None:
+    """Save breakdowns of profiled simulations into a JSON file.
+
+    Args:
+        profiles (List[Dict[str, Any]]): One record per simulation with its
+                                         `consensus_name` and `phases` breakdown.
+        path (str): Path to the output JSON file.
+    """
+    with open(path, "w") as file:
+        json.dump(profiles, file, indent=2)
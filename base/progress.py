@@ -0,0 +1,201 @@
+"""Module contains low-overhead progress reporting of simulations.
+
+`ProgressReporter` is updated from a cheap round counter in the simulation loop.
+Clock is read only every `check_step` rounds and the progress is reported at most
+every `interval` seconds, so per-round cost is just one integer comparison.
+
+Supported modes:
+
++ `terminal` -- single self-rewriting line with rounds/sec and ETA on stderr
++ `machine` -- lines `smasf-progress <done> <total> <elapsed>` on stderr, which are
+  parsed by sweep runners and aggregated by `AggregateProgress`
++ `off` -- no reporting
++ `auto` -- `terminal` if stderr is a terminal, otherwise `off`
+"""
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Hashable, Optional, TextIO, Tuple
+
+PROGRESS_MODES = ["auto", "terminal", "machine", "off"]
+MACHINE_PREFIX = "smasf-progress"
+
+
+def format_duration(seconds: float) -> str:
+    """Format duration in seconds as `HH:MM:SS`.
+
+    Args:
+        seconds (float): Duration in seconds.
+
+    Returns:
+        str: Formatted duration.
+    """
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def parse_machine_line(line: str) -> Optional[Tuple[int, int, float]]:
+    """Parse the progress line written in the `machine` mode.
+
+    Args:
+        line (str): Line from stderr of the simulation process.
+
+    Returns:
+        Optional[Tuple[int, int, float]]: Done rounds, total rounds and elapsed time
+            or None if the line isn't a progress line.
+    """
+    parts = line.split()
+    if len(parts) != 4 or parts[0] != MACHINE_PREFIX:
+        return None
+
+    return int(parts[1]), int(parts[2]), float(parts[3])
+
+
+class ProgressReporter:
+    # pylint: disable=too-many-instance-attributes
+    """Time based progress reporter of one simulation.
+
+    Attributes:
+        total (int): Total number of rounds of the simulation.
+        label (str): Label shown in front of the progress.
+        mode (str): Reporting mode, one of `PROGRESS_MODES` except `auto`.
+        interval (float): Minimal time between two reports in seconds.
+        check_step (int): Number of rounds between two reads of the clock.
+        stream (TextIO): Output stream, stderr by default.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        total: int,
+        label: str = "",
+        mode: str = "auto",
+        interval: float = 0.5,
+        check_step: int = 256,
+        stream: Optional[TextIO] = None,
+    ):
+        if mode not in PROGRESS_MODES:
+            raise ValueError(f"Invalid progress mode. Accepted are: {PROGRESS_MODES}")
+
+        self.total = total
+        self.label = label
+        self.interval = interval
+        self.check_step = check_step
+        self.stream = sys.stderr if stream is None else stream
+        if mode == "auto":
+            mode = "terminal" if self.stream.isatty() else "off"
+        self.mode = mode
+
+        self._start = time.monotonic()
+        self._last_report = self._start
+        self._next_check = float("inf") if mode == "off" else check_step
+
+    def update(self, done: int) -> None:
+        """Update progress with the number of finished rounds.
+
+        Args:
+            done (int): Number of finished rounds.
+        """
+        if done < self._next_check:
+            return
+
+        self._next_check = done + self.check_step
+        now = time.monotonic()
+        if now - self._last_report >= self.interval:
+            self._last_report = now
+            self._report(done, now - self._start)
+
+    def finish(self, done: Optional[int] = None) -> None:
+        """Report the final state of the simulation.
+
+        Args:
+            done (Optional[int], optional): Number of simulated rounds, which is lower
+                than the total if the simulation stopped early. Defaults to the total.
+        """
+        if self.mode != "off":
+            done = self.total if done is None else done
+            self._report(done, time.monotonic() - self._start, final=True)
+
+    def _report(self, done: int, elapsed: float, final: bool = False) -> None:
+        if self.mode == "machine":
+            self.stream.write(f"{MACHINE_PREFIX} {done} {self.total} {elapsed:.3f}\n")
+        else:
+            rate = done / elapsed if elapsed > 0 else 0.0
+            eta = (self.total - done) / rate if rate > 0 else 0.0
+            percentage = 100 * done / self.total if self.total else 100.0
+            self.stream.write(
+                f"\r{self.label}: {done}/{self.total} rounds ({percentage:5.1f}%) | "
+                f"{rate:,.0f} rounds/s | ETA {format_duration(eta)}"
+                + ("\n" if final else "")
+            )
+        self.stream.flush()
+
+
+class AggregateProgress:
+    """Aggregated progress of many simulations, e.g. running in sweep workers.
+
+    It is thread-safe, so it can be updated from threads reading outputs of
+    simulation processes.
+
+    Attributes:
+        total (int): Total number of rounds of all simulations.
+        interval (float): Minimal time between two reports in seconds.
+        stream (TextIO): Output stream, stdout by default.
+    """
+
+    def __init__(
+        self, total: int, interval: float = 5.0, stream: Optional[TextIO] = None
+    ):
+        self.total = total
+        self.interval = interval
+        self.stream = sys.stdout if stream is None else stream
+
+        self._done: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+        self._last_report = self._start
+
+    @property
+    def done(self) -> int:
+        """Get number of finished rounds of all simulations.
+
+        Returns:
+            int: Number of finished rounds.
+        """
+        return sum(self._done.values())
+
+    def update(self, job: Hashable, done: int) -> None:
+        """Update progress of one simulation.
+
+        Args:
+            job (Hashable): Identifier of the simulation.
+            done (int): Number of finished rounds of the simulation.
+        """
+        with self._lock:
+            self._done[job] = done
+            now = time.monotonic()
+            if now - self._last_report >= self.interval:
+                self._last_report = now
+                self._report()
+
+    def summary(self) -> str:
+        """Format done rounds, throughput and ETA of all simulations.
+
+        Returns:
+            str: Summary of the progress.
+        """
+        done = self.done
+        elapsed = time.monotonic() - self._start
+        rate = done / elapsed if elapsed > 0 else 0.0
+        eta = (self.total - done) / rate if rate > 0 else 0.0
+        percentage = 100 * done / self.total if self.total else 100.0
+        return (
+            f"{done}/{self.total} rounds ({percentage:.1f}%) | "
+            f"{rate:,.0f} rounds/s | ETA {format_duration(eta)}"
+        )
+
+    def _report(self) -> None:
+        date_time = datetime.now().strftime("%m-%d-%Y %H:%M:%S")
+        self.stream.write(f"[{date_time}] Progress: {self.summary()}\n")
+        self.stream.flush()
@@ -0,0 +1,147 @@
+"""Module contains sinks for bulk writing of simulation results.
+
+Sink is selected according to the extension of the output file:
+
++ `.jsonl` -- one JSON record per simulation
++ `.csv` -- one row per miner and simulation
++ `.parquet` -- columnar file with one row per miner and simulation (requires pyarrow)
++ `.store` -- directory with shards of the columnar result store (see `base.result_store`),
+  to which concurrent runs can append
+"""
+import csv
+import json
+import os
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Sequence, Type
+
+from base.result_store import ResultStore
+from base.results import SimulationResult
+
+
+class ResultSinkBase(ABC):
+    """Abstract base class for all result sinks.
+
+    Attributes:
+        path (str): Path to the output file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @abstractmethod
+    def write(self, results: Sequence[SimulationResult]) -> None:
+        """Write all results at once, existing content of the file is preserved.
+
+        Args:
+            results (Sequence[SimulationResult]): Results for writing.
+        """
+        raise NotImplementedError
+
+
+class JsonlResultSink(ResultSinkBase):
+    """Sink writing one JSON record per line."""
+
+    def write(self, results: Sequence[SimulationResult]) -> None:
+        lines = [json.dumps(result.to_dict()) + "\n" for result in results]
+        with open(self.path, "a") as file:
+            file.writelines(lines)
+
+
+class CsvResultSink(ResultSinkBase):
+    """Sink writing flat rows with one miner per row.
+
+    Rows appended to an existing file are written in columns of its header,
+    columns missing in rows (e.g. fork statistics of other runs) stay empty.
+    """
+
+    def write(self, results: Sequence[SimulationResult]) -> None:
+        rows = [row for result in results for row in result.to_rows()]
+        if not rows:
+            return
+
+        # rows of different protocols or options have different columns
+        columns = list(dict.fromkeys(key for row in rows for key in row))
+        header = self._read_header()
+        if header is not None:
+            extra = [column for column in columns if column not in header]
+            if extra:
+                raise ValueError(
+                    f"Results have columns {extra}, which are missing in the header "
+                    f"of {self.path}, please write them into another file"
+                )
+            columns = header
+
+        with open(self.path, "a", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=columns, restval="")
+            if header is None:
+                writer.writeheader()
+            writer.writerows(rows)
+
+    def _read_header(self) -> Optional[List[str]]:
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return None
+        with open(self.path, newline="") as file:
+            return next(csv.reader(file), None)
+
+
+class ParquetResultSink(ResultSinkBase):
+    """Sink writing flat rows with one miner per row into a Parquet file."""
+
+    def write(self, results: Sequence[SimulationResult]) -> None:
+        try:
+            # pylint: disable=import-outside-toplevel
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as error:
+            raise ImportError(
+                "Writing of Parquet results requires the 'pyarrow' package."
+            ) from error
+
+        rows = [row for result in results for row in result.to_rows()]
+        if not rows:
+            return
+
+        table = pa.Table.from_pylist(rows)
+        if os.path.exists(self.path):
+            # Parquet files can't be appended, so existing rows are rewritten
+            table = pa.concat_tables(
+                [pq.read_table(self.path), table], promote_options="default"
+            )
+        pq.write_table(table, self.path)
+
+
+class StoreResultSink(ResultSinkBase):
+    """Sink appending one shard with rows of all results into the result store."""
+
+    def write(self, results: Sequence[SimulationResult]) -> None:
+        ResultStore(self.path).append(results)
+
+
+RESULT_SINKS: Dict[str, Type[ResultSinkBase]] = {
+    ".jsonl": JsonlResultSink,
+    ".csv": CsvResultSink,
+    ".parquet": ParquetResultSink,
+    ".store": StoreResultSink,
+}
+
+
+def create_result_sink(path: str) -> ResultSinkBase:
+    """Create a result sink according to the extension of the output file.
+
+    Args:
+        path (str): Path to the output file.
+
+    Raises:
+        ValueError: If the extension of the file is not supported.
+
+    Returns:
+        ResultSinkBase: Sink for the given output file.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in RESULT_SINKS:
+        raise ValueError(
+            f"Unsupported results file extension '{extension}'. "
+            f"Please use one of: {list(RESULT_SINKS)}"
+        )
+
+    return RESULT_SINKS[extension](path)
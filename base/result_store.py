@@ -0,0 +1,295 @@
+"""Module contains the local columnar store of simulation results.
+
+The store is a directory of immutable shards, each of them with rows of one
+batch of results (one row per miner and simulation, see `SimulationResult.to_rows`).
+Shards are Parquet files if `pyarrow` is available, otherwise NumPy `.npz` files.
+Every writer creates its own shard under a unique name and renames it into
+place when it is complete, so any number of processes can append to the same
+store concurrently without locks and readers never see partial shards.
+
+Queries load chosen columns of all shards into NumPy arrays at once, filter them
+by config columns and group them with vectorised operations:
+
+    store = ResultStore("sweep.store")
+    rows = store.load(["config_gamma", "share"], where={"miner_type": "selfish"})
+    shares = store.group_by(["config_gamma", "mining_power"], "share")
+
+`compact` merges small shards of a finished sweep into a single one.
+"""
+import math
+import os
+import uuid
+from typing import Any, Dict, List, Optional, Sequence
+
+from base.results import SimulationResult
+
+# Extensions of shards
+PARQUET_EXTENSION = ".parquet"
+NPZ_EXTENSION = ".npz"
+
+
+def _has_pyarrow() -> bool:
+    try:
+        # pylint: disable=import-outside-toplevel,unused-import
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _column_array(values: Sequence[Any]) -> Any:
+    """Convert values of one column into a NumPy array without Python objects.
+
+    Missing values are NaN in numeric columns and empty strings in text columns.
+    """
+    # pylint: disable=import-outside-toplevel
+    import numpy as np
+
+    present = [value for value in values if value is not None]
+    if present and all(isinstance(value, bool) for value in present):
+        if len(present) == len(values):
+            return np.array(values, dtype=bool)
+        return np.array([math.nan if value is None else value for value in values])
+    if all(isinstance(value, (int, float)) for value in present):
+        if len(present) == len(values) and all(
+            isinstance(value, int) for value in present
+        ):
+            return np.array(values, dtype=np.int64)
+        return np.array(
+            [math.nan if value is None else value for value in values], dtype=float
+        )
+    return np.array(["" if value is None else str(value) for value in values])
+
+
+def _missing_array(like: Any, length: int) -> Any:
+    # pylint: disable=import-outside-toplevel
+    import numpy as np
+
+    if like.dtype.kind in "US":
+        return np.full(length, "", dtype=like.dtype)
+    return np.full(length, math.nan)
+
+
+def _concatenate(columns: List[Dict[str, Any]], names: Sequence[str]) -> Dict[str, Any]:
+    # pylint: disable=import-outside-toplevel
+    import numpy as np
+
+    merged = {}
+    for name in names:
+        like = next(shard[name] for shard in columns if name in shard)
+        parts = []
+        for shard in columns:
+            length = len(next(iter(shard.values()))) if shard else 0
+            parts.append(shard[name] if name in shard else _missing_array(like, length))
+        merged[name] = np.concatenate(parts) if parts else like[:0]
+    return merged
+
+
+class ResultStore:
+    """Directory with shards of simulation results.
+
+    Attributes:
+        path (str): Path to the directory.
+        use_parquet (bool): New shards are written as Parquet files.
+    """
+
+    def __init__(self, path: str, use_parquet: Optional[bool] = None):
+        self.path = path
+        self.use_parquet = _has_pyarrow() if use_parquet is None else use_parquet
+
+    def shards(self) -> List[str]:
+        """Get paths of all complete shards.
+
+        Returns:
+            List[str]: Sorted paths of shards.
+        """
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(
+            os.path.join(self.path, name)
+            for name in os.listdir(self.path)
+            if name.endswith((PARQUET_EXTENSION, NPZ_EXTENSION))
+        )
+
+    def append(self, results: Sequence[SimulationResult]) -> Optional[str]:
+        """Write rows of results into a new shard.
+
+        Args:
+            results (Sequence[SimulationResult]): Results for writing.
+
+        Returns:
+            Optional[str]: Path of the shard, None if there are no rows.
+        """
+        rows = [row for result in results for row in result.to_rows()]
+        if not rows:
+            return None
+
+        names = list(dict.fromkeys(name for row in rows for name in row))
+        return self._write_shard(
+            {name: _column_array([row.get(name) for row in rows]) for name in names}
+        )
+
+    def _write_shard(self, columns: Dict[str, Any]) -> str:
+        # pylint: disable=import-outside-toplevel
+        os.makedirs(self.path, exist_ok=True)
+        extension = PARQUET_EXTENSION if self.use_parquet else NPZ_EXTENSION
+        name = f"{os.getpid()}-{uuid.uuid4().hex}"
+        path = os.path.join(self.path, name + extension)
+        # incomplete shards have a different extension, so readers skip them
+        partial_path = os.path.join(self.path, name + ".partial")
+
+        if self.use_parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            pq.write_table(pa.table(columns), partial_path)
+        else:
+            import numpy as np
+
+            with open(partial_path, "wb") as file:
+                np.savez(file, **columns)
+
+        os.replace(partial_path, path)
+        return path
+
+    @staticmethod
+    def _read_shard(path: str, columns: Optional[Sequence[str]]) -> Dict[str, Any]:
+        # pylint: disable=import-outside-toplevel
+        if path.endswith(PARQUET_EXTENSION):
+            try:
+                import pyarrow.parquet as pq
+            except ImportError as error:
+                raise ImportError(
+                    "Reading of Parquet shards requires the 'pyarrow' package."
+                ) from error
+
+            schema_names = pq.read_schema(path).names
+            table = pq.read_table(
+                path,
+                columns=(
+                    None
+                    if columns is None
+                    else [name for name in columns if name in schema_names]
+                ),
+            )
+            return {
+                name: table.column(name).to_numpy(zero_copy_only=False)
+                for name in table.column_names
+            }
+
+        import numpy as np
+
+        with np.load(path) as shard:
+            names = shard.files if columns is None else columns
+            return {name: shard[name] for name in names if name in shard.files}
+
+    def load(
+        self,
+        columns: Optional[Sequence[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Load columns of all rows of the store.
+
+        Args:
+            columns (Optional[Sequence[str]], optional): Loaded columns, all if None.
+                                                         Defaults to None.
+            where (Optional[Dict[str, Any]], optional): Required values keyed by
+                columns, a list or tuple allows any of its values. Defaults to None.
+
+        Returns:
+            Dict[str, numpy.ndarray]: Arrays of selected rows keyed by column names.
+        """
+        # pylint: disable=import-outside-toplevel
+        import numpy as np
+
+        where = where or {}
+        read_columns = None
+        if columns is not None:
+            read_columns = list(dict.fromkeys(list(columns) + list(where)))
+
+        shards = [self._read_shard(path, read_columns) for path in self.shards()]
+        names = read_columns
+        if names is None:
+            names = list(dict.fromkeys(name for shard in shards for name in shard))
+        names = [name for name in names if any(name in shard for shard in shards)]
+        table = _concatenate(shards, names)
+
+        missing = [name for name in where if name not in table]
+        if missing:
+            raise KeyError(f"Unknown columns of the result store: {missing}")
+        if where and table:
+            mask = np.ones(len(next(iter(table.values()))), dtype=bool)
+            for name, value in where.items():
+                if isinstance(value, (list, tuple, set)):
+                    mask &= np.isin(table[name], list(value))
+                else:
+                    mask &= table[name] == value
+            table = {name: values[mask] for name, values in table.items()}
+
+        if columns is not None:
+            table = {name: table[name] for name in columns if name in table}
+        return table
+
+    def group_by(
+        self,
+        keys: Sequence[str],
+        value: str,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Aggregate the numeric column over groups of rows with equal key columns.
+
+        Args:
+            keys (Sequence[str]): Columns defining groups, e.g. config columns.
+            value (str): Aggregated numeric column, e.g. `share`.
+            where (Optional[Dict[str, Any]], optional): Filter of rows as in `load`.
+                                                        Defaults to None.
+
+        Returns:
+            Dict[str, numpy.ndarray]: Key columns of groups and `count`, `mean`
+                and `std` (sample standard deviation) of the value in every group.
+        """
+        # pylint: disable=import-outside-toplevel
+        import numpy as np
+
+        table = self.load(list(keys) + [value], where)
+        if value not in table or not len(table[value]):
+            return {name: np.empty(0) for name in list(keys) + ["count", "mean", "std"]}
+
+        # groups are identified by combined codes of unique values of key columns
+        codes = np.zeros(len(table[value]), dtype=np.int64)
+        for name in keys:
+            uniques, inverse = np.unique(table[name], return_inverse=True)
+            codes = codes * len(uniques) + inverse.reshape(-1)
+        _, first, groups = np.unique(codes, return_index=True, return_inverse=True)
+        groups = groups.reshape(-1)
+
+        values = table[value].astype(float)
+        count = np.bincount(groups)
+        total = np.bincount(groups, weights=values)
+        squares = np.bincount(groups, weights=values * values)
+        mean = total / count
+        with np.errstate(invalid="ignore", divide="ignore"):
+            variance = (squares - count * mean * mean) / (count - 1)
+        std = np.sqrt(np.maximum(variance, 0.0))
+        std[count < 2] = np.nan
+
+        aggregated = {name: table[name][first] for name in keys}
+        aggregated.update({"count": count, "mean": mean, "std": std})
+        return aggregated
+
+    def compact(self) -> Optional[str]:
+        """Merge all shards into one, e.g. after the sweep is finished.
+
+        Returns:
+            Optional[str]: Path of the merged shard, None if the store is empty.
+        """
+        shards = self.shards()
+        if not shards:
+            return None
+        if len(shards) == 1:
+            return shards[0]
+
+        path = self._write_shard(self.load())
+        for shard in shards:
+            os.remove(shard)
+        return path
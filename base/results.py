@@ -0,0 +1,177 @@
+"""Module contains dataclasses for structured simulation results.
+
+Every simulation manager returns an instance of `SimulationResult` from its `run`
+method, so results can be collected and stored without parsing of stdout.
+"""
+import json
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+
+@dataclass
+class MinerResult:
+    """Dataclass with the outcome of the simulation for one miner.
+
+    Attributes:
+        index (int): Position of the miner in the simulation (0 is the honest miner).
+        miner_id (int): Unique identifier of the miner.
+        miner_type (str): Type of the miner, `honest` or `selfish`.
+        mining_power (float): Mining power percentage of the miner.
+        blocks (float): Number of blocks of the miner in the final public blockchain.
+            For Strongchain it includes weighted weak headers.
+        share (float): Percentage of all blocks in the final public blockchain.
+        wins (int): Number of rounds in which the miner was selected as leader.
+        weak_blocks (int): Number of weak blocks or weak headers in the final public
+            blockchain (fruits for Fruitchain).
+        strong_blocks (int): Number of strong blocks in the final public blockchain.
+        share_ci (float): Half-width of the confidence interval of the share
+            if it is estimated within the run from regenerative cycles or batch means.
+    """
+
+    index: int
+    miner_id: int
+    miner_type: str
+    mining_power: float
+    blocks: float
+    share: float
+    wins: int
+    weak_blocks: int = 0
+    strong_blocks: int = 0
+    share_ci: Optional[float] = None
+
+    @property
+    def name(self) -> str:
+        """Get name of the miner used in blocks, e.g. `Selfish miner 2`.
+
+        Returns:
+            str: Name of the miner.
+        """
+        return f"{self.miner_type.capitalize()} miner {self.miner_id}"
+
+
+@dataclass
+class SimulationResult:
+    """Dataclass with the outcome of one simulation.
+
+    Attributes:
+        consensus_name (str): Name of the simulated consensus protocol.
+        rounds (int): Number of simulated mining rounds.
+        total_blocks (float): Total number of blocks in the final public blockchain.
+        miners (List[MinerResult]): Results of all miners, honest miner is the first one.
+        config (Dict[str, Any]): Parsed simulation config of the run.
+        seed (int): Root seed of the random streams of the run.
+        spawn_key (List[int]): Path of the run in the seed tree, which together
+            with the seed and the config identifies the run exactly.
+        antithetic (bool): Run used mirrored leader and block type streams.
+        series (Optional[Dict[str, List]]): Windowed revenue time series keyed by
+            column names if it was recorded (see `base.revenue_series`).
+        fork_stats (Optional[Dict[str, Any]]): Counters and histograms of forks,
+            reorganizations and orphaned blocks if they were recorded (see `base.fork_stats`).
+        duration (Optional[float]): Wall time of the run in seconds.
+        peak_memory (Optional[int]): Peak resident memory of the process after the run
+            in bytes, which is used by the cost model of the sweep scheduler.
+    """
+
+    consensus_name: str
+    rounds: int
+    total_blocks: float
+    miners: List[MinerResult] = field(default_factory=list)
+    config: Dict[str, Any] = field(default_factory=dict)
+    seed: Optional[int] = None
+    spawn_key: List[int] = field(default_factory=list)
+    antithetic: bool = False
+    series: Optional[Dict[str, List]] = None
+    fork_stats: Optional[Dict[str, Any]] = None
+    duration: Optional[float] = None
+    peak_memory: Optional[int] = None
+
+    @property
+    def honest_miner(self) -> MinerResult:
+        """Get result of the honest miner.
+
+        Returns:
+            MinerResult: Result of the honest miner.
+        """
+        return self.miners[0]
+
+    @property
+    def selfish_miners(self) -> List[MinerResult]:
+        """Get results of all selfish miners.
+
+        Returns:
+            List[MinerResult]: Results of selfish miners in config order.
+        """
+        return self.miners[1:]
+
+    def block_counts(self) -> Dict[str, float]:
+        """Get block counts of all miners keyed by their names.
+
+        Returns:
+            Dict[str, float]: Block counts in the final public blockchain.
+        """
+        return {miner.name: miner.blocks for miner in self.miners}
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert the result to a dictionary.
+
+        Returns:
+            Dict[str, Any]: Dictionary representation of the result.
+        """
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SimulationResult":
+        """Create the result from its dictionary representation.
+
+        Args:
+            data (Dict[str, Any]): Dictionary created by `to_dict`.
+
+        Returns:
+            SimulationResult: Restored result.
+        """
+        data = dict(data)
+        data["miners"] = [MinerResult(**miner) for miner in data["miners"]]
+        return cls(**data)
+
+    def to_rows(self) -> List[Dict[str, Any]]:
+        """Flatten the result into one row per miner.
+
+        Scalar config values are stored in columns prefixed with `config_`,
+        the other ones are serialized to JSON.
+
+        Returns:
+            List[Dict[str, Any]]: Flat rows suitable for tabular formats.
+        """
+        common: Dict[str, Any] = {
+            "consensus_name": self.consensus_name,
+            "rounds": self.rounds,
+            "total_blocks": self.total_blocks,
+            "seed": self.seed,
+            "spawn_key": ".".join(str(index) for index in self.spawn_key),
+            "antithetic": self.antithetic,
+            "duration": self.duration,
+            "peak_memory": self.peak_memory,
+        }
+        for key, value in self.config.items():
+            if not isinstance(value, (int, float, str, bool)) and value is not None:
+                value = json.dumps(value)
+            common[f"config_{key}"] = value
+
+        return [{**common, **asdict(miner)} for miner in self.miners]
+
+
+def load_results(path: str) -> List[SimulationResult]:
+    """Load results stored in the JSONL file.
+
+    Args:
+        path (str): Path to the JSONL file with one result per line.
+
+    Returns:
+        List[SimulationResult]: Loaded results.
+    """
+    with open(path, "r") as file:
+        return [
+            SimulationResult.from_dict(json.loads(line))
+            for line in file
+            if line.strip()
+        ]
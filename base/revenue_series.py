@@ -0,0 +1,156 @@
+"""Module contains windowed revenue time series recorded during a run.
+
+Every K rounds one row is written into a preallocated NumPy structured array:
+
++ `round` -- number of finished rounds
++ `chain_length` -- length of the public blockchain
++ `ongoing_fork` -- there is a fork between the public and a private chain
++ `private_blocks` -- the longest private chain of selfish miners
++ `wins` -- rounds won by every miner so far
+
+Shares are filled in at the end of the run from the final blockchain. Window K is
+made of blocks at the positions, which the public blockchain reached between
+two rows, so `share` is the share of every miner in blocks of the window and
+`cumulative_share` in all blocks up to the end of the window. Only a few values
+are stored per row, so a run can be sampled densely without slowing it down.
+
+NumPy is imported only if the series is recorded, so it doesn't slow down
+the startup of the simulator.
+"""
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+
+class RevenueSeries:
+    """Revenue time series of one simulation.
+
+    Attributes:
+        interval (int): Number of rounds between two rows.
+        rows (int): Capacity of the buffer.
+        size (int): Number of recorded rows.
+        buffer (Optional[numpy.ndarray]): Structured array with recorded rows, it is
+                                          allocated with the first row.
+    """
+
+    def __init__(self, interval: int, rounds: int):
+        self.interval = interval
+        self.rows = max(rounds // interval, 1)
+        self.size = 0
+        self.buffer = None
+        self._next_round = interval
+
+    def due(self, rounds: int) -> bool:
+        """Check if a row should be recorded after the given number of rounds.
+
+        Args:
+            rounds (int): Number of finished rounds.
+
+        Returns:
+            bool: True if the next row is due and the buffer is not full.
+        """
+        return rounds >= self._next_round and self.size < self.rows
+
+    def _allocate(self, miners: int) -> None:
+        # pylint: disable=import-outside-toplevel
+        import numpy as np
+
+        dtype = np.dtype(
+            [
+                ("round", np.int64),
+                ("chain_length", np.int64),
+                ("ongoing_fork", np.bool_),
+                ("private_blocks", np.int32),
+                ("wins", np.int64, (miners,)),
+                ("share", np.float32, (miners,)),
+                ("cumulative_share", np.float32, (miners,)),
+            ]
+        )
+        self.buffer = np.zeros(self.rows, dtype=dtype)
+
+    def record(
+        self,
+        rounds: int,
+        chain_length: int,
+        ongoing_fork: bool,
+        private_blocks: int,
+        wins: Sequence[int],
+    ) -> None:
+        """Record one row.
+
+        Args:
+            rounds (int): Number of finished rounds.
+            chain_length (int): Length of the public blockchain.
+            ongoing_fork (bool): There is an ongoing fork.
+            private_blocks (int): Length of the longest private chain.
+            wins (Sequence[int]): Won rounds of all miners, the honest miner is the first one.
+        """
+        if self.buffer is None:
+            self._allocate(len(wins))
+
+        row = self.buffer[self.size]
+        row["round"] = rounds
+        row["chain_length"] = chain_length
+        row["ongoing_fork"] = ongoing_fork
+        row["private_blocks"] = private_blocks
+        row["wins"] = wins
+        self.size += 1
+        self._next_round = rounds + self.interval
+
+    def finish(
+        self, chain: Sequence, share_counts: Callable[[Sequence], List[float]]
+    ) -> Any:
+        """Fill shares of all windows from the final blockchain.
+
+        Args:
+            chain (Sequence): Final blockchain, in which blocks are counted for results.
+            share_counts (Callable[[Sequence], List[float]]): Function counting blocks
+                of all miners in the part of the chain.
+
+        Returns:
+            Optional[numpy.ndarray]: Recorded rows, None if no row was recorded.
+        """
+        if self.buffer is None:
+            return None
+
+        # pylint: disable=import-outside-toplevel
+        import numpy as np
+
+        series = self.buffer[: self.size]
+        totals = np.zeros(series["share"].shape[1])
+        start = 0
+        for row in series:
+            end = min(int(row["chain_length"]), len(chain))
+            counts = np.asarray(share_counts(chain[start:end]), dtype=float)
+            totals += counts
+            if counts.sum() > 0:
+                row["share"] = 100 * counts / counts.sum()
+            if totals.sum() > 0:
+                row["cumulative_share"] = 100 * totals / totals.sum()
+            start = max(start, end)
+
+        return series
+
+    def save(self, path: str) -> None:
+        """Save recorded rows to the `.npy` file, which keeps names of columns.
+
+        Args:
+            path (str): Path to the output file.
+        """
+        # pylint: disable=import-outside-toplevel
+        import numpy as np
+
+        if self.buffer is not None:
+            np.save(path, self.buffer[: self.size])
+
+    @staticmethod
+    def to_dict(series: Any) -> Optional[Dict[str, List]]:
+        """Convert recorded rows to columns for result records.
+
+        Args:
+            series (Optional[numpy.ndarray]): Rows returned by `finish`.
+
+        Returns:
+            Optional[Dict[str, List]]: Lists of values keyed by column names.
+        """
+        if series is None:
+            return None
+        return {name: series[name].tolist() for name in series.dtype.names}
@@ -0,0 +1,147 @@
+"""Module contains reproducible random number streams of simulations.
+
+Seeds are organized in a spawn tree like NumPy's `SeedSequence`: the root is
+identified by its entropy (the seed given by the user) and every child by the path
+of spawn indices from the root. State of every stream is derived by hashing
+of the entropy together with the whole path, so streams of siblings are independent
+and each of them can be recreated without generating any other one:
+
+    root = SeedSequence(42)
+    simulations = root.spawn(3)       # one child per simulation in the config
+    rng = simulations[1].generator()  # stream of the 2nd simulation
+    leader_rng = simulations[1].generator("leader")  # named stream of the same node
+
+Antithetic nodes produce mirrored uniform numbers `1 - u` in streams of their
+non-antithetic twins, which is used by antithetic replica pairs.
+
+Only the standard library is used, so simulations don't need to import NumPy.
+"""
+import hashlib
+import random
+import secrets
+from typing import List, Optional, Sequence, Tuple
+
+# Entropy is limited to 63 bits, so it fits into int64 columns of stored results
+ENTROPY_BITS = 63
+
+
+class AntitheticRandom(random.Random):
+    """Random generator returning mirrored uniform numbers `1 - u`.
+
+    Only `random()` is mirrored. Methods based on `getrandbits` (e.g. `choice`)
+    are not, so antithetic streams should be consumed just by `random()`.
+    """
+
+    def random(self) -> float:
+        return 1.0 - super().random()
+
+
+class SeedSequence:
+    """Node of the spawn tree of seeds.
+
+    Attributes:
+        entropy (int): Root seed of the whole tree.
+        spawn_key (Tuple[int, ...]): Path of spawn indices from the root to this node.
+        antithetic (bool): Node is the antithetic twin of the node with the same key.
+    """
+
+    def __init__(
+        self,
+        entropy: Optional[int] = None,
+        spawn_key: Sequence[int] = (),
+        antithetic: bool = False,
+    ):
+        if entropy is None:
+            entropy = secrets.randbits(ENTROPY_BITS)
+        if entropy < 0:
+            raise ValueError("Seed must be a non-negative integer.")
+
+        self.entropy = entropy
+        self.spawn_key: Tuple[int, ...] = tuple(spawn_key)
+        self.antithetic = antithetic
+        self._spawned = 0
+
+    def __repr__(self) -> str:
+        return (
+            f"SeedSequence(entropy={self.entropy}, spawn_key={self.spawn_key}, "
+            f"antithetic={self.antithetic})"
+        )
+
+    def antithetic_twin(self) -> "SeedSequence":
+        """Get the antithetic twin of this node.
+
+        Returns:
+            SeedSequence: Node with the same key and mirrored uniform streams.
+        """
+        return SeedSequence(self.entropy, self.spawn_key, not self.antithetic)
+
+    def child(self, index: int) -> "SeedSequence":
+        """Get the child with the given spawn index.
+
+        It doesn't change the number of spawned children.
+
+        Args:
+            index (int): Spawn index of the child.
+
+        Returns:
+            SeedSequence: Child node.
+        """
+        return SeedSequence(self.entropy, self.spawn_key + (index,))
+
+    def spawn(self, count: int) -> List["SeedSequence"]:
+        """Spawn new independent children.
+
+        Repeated calls continue with the next spawn indices, so no child is returned twice.
+
+        Args:
+            count (int): Number of children.
+
+        Returns:
+            List[SeedSequence]: Spawned children.
+        """
+        children = [self.child(self._spawned + index) for index in range(count)]
+        self._spawned += count
+        return children
+
+    def generate_state(self, stream: str = "") -> int:
+        """Generate seed of the random generator of this node.
+
+        Args:
+            stream (str, optional): Name of the stream for nodes with more
+                                    independent streams. Defaults to "".
+
+        Returns:
+            int: 256-bit seed derived from the entropy, the spawn key and the stream.
+        """
+        key = ",".join(str(index) for index in (self.entropy,) + self.spawn_key)
+        if stream:
+            key += "/" + stream
+        digest = hashlib.blake2b(key.encode(), digest_size=32).digest()
+        return int.from_bytes(digest, "big")
+
+    def generator(self, stream: str = "", mirrored: bool = False) -> random.Random:
+        """Create a new random generator of this node.
+
+        Args:
+            stream (str, optional): Name of the stream. Defaults to "".
+            mirrored (bool, optional): Mirror uniform numbers of the stream
+                                       if the node is antithetic. Defaults to False.
+
+        Returns:
+            random.Random: Seeded random generator.
+        """
+        if mirrored and self.antithetic:
+            return AntitheticRandom(self.generate_state(stream))
+        return random.Random(self.generate_state(stream))
+
+
+def parse_spawn_key(value: str) -> Tuple[int, ...]:
+    """Parse spawn key written as dot separated indices, e.g. `3.1`.
+
+    Args:
+        value (str): Spawn key, empty string is the root.
+
+    Returns:
+        Tuple[int, ...]: Parsed spawn key.
+    """
+    return tuple(int(index) for index in value.split(".") if index)
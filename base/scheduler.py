@@ -0,0 +1,378 @@
+"""Module contains the memory- and duration-aware scheduler of simulation sweeps.
+
+Runtime and peak memory of every job are estimated from its config by a cost model:
+
++ runtime -- seconds per unit of work of the protocol, where work grows with rounds,
+  selfish miners and the weak header ratio of Strongchain. Strongchain recomputes
+  the power of the chain in every round, so its work is quadratic in rounds
++ memory -- memory of the interpreter plus bytes per round of the protocol,
+  because the final blockchain is kept until the end of the run
+
+Default coefficients were measured by `benchmarks/simulation_benchmarks.py`.
+`CostModel.calibrate` refits them from past runs in the result store, which stores
+`duration` and `peak_memory` of every run.
+
+Jobs are started longest first, which shortens the makespan of sweeps with very
+different jobs, on all cores by default. A job is started only if the estimated
+memory of all running jobs fits into the limit (a fraction of the available memory
+by default). If the longest pending job doesn't fit, a smaller one, which fits,
+is started instead, and a job is always started if nothing else is running.
+"""
+import json
+import math
+import os
+import sys
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+# Part of the available memory used by jobs by default
+MEMORY_FRACTION = 0.8
+
+# Resident memory of the interpreter with loaded simulator in bytes
+BASE_MEMORY = 22 * 2 ** 20
+
+# Seconds per unit of work of every protocol
+SECONDS_PER_WORK: Dict[str, float] = {
+    "Nakamoto": 5.1e-6,
+    "Subchain": 6.5e-6,
+    "Strongchain": 4.4e-9,
+    "Fruitchain": 80e-6,
+}
+
+# Exponents of rounds in the work of protocols, which are not linear
+ROUNDS_EXPONENTS: Dict[str, float] = {"Strongchain": 2.0}
+
+# Bytes of memory per simulated round of every protocol
+BYTES_PER_ROUND: Dict[str, float] = {
+    "Nakamoto": 135.0,
+    "Subchain": 150.0,
+    "Strongchain": 130.0,
+    "Fruitchain": 820.0,
+}
+
+# Relative cost of every additional selfish miner
+SELFISH_MINER_COST = 0.15
+
+# Relative cost of every weak header ratio unit of Strongchain
+STRONGCHAIN_RATIO_COST = 0.018
+
+
+def peak_memory() -> Optional[int]:
+    """Get peak resident memory of this process.
+
+    Returns:
+        Optional[int]: Peak memory in bytes, None if it can't be measured (Windows).
+    """
+    try:
+        # pylint: disable=import-outside-toplevel
+        import resource
+    except ImportError:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def available_memory() -> Optional[int]:
+    """Get memory available for new processes.
+
+    Returns:
+        Optional[int]: Available memory in bytes, None if it is unknown.
+    """
+    try:
+        with open("/proc/meminfo", "r") as file:
+            for line in file:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def _simulation_configs(config: Any) -> List[Dict[str, Any]]:
+    # configs are lists of `{"simulationN": {...}}` like YAML configs of main.py
+    if isinstance(config, dict):
+        config = [config]
+    return [simulation for entry in config for simulation in entry.values()]
+
+
+@dataclass
+class CostModel:
+    """Estimates of runtime and peak memory of simulations.
+
+    Attributes:
+        seconds_per_work (Dict[str, float]): Seconds per unit of work keyed by
+                                             consensus names.
+        bytes_per_round (Dict[str, float]): Memory per round keyed by consensus names.
+        base_memory (float): Memory of the interpreter in bytes.
+    """
+
+    seconds_per_work: Dict[str, float] = field(
+        default_factory=lambda: dict(SECONDS_PER_WORK)
+    )
+    bytes_per_round: Dict[str, float] = field(
+        default_factory=lambda: dict(BYTES_PER_ROUND)
+    )
+    base_memory: float = BASE_MEMORY
+
+    @staticmethod
+    def work(
+        consensus_name: str, rounds: int, selfish_miners: int, ratio: float = 0
+    ) -> float:
+        """Get units of work of the simulation.
+
+        Args:
+            consensus_name (str): Name of the consensus protocol.
+            rounds (int): Number of rounds.
+            selfish_miners (int): Number of selfish miners.
+            ratio (float, optional): Weak to strong header ratio of Strongchain.
+                                     Defaults to 0.
+
+        Returns:
+            float: Rounds weighted by the number of miners and protocol parameters.
+        """
+        work = rounds ** ROUNDS_EXPONENTS.get(consensus_name, 1.0)
+        work *= 1 + SELFISH_MINER_COST * max(selfish_miners - 1, 0)
+        if consensus_name == "Strongchain":
+            work *= 1 + STRONGCHAIN_RATIO_COST * ratio
+        return work
+
+    def _simulation_work(self, simulation: Dict[str, Any]) -> float:
+        return self.work(
+            simulation["consensus_name"],
+            simulation["simulation_mining_rounds"],
+            len(simulation["miners"]["selfish"]),
+            simulation.get("weak_to_strong_header_ratio", 0),
+        )
+
+    def runtime(self, config: Any) -> float:
+        """Estimate runtime of all simulations of the config run one after another.
+
+        Args:
+            config (Any): Simulations config in the format of YAML configs.
+
+        Returns:
+            float: Estimated runtime in seconds.
+        """
+        default = max(self.seconds_per_work.values())
+        return sum(
+            self._simulation_work(simulation)
+            * self.seconds_per_work.get(simulation["consensus_name"], default)
+            for simulation in _simulation_configs(config)
+        )
+
+    def memory(self, config: Any) -> float:
+        """Estimate peak memory of the process running all simulations of the config.
+
+        Args:
+            config (Any): Simulations config in the format of YAML configs.
+
+        Returns:
+            float: Estimated peak memory in bytes.
+        """
+        default = max(self.bytes_per_round.values())
+        return self.base_memory + max(
+            (
+                simulation["simulation_mining_rounds"]
+                * self.bytes_per_round.get(simulation["consensus_name"], default)
+                for simulation in _simulation_configs(config)
+            ),
+            default=0,
+        )
+
+    def calibrate(self, columns: Dict[str, Any], min_runs: int = 3) -> None:
+        """Refit coefficients of protocols from measured past runs.
+
+        Args:
+            columns (Dict[str, Any]): Columns of the result store (see `ResultStore.load`)
+                with `consensus_name`, `rounds`, `index`, `config_selfish_miners`,
+                `duration` and `peak_memory`, other columns are optional.
+            min_runs (int, optional): Minimal number of runs of a protocol,
+                                      which are needed for its refit. Defaults to 3.
+        """
+        required = ("duration", "peak_memory", "config_selfish_miners", "rounds")
+        if any(name not in columns for name in required):
+            return
+
+        ratios = columns.get("config_weak_to_strong_header_ratio")
+        measured: Dict[str, List[tuple]] = {}
+        for row, index in enumerate(columns["index"]):
+            duration = float(columns["duration"][row])
+            # one row per run, runs without measurements are skipped
+            if index != 0 or math.isnan(duration) or not columns["rounds"][row]:
+                continue
+            name = str(columns["consensus_name"][row])
+            ratio = 0.0 if ratios is None else float(ratios[row])
+            work = self.work(
+                name,
+                int(columns["rounds"][row]),
+                len(json.loads(str(columns["config_selfish_miners"][row]))),
+                0.0 if math.isnan(ratio) else ratio,
+            )
+            measured.setdefault(name, []).append(
+                (
+                    work,
+                    duration,
+                    int(columns["rounds"][row]),
+                    float(columns["peak_memory"][row]),
+                )
+            )
+
+        for name, runs in measured.items():
+            if len(runs) < min_runs:
+                continue
+            self.seconds_per_work[name] = sum(run[1] for run in runs) / sum(
+                run[0] for run in runs
+            )
+            # memory of short runs is dominated by the interpreter and imported modules
+            memory_slopes = sorted(
+                (run[3] - self.base_memory) / run[2]
+                for run in runs
+                if run[3] > 2 * self.base_memory
+            )
+            if memory_slopes:
+                self.bytes_per_round[name] = memory_slopes[len(memory_slopes) // 2]
+
+
+@dataclass
+class Job:
+    """Job of the sweep with its estimated costs.
+
+    Attributes:
+        payload (Any): Job for the runner, e.g. the command of the simulation.
+        runtime (float): Estimated runtime in seconds.
+        memory (float): Estimated peak memory in bytes.
+    """
+
+    payload: Any
+    runtime: float = 0.0
+    memory: float = 0.0
+
+
+def order_jobs(jobs: Sequence[Job]) -> List[Job]:
+    """Order jobs longest first.
+
+    Args:
+        jobs (Sequence[Job]): Jobs of the sweep.
+
+    Returns:
+        List[Job]: Jobs sorted by estimated runtime, stable for equal estimates.
+    """
+    return sorted(jobs, key=lambda job: job.runtime, reverse=True)
+
+
+class JobQueue:
+    """Pending jobs admitted longest first within limits of workers and memory.
+
+    Attributes:
+        workers (int): Maximal number of running jobs.
+        memory_limit (float): Memory for all running jobs in bytes.
+        pending (List[Job]): Jobs waiting for start, longest first.
+        running (int): Number of running jobs.
+        memory (float): Estimated memory of running jobs in bytes.
+    """
+
+    def __init__(
+        self,
+        jobs: Sequence[Job],
+        workers: Optional[int] = None,
+        memory_limit: Optional[float] = None,
+    ):
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if memory_limit is None:
+            available = available_memory()
+            memory_limit = (
+                math.inf if available is None else available * MEMORY_FRACTION
+            )
+        self.workers = workers
+        self.memory_limit = memory_limit
+        self.pending = order_jobs(jobs)
+        self.running = 0
+        self.memory = 0.0
+
+    def take(self) -> Optional[Job]:
+        """Take the next job, which can be started now, and count it as running.
+
+        Returns:
+            Optional[Job]: The longest pending job, which fits into the limits,
+                None if no job can be started.
+        """
+        if not self.pending or self.running >= self.workers:
+            return None
+        for index, job in enumerate(self.pending):
+            if not self.running or self.memory + job.memory <= self.memory_limit:
+                self.running += 1
+                self.memory += job.memory
+                return self.pending.pop(index)
+        return None
+
+    def release(self, job: Job) -> None:
+        """Count the taken job as finished.
+
+        Args:
+            job (Job): Job returned by `take`.
+        """
+        self.running -= 1
+        self.memory -= job.memory
+
+    def put_back(self, job: Job) -> None:
+        """Return the released job to pending ones, e.g. for a retry.
+
+        Args:
+            job (Job): Job for the next start.
+        """
+        self.pending = order_jobs(self.pending + [job])
+
+
+def run_jobs(
+    jobs: Sequence[Job],
+    run: Callable[[Job], Any],
+    workers: Optional[int] = None,
+    memory_limit: Optional[float] = None,
+) -> None:
+    """Run all jobs in threads longest first, within limits of workers and memory.
+
+    Args:
+        jobs (Sequence[Job]): Jobs of the sweep.
+        run (Callable[[Job], Any]): Function running one job, e.g. a simulation process.
+        workers (Optional[int], optional): Maximal number of running jobs,
+                                           all CPUs if None. Defaults to None.
+        memory_limit (Optional[float], optional): Memory for all running jobs in bytes,
+            a fraction of the available memory if None. Defaults to None.
+    """
+    queue = JobQueue(jobs, workers, memory_limit)
+    condition = threading.Condition()
+    errors: List[BaseException] = []
+
+    def run_job(job: Job) -> None:
+        try:
+            run(job)
+        except BaseException as error:  # pylint: disable=broad-except
+            errors.append(error)
+        finally:
+            with condition:
+                queue.release(job)
+                condition.notify_all()
+
+    threads = []
+    with condition:
+        while queue.pending and not errors:
+            job = queue.take()
+            if job is None:
+                condition.wait()
+                continue
+            thread = threading.Thread(target=run_job, args=(job,), daemon=True)
+            thread.start()
+            threads.append(thread)
+
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
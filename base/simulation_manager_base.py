@@ -6,9 +6,21 @@ Date: 14.3.2023
 """
 import random
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Optional, Set
+from bisect import bisect
+from itertools import accumulate
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
 
+from base.event_tape import EventTape, EventTapeWriter, RecordingRandom, ReplayRandom
+from base.fork_stats import ForkStatistics
 from base.logs import create_logger
+from base.miner_base import MinerStrategyBase, SelfishMinerStrategyBase
+from base.online_stats import CONFIDENCE, ShareMonitor
+from base.profiling import PhaseProfiler
+from base.progress import ProgressReporter
+from base.results import SimulationResult
+from base.revenue_series import RevenueSeries
+from base.rng import SeedSequence
+from base.state_trace import TRACE_CAPACITY, StateTrace
 
 
 class ActionObjectStore:
@@ -82,12 +94,316 @@ class ActionObjectStore:
         self._all_actions.clear()
 
 
+class ActionIndex:
+    """Action store maintained incrementally, a replacement of ActionObjectStore.
+
+    Decided actions of objects are carried forward until they are set again,
+    so only objects with changed actions are updated. Objects of an action are
+    listed in the order given at the creation, like objects added to ActionObjectStore
+    in that order. Objects removed from lists (by `remove_object` or directly from
+    the returned list) are listed again after `refresh`, which corresponds to
+    the clearing of ActionObjectStore followed by adding all objects again.
+
+    Attributes:
+        _positions (Dict[Any, int]): Positions of objects in the listing order.
+        _actions (Dict[Any, Any]): Decided actions keyed by objects.
+        _members (Dict[Any, Dict[Any, None]]): Objects keyed by their decided actions.
+        _store (Dict[Any, List[Any]]): Lists of objects keyed by actions, created
+                                       on request and kept until `refresh`.
+    """
+
+    def __init__(self, objects: Sequence[Any]):
+        self._positions: Dict[Any, int] = {
+            obj: position for position, obj in enumerate(objects)
+        }
+        self._actions: Dict[Any, Any] = {}
+        self._members: Dict[Any, Dict[Any, None]] = {}
+        self._store: Dict[Any, List[Any]] = {}
+
+    def set_action(self, obj: Any, action: Any) -> None:
+        """Set the decided action of the object.
+
+        Args:
+            obj (Any): One of objects given at the creation.
+            action (Any): The new action of the object.
+        """
+        previous = self._actions.get(obj)
+        if previous == action:
+            return
+        if previous is not None:
+            del self._members[previous][obj]
+            self._store.pop(previous, None)
+        self._actions[obj] = action
+        self._members.setdefault(action, {})[obj] = None
+        self._store.pop(action, None)
+
+    def add_object(self, action: Any, obj: Any = None) -> None:
+        """Set the decided action of the object, see `set_action`.
+
+        Args:
+            action (Any): The new action of the object.
+            obj (Any, optional): One of objects given at the creation. Defaults to None.
+        """
+        self.set_action(obj, action)
+
+    def remove_object(self, action: Any, obj: Any = None) -> None:
+        """Remove the object from the list of the action until the next `refresh`.
+
+        Args:
+            action (Any): The action associated with the object.
+            obj (Any, optional): The object to remove. Defaults to None.
+        """
+        objects = self.get_objects(action)
+        if obj in objects:
+            objects.remove(obj)
+
+    def get_objects(self, action: Any) -> List:
+        """Retrieve a list of objects associated with the given action.
+
+        Args:
+            action (Any): The action to retrieve objects for.
+
+        Returns:
+            List: List of objects in the order given at the creation.
+        """
+        objects = self._store.get(action)
+        if objects is None:
+            objects = sorted(
+                self._members.get(action, ()), key=self._positions.__getitem__
+            )
+            self._store[action] = objects
+        return objects
+
+    def get_actions(self) -> List:
+        """Retrieve the list of decided actions of all objects.
+
+        Returns:
+            List: List of distinct actions.
+        """
+        return [action for action, members in self._members.items() if members]
+
+    def refresh(self) -> None:
+        """List objects removed from lists of their actions again."""
+        # lists only shrink by removals, complete lists are kept
+        members = self._members
+        shortened = [
+            action
+            for action, objects in self._store.items()
+            if action not in members or len(objects) != len(members[action])
+        ]
+        for action in shortened:
+            del self._store[action]
+
+    def clear(self) -> None:
+        """Forget decided actions of all objects."""
+        self._actions.clear()
+        self._members.clear()
+        self._store.clear()
+
+
 class SimulationManagerBase(ABC):
-    """Abstract base class for all blockchain simulation managers."""
+    """Abstract base class for all blockchain simulation managers.
+
+    Attributes:
+        log (LazyLogger): Logger of the simulation manager.
+        config (Any): Parsed simulation config.
+        miners (List[MinerStrategyBase]): All miners of the simulation, the honest
+                                          miner first. Protocols fill it in their
+                                          constructors after this one.
+        selfish_miners (List[SelfishMinerStrategyBase]): Selfish miners of `miners`.
+        progress (ProgressReporter): Progress reporter, which should be updated
+                                     with the number of finished rounds.
+        seed_sequence (SeedSequence): Node of the seed tree, which identifies
+                                      the random stream of the simulation.
+        rng (random.Random): Random generator of the simulation shared with miners.
+        leader_rng (random.Random): Random generator of leader choices.
+        block_type_rng (random.Random): Random generator of block type draws
+                                        (weak/strong, fruit/block).
+        leader_source (Callable[[List[Any], List[float]], Any]): Source of leaders
+            selected by `choose_leader`, `draw_leader` by default. Event tapes
+            replace it to record or replay leaders.
+        share_monitor (Optional[ShareMonitor]): Online confidence intervals of shares,
+                                                None if they are not requested.
+        simulated_rounds (int): Number of simulated rounds, which is lower than
+                                the configured one if the simulation stops early.
+        revenue_series (Optional[RevenueSeries]): Windowed revenue time series,
+                                                  None if it is not recorded.
+        fork_stats (Optional[ForkStatistics]): Fork statistics, None if they are not enabled.
+        state_trace (Optional[StateTrace]): Ring buffer with last states, None if
+                                            it is not enabled.
+        observed (bool): Some observer of rounds is enabled, so `observe_round`
+                         has to be called after every round.
+        PROFILED_METHODS (Tuple[str, ...]): Methods of the manager timed by profiling.
+        PROFILED_MINER_METHODS (Tuple[str, ...]): Methods of miners timed by profiling.
+    """
+
+    PROFILED_METHODS: Tuple[str, ...] = (
+        "run_simulation",
+        "choose_leader",
+        "resolve_overrides",
+        "resolve_matches",
+    )
+    PROFILED_MINER_METHODS: Tuple[str, ...] = ("mine_new_block",)
 
-    def __init__(self, simulation_config: Dict[str, Any], blockchain: str):
+    def __init__(
+        self,
+        simulation_config: Dict[str, Any],
+        blockchain: str,
+        seed_sequence: Optional[SeedSequence] = None,
+    ):
         self.log = create_logger(blockchain)
+        self.seed_sequence = (
+            seed_sequence if seed_sequence is not None else SeedSequence()
+        )
+        self.rng = self.seed_sequence.generator()
+        # Leader choices and block type draws have their own streams, so runs with
+        # common random numbers consume the same uniforms even if their other
+        # decisions (e.g. tie-breaks) differ. Antithetic runs mirror these streams.
+        self.leader_rng = self.seed_sequence.generator("leader", mirrored=True)
+        self.block_type_rng = self.seed_sequence.generator("block_type", mirrored=True)
+        self._leader_weights: Optional[List[float]] = None
+        self._leader_cum_weights: List[float] = []
+        self.leader_source: Callable[[List[Any], List[float]], Any] = self.draw_leader
         self.config: Dict[str, Any] = self.__call_parse_config(simulation_config)
+        self.miners: List[MinerStrategyBase] = []
+        self.selfish_miners: List[SelfishMinerStrategyBase] = []
+        self.progress = ProgressReporter(
+            total=self.config.simulation_mining_rounds,
+            label=self.config.consensus_name,
+            mode=getattr(blockchain, "progress", None) or "auto",
+        )
+        precision = getattr(blockchain, "precision", None)
+        self.share_monitor: Optional[ShareMonitor] = None
+        if precision is not None or getattr(blockchain, "ci", False):
+            self.share_monitor = ShareMonitor(
+                precision, getattr(blockchain, "confidence", CONFIDENCE)
+            )
+        self.simulated_rounds = self.config.simulation_mining_rounds
+        series_interval = getattr(blockchain, "series", None)
+        self.revenue_series: Optional[RevenueSeries] = None
+        if series_interval:
+            self.revenue_series = RevenueSeries(
+                series_interval, self.config.simulation_mining_rounds
+            )
+        self.fork_stats: Optional[ForkStatistics] = None
+        self.state_trace: Optional[StateTrace] = None
+        self._miner_positions: Dict[int, int] = {}
+        self.observed = (
+            self.share_monitor is not None or self.revenue_series is not None
+        )
+
+    def enable_profiling(self, profiler: PhaseProfiler) -> None:
+        """Time all profiled methods of the manager and its miners.
+
+        It has to be called after the manager is fully initialized,
+        because miners are replaced in constructors of some protocols.
+
+        Args:
+            profiler (PhaseProfiler): Profiler accumulating time of all phases.
+        """
+        profiler.instrument(self, self.PROFILED_METHODS)
+        for miner in self.miners:
+            profiler.instrument(miner, self.PROFILED_MINER_METHODS, prefix="miner.")
+
+    def enable_fork_statistics(self) -> ForkStatistics:
+        """Record forks, reorganizations and orphaned blocks of the run.
+
+        It has to be called after the manager is fully initialized,
+        because miners are replaced in constructors of some protocols.
+
+        Returns:
+            ForkStatistics: Statistics updated during the run.
+        """
+        self.fork_stats = ForkStatistics(miner.miner_id for miner in self.miners)
+        self.fork_stats.instrument(self)
+        self.observed = True
+        return self.fork_stats
+
+    def enable_state_trace(self, capacity: int = TRACE_CAPACITY) -> StateTrace:
+        """Record states of last rounds into the ring buffer.
+
+        It has to be called after the manager is fully initialized,
+        because miners are replaced in constructors of some protocols.
+
+        Args:
+            capacity (int, optional): Number of kept rounds. Defaults to 100 000.
+
+        Returns:
+            StateTrace: Trace updated during the run.
+        """
+        self.state_trace = StateTrace(len(self.selfish_miners), capacity)
+        self._miner_positions = {
+            miner.miner_id: index for index, miner in enumerate(self.miners)
+        }
+        self.observed = True
+        return self.state_trace
+
+    @property
+    def protocol(self) -> str:
+        """Name of the simulated protocol stored in event tapes, e.g. `subchain.weak`."""
+        return type(self).__module__.rsplit(".", 1)[0]
+
+    def record_event_tape(self, path: str) -> EventTapeWriter:
+        """Record all random events of the run to the event tape.
+
+        It has to be called after the manager is fully initialized, the returned
+        writer has to be closed after the run.
+
+        Args:
+            path (str): Path to the tape.
+
+        Returns:
+            EventTapeWriter: Writer of the tape.
+        """
+        tape = EventTapeWriter(path, self.protocol, len(self.miners))
+        leader_source = self.leader_source
+        record_leader = tape.leaders.append
+
+        def recorded_leader_source(choices, weights):
+            leader = leader_source(choices, weights)
+            record_leader(choices.index(leader))
+            return leader
+
+        self.leader_source = recorded_leader_source
+        self.block_type_rng = RecordingRandom(self.block_type_rng, tape.block_types)
+        self._replace_rng(RecordingRandom(self.rng, tape.tie_breaks))
+        return tape
+
+    def replay_event_tape(self, tape: EventTape) -> None:
+        """Draw random events of the run from the event tape instead of generators.
+
+        It has to be called after the manager is fully initialized.
+
+        Args:
+            tape (EventTape): Tape with the same number of miners.
+
+        Raises:
+            ValueError: If the tape was recorded with a different number of miners.
+        """
+        if tape.miners != len(self.miners):
+            raise ValueError(
+                f"Event tape has {tape.miners} miners, but the simulation has "
+                f"{len(self.miners)} miners"
+            )
+
+        leaders = tape.draws("leaders")
+
+        def replayed_leader_source(choices, _weights):
+            index = next(leaders, None)
+            if index is None:
+                raise ValueError("Event tape has no more leader draws")
+            return choices[index]
+
+        self.leader_source = replayed_leader_source
+        if tape.counts["block_types"]:
+            self.block_type_rng = ReplayRandom(tape.draws("block_types"), "block type")
+        if tape.protocol == self.protocol:
+            self._replace_rng(ReplayRandom(tape.draws("tie_breaks"), "tie-break"))
+
+    def _replace_rng(self, rng: random.Random) -> None:
+        self.rng = rng
+        for miner in self.miners:
+            miner.rng = rng
 
     @abstractmethod
     def parse_config(self, simulation_config: Dict[str, Any]) -> Dict[str, Any]:
@@ -102,8 +418,12 @@ class SimulationManagerBase(ABC):
         raise NotImplementedError
 
     @abstractmethod
-    def run(self) -> None:
-        """Run the simulation."""
+    def run(self) -> SimulationResult:
+        """Run the simulation.
+
+        Returns:
+            SimulationResult: Structured result of the simulation.
+        """
         raise NotImplementedError
 
     @abstractmethod
@@ -116,10 +436,27 @@ class SimulationManagerBase(ABC):
         """Resolve the 'match' actions in the simulation."""
         raise NotImplementedError
 
-    @staticmethod
-    def choose_leader(choices: List[Any], weights: List[float]) -> Any:
+    def choose_leader(self, choices: List[Any], weights: List[float]) -> Any:
         """Select a leader for the current round according to the given weights.
 
+        The leader is taken from `leader_source`.
+
+        Args:
+            choices (List[Any]): List of possible leaders.
+            weights (List[float]): List of weights for each leader.
+
+        Returns:
+            Any: The selected leader.
+        """
+        return self.leader_source(choices, weights)
+
+    def draw_leader(self, choices: List[Any], weights: List[float]) -> Any:
+        """Draw a leader from the leader random generator according to the weights.
+
+        Leader is selected by the inverse CDF of one uniform number, so for the same
+        number the leader changes monotonically with mining powers. Cumulative weights
+        are cached for the same list of weights.
+
         Args:
             choices (List[Any]): List of possible leaders.
             weights (List[float]): List of weights for each leader.
@@ -127,7 +464,15 @@ class SimulationManagerBase(ABC):
         Returns:
             Any: The selected leader.
         """
-        return random.choices(choices, weights, k=1)[0]
+        if weights is not self._leader_weights:
+            self._leader_weights = weights
+            self._leader_cum_weights = list(accumulate(weights))
+        cum_weights = self._leader_cum_weights
+
+        uniform = self.leader_rng.random()
+        return choices[
+            bisect(cum_weights, uniform * cum_weights[-1], 0, len(cum_weights) - 1)
+        ]
 
     def validate_blockchain_config_keys(
         self, dictionary: Dict[str, Any], expected_keys: Set[str]
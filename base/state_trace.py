@@ -0,0 +1,150 @@
+"""Module contains bounded ring-buffer trace of simulation states.
+
+Every round one fixed-size record is packed into a preallocated buffer, which
+keeps just the last `capacity` rounds:
+
++ `round` -- number of finished rounds
++ `leader` -- position of the leader of the round (0 is the honest miner)
++ `action` -- value of the action of the leader after the round (-1 for none)
++ `ongoing_fork` -- there is an ongoing fork
++ `public_length` -- length of the public blockchain
++ `leads` -- lead of every selfish miner over the public blockchain (0 without private chain)
+
+The trace is dumped to a binary file when the simulation fails or on demand
+(e.g. on `SIGUSR1`), so there is post-mortem context of long runs without logging.
+The file starts with a header describing the record format and contains records
+from the oldest one, `load_trace` reads it back.
+"""
+import struct
+from typing import Any, Dict, List, Optional, Sequence
+
+# Magic bytes and version of trace files
+TRACE_MAGIC = b"SMTRACE1"
+
+# Header: magic, number of selfish miners, capacity, number of records
+_HEADER = struct.Struct("<8sIQQ")
+
+# Default number of recorded rounds
+TRACE_CAPACITY = 100_000
+
+
+def _record_struct(selfish_miners: int) -> struct.Struct:
+    return struct.Struct(f"<qhb?q{selfish_miners}i")
+
+
+class StateTrace:
+    """Ring buffer with the last states of one simulation.
+
+    Attributes:
+        capacity (int): Maximal number of kept records.
+        selfish_miners (int): Number of selfish miners.
+        count (int): Number of all records, including the overwritten ones.
+        requested_path (Optional[str]): Path of the dump requested by `request_dump`.
+    """
+
+    def __init__(self, selfish_miners: int, capacity: int = TRACE_CAPACITY):
+        self.capacity = capacity
+        self.selfish_miners = selfish_miners
+        self.count = 0
+        self._record = _record_struct(selfish_miners)
+        self._buffer = bytearray(self._record.size * capacity)
+        self.requested_path: Optional[str] = None
+
+    # pylint: disable=too-many-arguments
+    def record(
+        self,
+        rounds: int,
+        leader: int,
+        action: int,
+        ongoing_fork: bool,
+        public_length: int,
+        leads: Sequence[int],
+    ) -> None:
+        """Record the state after one round, the oldest record is overwritten if full.
+
+        Args:
+            rounds (int): Number of finished rounds.
+            leader (int): Position of the leader of the round.
+            action (int): Value of the action of the leader, -1 for none.
+            ongoing_fork (bool): There is an ongoing fork.
+            public_length (int): Length of the public blockchain.
+            leads (Sequence[int]): Leads of all selfish miners.
+        """
+        self._record.pack_into(
+            self._buffer,
+            (self.count % self.capacity) * self._record.size,
+            rounds,
+            leader,
+            action,
+            ongoing_fork,
+            public_length,
+            *leads,
+        )
+        self.count += 1
+        if self.requested_path is not None:
+            self.dump(self.requested_path)
+            self.requested_path = None
+
+    def request_dump(self, path: str) -> None:
+        """Dump the trace after the next record, e.g. from a signal handler.
+
+        Signal handlers can interrupt `record` between writing the record
+        and updating the counter, so they must not dump the trace directly.
+
+        Args:
+            path (str): Path to the output file.
+        """
+        self.requested_path = path
+
+    def dump(self, path: str) -> None:
+        """Write kept records from the oldest one to the binary file.
+
+        Args:
+            path (str): Path to the output file.
+        """
+        kept = min(self.count, self.capacity)
+        size = self._record.size
+        start = (self.count - kept) % self.capacity * size
+        end = kept * size
+        with open(path, "wb") as file:
+            file.write(
+                _HEADER.pack(TRACE_MAGIC, self.selfish_miners, self.capacity, kept)
+            )
+            # records wrap around the end of the buffer
+            file.write(self._buffer[start : start + end])
+            file.write(self._buffer[: max(start + end - len(self._buffer), 0)])
+
+
+def load_trace(path: str) -> List[Dict[str, Any]]:
+    """Load records of the trace file.
+
+    Args:
+        path (str): Path to the file written by `StateTrace.dump`.
+
+    Returns:
+        List[Dict[str, Any]]: Records from the oldest one.
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+
+    magic, selfish_miners, _, count = _HEADER.unpack_from(data)
+    if magic != TRACE_MAGIC:
+        raise ValueError(f"{path} is not a state trace file")
+
+    record = _record_struct(selfish_miners)
+    records = []
+    for values in record.iter_unpack(
+        data[_HEADER.size : _HEADER.size + count * record.size]
+    ):
+        records.append(
+            {
+                "round": values[0],
+                "leader": values[1],
+                "action": values[2],
+                "ongoing_fork": values[3],
+                "public_length": values[4],
+                "leads": list(values[5:]),
+            }
+        )
+
+    return records
@@ -0,0 +1,392 @@
+"""Module contains work queues of sweeps distributed over many hosts.
+
+The submitter puts jobs into the queue, workers on any hosts claim them, run them
+and push their records back, and the submitter collects the records:
+
++ `DirectoryWorkQueue` -- a directory on a shared filesystem, where every job,
+  claim and record is a file. A job is claimed by the atomic rename of its file
+  from `pending` to `claimed`, so it is claimed by just one worker
++ `BrokerWorkQueue` -- a client of `WorkQueueBroker`, which keeps the queue
+  in memory of one process and serves it over TCP with newline-delimited JSON
+
+Workers prolong claims of running jobs by heartbeats. Claims without heartbeats
+for `lease` seconds (e.g. of crashed workers) are returned to pending jobs, so jobs
+are run at least once and a record of a job may be delivered twice. The queue
+is closed by the submitter once all records are collected, then workers exit.
+
+Both backends can be run on one host, e.g. with several worker processes:
+
+    python main.py broker --port 8766 &
+    python main.py worker tcp://127.0.0.1:8766 --processes 4
+"""
+import json
+import os
+import re
+import socket
+import socketserver
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+# Seconds after which claims without heartbeats are returned to pending jobs
+DEFAULT_LEASE = 60.0
+
+# Allowed job IDs, they are also names of files of the directory queue
+_JOB_ID = re.compile(r"[\w.-]+")
+
+
+def _check_job_id(job_id: str) -> None:
+    if not _JOB_ID.fullmatch(job_id):
+        raise ValueError(f"Invalid job ID {job_id!r}, allowed are [A-Za-z0-9_.-]")
+
+
+class WorkQueueBase(ABC):
+    """Abstract base class of all work queues.
+
+    Jobs and records are JSON serializable dictionaries.
+    """
+
+    @abstractmethod
+    def submit(self, job_id: str, job: Dict[str, Any]) -> None:
+        """Add the job to pending jobs.
+
+        Args:
+            job_id (str): Unique ID of the job.
+            job (Dict[str, Any]): Job for workers.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def claim(self, worker_id: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Claim one pending job.
+
+        Args:
+            worker_id (str): ID of the claiming worker.
+
+        Returns:
+            Optional[Tuple[str, Dict[str, Any]]]: ID and the job, None if no job is pending.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def heartbeat(self, job_id: str, worker_id: str) -> None:
+        """Prolong the claim of the running job.
+
+        Args:
+            job_id (str): ID of the claimed job.
+            worker_id (str): ID of the worker.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def complete(self, job_id: str, worker_id: str, record: Dict[str, Any]) -> None:
+        """Push the record of the finished job and drop its claim.
+
+        Args:
+            job_id (str): ID of the claimed job.
+            worker_id (str): ID of the worker.
+            record (Dict[str, Any]): Record of the job, e.g. its results or error.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def collect(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """Take records of finished jobs out of the queue.
+
+        Returns:
+            List[Tuple[str, Dict[str, Any]]]: IDs and records of finished jobs.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def requeue_stale(self, lease: float = DEFAULT_LEASE) -> int:
+        """Return claims without heartbeats for `lease` seconds to pending jobs.
+
+        Args:
+            lease (float, optional): Lease of claims in seconds.
+                                     Defaults to DEFAULT_LEASE.
+
+        Returns:
+            int: Number of returned jobs.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def close(self) -> None:
+        """Close the queue, so workers exit once there are no pending jobs."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def is_closed(self) -> bool:
+        """Check if the queue was closed.
+
+        Returns:
+            bool: True if the queue is closed.
+        """
+        raise NotImplementedError
+
+
+class DirectoryWorkQueue(WorkQueueBase):
+    """Work queue in a directory shared by all hosts.
+
+    Attributes:
+        path (str): Path to the directory with `pending`, `claimed` and `done`
+                    subdirectories.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        for name in ("pending", "claimed", "done"):
+            os.makedirs(os.path.join(path, name), exist_ok=True)
+
+    def _file(self, state: str, name: str) -> str:
+        return os.path.join(self.path, state, name)
+
+    def _write(self, path: str, data: Dict[str, Any]) -> None:
+        # files are renamed into place when they are complete, like result shards
+        partial_path = f"{path}.{uuid.uuid4().hex}.partial"
+        with open(partial_path, "w") as file:
+            json.dump(data, file)
+        os.replace(partial_path, path)
+
+    def submit(self, job_id: str, job: Dict[str, Any]) -> None:
+        _check_job_id(job_id)
+        self._write(self._file("pending", job_id + ".json"), job)
+
+    def claim(self, worker_id: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        _check_job_id(worker_id)
+        for name in sorted(os.listdir(os.path.join(self.path, "pending"))):
+            if not name.endswith(".json"):
+                continue
+            job_id = name[: -len(".json")]
+            claimed_path = self._file("claimed", f"{job_id}@{worker_id}.json")
+            try:
+                # only one of the workers renaming the same file succeeds
+                os.rename(self._file("pending", name), claimed_path)
+            except FileNotFoundError:
+                continue
+            # the modification time of the claim is the time of its last heartbeat
+            os.utime(claimed_path)
+            with open(claimed_path, "r") as file:
+                return job_id, json.load(file)
+        return None
+
+    def heartbeat(self, job_id: str, worker_id: str) -> None:
+        try:
+            os.utime(self._file("claimed", f"{job_id}@{worker_id}.json"))
+        except FileNotFoundError:
+            # the claim was requeued, the job is finished anyway
+            pass
+
+    def complete(self, job_id: str, worker_id: str, record: Dict[str, Any]) -> None:
+        self._write(self._file("done", job_id + ".json"), record)
+        try:
+            os.remove(self._file("claimed", f"{job_id}@{worker_id}.json"))
+        except FileNotFoundError:
+            pass
+
+    def collect(self) -> List[Tuple[str, Dict[str, Any]]]:
+        records = []
+        for name in sorted(os.listdir(os.path.join(self.path, "done"))):
+            if not name.endswith(".json"):
+                continue
+            path = self._file("done", name)
+            with open(path, "r") as file:
+                records.append((name[: -len(".json")], json.load(file)))
+            os.remove(path)
+        return records
+
+    def requeue_stale(self, lease: float = DEFAULT_LEASE) -> int:
+        requeued = 0
+        now = time.time()
+        for name in os.listdir(os.path.join(self.path, "claimed")):
+            path = self._file("claimed", name)
+            try:
+                if now - os.path.getmtime(path) < lease:
+                    continue
+                os.rename(path, self._file("pending", name.split("@", 1)[0] + ".json"))
+            except FileNotFoundError:
+                continue
+            requeued += 1
+        return requeued
+
+    def close(self) -> None:
+        with open(os.path.join(self.path, "CLOSED"), "w"):
+            pass
+
+    def is_closed(self) -> bool:
+        return os.path.exists(os.path.join(self.path, "CLOSED"))
+
+
+class WorkQueueBroker:
+    """In-memory work queue served over TCP.
+
+    Attributes:
+        host (str): Address of the broker, use `0.0.0.0` for workers on other hosts.
+        port (int): TCP port of the broker (0 selects a free one).
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self._pending: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # claimed jobs with their worker and the time of the last heartbeat
+        self._claimed: Dict[str, Tuple[Dict[str, Any], str, float]] = {}
+        self._done: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._closed = False
+        self._lock = threading.Lock()
+
+        broker = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            """Handler of one connection with a request per line."""
+
+            def handle(self) -> None:
+                for line in self.rfile:
+                    try:
+                        response = broker.handle(json.loads(line))
+                    except (ValueError, KeyError, TypeError) as error:
+                        response = {"error": str(error)}
+                    self.wfile.write(json.dumps(response).encode() + b"\n")
+
+        self._server = socketserver.ThreadingTCPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self.host, self.port = self._server.server_address[:2]
+
+    def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply the request of a client to the queue.
+
+        Args:
+            request (Dict[str, Any]): Request with the `op` name and its arguments.
+
+        Returns:
+            Dict[str, Any]: Response for the client.
+        """
+        # pylint: disable=too-many-return-statements
+        operation = request["op"]
+        with self._lock:
+            if operation == "submit":
+                _check_job_id(request["job_id"])
+                self._pending[request["job_id"]] = request["job"]
+                return {}
+            if operation == "claim":
+                if not self._pending:
+                    return {"job_id": None}
+                job_id, job = self._pending.popitem(last=False)
+                self._claimed[job_id] = (job, request["worker_id"], time.monotonic())
+                return {"job_id": job_id, "job": job}
+            if operation == "heartbeat":
+                claim = self._claimed.get(request["job_id"])
+                if claim is not None and claim[1] == request["worker_id"]:
+                    self._claimed[request["job_id"]] = claim[:2] + (time.monotonic(),)
+                return {}
+            if operation == "complete":
+                self._done[request["job_id"]] = request["record"]
+                claim = self._claimed.get(request["job_id"])
+                if claim is not None and claim[1] == request["worker_id"]:
+                    del self._claimed[request["job_id"]]
+                return {}
+            if operation == "collect":
+                records = list(self._done.items())
+                self._done.clear()
+                return {"records": records}
+            if operation == "requeue_stale":
+                deadline = time.monotonic() - request["lease"]
+                stale = [
+                    job_id
+                    for job_id, (_, _, heartbeat) in self._claimed.items()
+                    if heartbeat < deadline
+                ]
+                for job_id in stale:
+                    self._pending[job_id] = self._claimed.pop(job_id)[0]
+                return {"requeued": len(stale)}
+            if operation == "close":
+                self._closed = True
+                return {}
+            if operation == "is_closed":
+                return {"closed": self._closed}
+        raise ValueError(f"Unknown operation {operation!r}")
+
+    def serve_forever(self) -> None:
+        """Serve clients until the broker is shut down."""
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def shutdown(self) -> None:
+        """Stop `serve_forever` running in another thread."""
+        self._server.shutdown()
+
+
+class BrokerWorkQueue(WorkQueueBase):
+    """Client of `WorkQueueBroker` with one connection shared by threads.
+
+    Attributes:
+        host (str): Address of the broker.
+        port (int): TCP port of the broker.
+    """
+
+    def __init__(self, host: str, port: int, timeout: Optional[float] = None):
+        self.host = host
+        self.port = port
+        self._connection = socket.create_connection((host, port), timeout)
+        self._file = self._connection.makefile("rwb")
+        self._lock = threading.Lock()
+
+    def _request(self, operation: str, **arguments: Any) -> Dict[str, Any]:
+        with self._lock:
+            self._file.write(json.dumps({"op": operation, **arguments}).encode())
+            self._file.write(b"\n")
+            self._file.flush()
+            line = self._file.readline()
+        if not line:
+            raise ConnectionError(f"Broker {self.host}:{self.port} closed connection")
+        response = json.loads(line)
+        if "error" in response:
+            raise ValueError(response["error"])
+        return response
+
+    def submit(self, job_id: str, job: Dict[str, Any]) -> None:
+        _check_job_id(job_id)
+        self._request("submit", job_id=job_id, job=job)
+
+    def claim(self, worker_id: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        response = self._request("claim", worker_id=worker_id)
+        if response["job_id"] is None:
+            return None
+        return response["job_id"], response["job"]
+
+    def heartbeat(self, job_id: str, worker_id: str) -> None:
+        self._request("heartbeat", job_id=job_id, worker_id=worker_id)
+
+    def complete(self, job_id: str, worker_id: str, record: Dict[str, Any]) -> None:
+        self._request("complete", job_id=job_id, worker_id=worker_id, record=record)
+
+    def collect(self) -> List[Tuple[str, Dict[str, Any]]]:
+        return [tuple(record) for record in self._request("collect")["records"]]
+
+    def requeue_stale(self, lease: float = DEFAULT_LEASE) -> int:
+        return self._request("requeue_stale", lease=lease)["requeued"]
+
+    def close(self) -> None:
+        self._request("close")
+
+    def is_closed(self) -> bool:
+        return self._request("is_closed")["closed"]
+
+
+def open_work_queue(url: str) -> WorkQueueBase:
+    """Open the work queue by its URL.
+
+    Args:
+        url (str): `tcp://host:port` of the broker or path to the shared directory.
+
+    Returns:
+        WorkQueueBase: Work queue of the URL.
+    """
+    if url.startswith("tcp://"):
+        host, _, port = url[len("tcp://") :].rpartition(":")
+        return BrokerWorkQueue(host or "127.0.0.1", int(port))
+    return DirectoryWorkQueue(url)
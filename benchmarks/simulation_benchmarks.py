@@ -0,0 +1,352 @@
+"""Benchmark suite of simulation throughput and memory for all protocols.
+
+Every benchmark case runs in a fresh process with a fixed seed, so results are
+repeatable and peak RSS is not affected by other cases. Measured values are:
+
++ `rounds_per_sec` -- simulated mining rounds per second of the whole `run()`
++ `peak_rss_kb` -- peak resident set size of the benchmark process
++ `allocated_blocks_per_round` -- growth of memory blocks allocated by Python per round
+
+Records of all cases are appended to a JSONL file together with the git revision,
+so runs can be compared over time:
+
+Usage:
+    python benchmarks/simulation_benchmarks.py --output benchmarks/results.jsonl
+    python benchmarks/simulation_benchmarks.py --cases nakamoto-1sm strongchain-r10
+    python benchmarks/simulation_benchmarks.py --compare benchmarks/results.jsonl
+"""
+import argparse
+import contextlib
+import gc
+import importlib
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import Namespace
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def simulation_config(
+    consensus_name: str,
+    honest: float,
+    selfish: List[float],
+    rounds: int,
+    **extra: Any,
+) -> Dict[str, Any]:
+    """Create simulation config in the same format as entries of YAML configs.
+
+    Args:
+        consensus_name (str): Name of the consensus protocol.
+        honest (float): Mining power of the honest miner.
+        selfish (List[float]): Mining powers of selfish miners.
+        rounds (int): Number of simulation mining rounds.
+        **extra (Any): Protocol specific keys, e.g. `gamma`.
+
+    Returns:
+        Dict[str, Any]: Simulation config.
+    """
+    config = {
+        "consensus_name": consensus_name,
+        "miners": {
+            "honest": {"mining_power": honest},
+            "selfish": [{"mining_power": power} for power in selfish],
+        },
+        "simulation_mining_rounds": rounds,
+    }
+    config.update(extra)
+    return {"simulation1": config}
+
+
+# Representative configs: one to hundreds of attackers, various gammas and weak ratios
+BENCHMARK_CASES: Dict[str, Dict[str, Any]] = {
+    "nakamoto-1sm": {
+        "module": "nakamoto",
+        "config": simulation_config("Nakamoto", 60, [40], 100_000, gamma=0.5),
+    },
+    "nakamoto-3sm": {
+        "module": "nakamoto",
+        "config": simulation_config("Nakamoto", 55, [15, 15, 15], 100_000, gamma=0.5),
+    },
+    "nakamoto-gamma0": {
+        "module": "nakamoto",
+        "config": simulation_config("Nakamoto", 60, [40], 100_000, gamma=0),
+    },
+    "nakamoto-gamma1": {
+        "module": "nakamoto",
+        "config": simulation_config("Nakamoto", 60, [40], 100_000, gamma=1),
+    },
+    "nakamoto-256sm": {
+        "module": "nakamoto",
+        "config": simulation_config(
+            "Nakamoto", 60, [40 / 256] * 256, 20_000, gamma=0.5
+        ),
+    },
+    "subchain-weak-r4": {
+        "module": "subchain.weak",
+        "config": simulation_config(
+            "Subchain", 51, [49], 100_000, gamma=0.5, weak_to_strong_block_ratio=4
+        ),
+    },
+    "subchain-weak-r20-2sm": {
+        "module": "subchain.weak",
+        "config": simulation_config(
+            "Subchain", 60, [20, 20], 100_000, gamma=0.5, weak_to_strong_block_ratio=20
+        ),
+    },
+    "subchain-strong-r4": {
+        "module": "subchain.strong",
+        "config": simulation_config(
+            "Subchain", 72.5, [27.5], 100_000, gamma=0.5, weak_to_strong_block_ratio=4
+        ),
+    },
+    "strongchain-r10": {
+        "module": "strongchain",
+        "config": simulation_config(
+            "Strongchain", 54, [46], 20_000, weak_to_strong_header_ratio=10
+        ),
+    },
+    "strongchain-r100-2sm": {
+        "module": "strongchain",
+        "config": simulation_config(
+            "Strongchain", 60, [20, 20], 20_000, weak_to_strong_header_ratio=100
+        ),
+    },
+    "fruitchain-2sm": {
+        "module": "fruitchain",
+        "config": simulation_config(
+            "Fruitchain",
+            30,
+            [35, 35],
+            5_000,
+            gamma=0.5,
+            fruit_mine_prob=0.9090909090909091,
+            superblock_prob=0.09090909090909091,
+        ),
+    },
+}
+
+
+def run_case(case: str, seed: int, rounds_scale: float) -> Dict[str, Any]:
+    """Run one benchmark case in the current process.
+
+    Args:
+        case (str): Name of the benchmark case.
+        seed (int): Seed of the random generator.
+        rounds_scale (float): Multiplier of the number of rounds of the case.
+
+    Returns:
+        Dict[str, Any]: Measured values of the case.
+    """
+    sys.path.insert(0, REPO_ROOT)
+    spec = BENCHMARK_CASES[case]
+    config = json.loads(json.dumps(spec["config"]))
+    sim_config = config["simulation1"]
+    sim_config["simulation_mining_rounds"] = max(
+        1, int(sim_config["simulation_mining_rounds"] * rounds_scale)
+    )
+    rounds = sim_config["simulation_mining_rounds"]
+
+    module = importlib.import_module(spec["module"] + ".simulation_manager")
+    seed_sequence = importlib.import_module("base.rng").SeedSequence(seed)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        args = Namespace(
+            blockchain=spec["module"],
+            out=os.path.join(tmp_dir, "chain.csv"),
+            progress="off",
+        )
+        sim_manager = module.SimulationManager(
+            simulation_config=config, blockchain=args, seed_sequence=seed_sequence
+        )
+
+        gc.collect()
+        blocks_before = sys.getallocatedblocks()
+        start = time.perf_counter()
+        # some protocols print statistics, which are not part of the benchmark
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = sim_manager.run()
+        seconds = time.perf_counter() - start
+        blocks_after = sys.getallocatedblocks()
+
+    return {
+        "case": case,
+        "module": spec["module"],
+        "seed": seed,
+        "rounds": rounds,
+        "seconds": seconds,
+        "rounds_per_sec": rounds / seconds,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "allocated_blocks_per_round": (blocks_after - blocks_before) / rounds,
+        "total_blocks": result.total_blocks,
+    }
+
+
+def run_case_process(case: str, seed: int, rounds_scale: float) -> Dict[str, Any]:
+    """Run one benchmark case in a fresh Python process.
+
+    Args:
+        case (str): Name of the benchmark case.
+        seed (int): Seed of the random generator.
+        rounds_scale (float): Multiplier of the number of rounds of the case.
+
+    Returns:
+        Dict[str, Any]: Measured values of the case.
+    """
+    process = subprocess.run(
+        [
+            sys.executable,
+            os.path.abspath(__file__),
+            "--worker",
+            case,
+            "--seed",
+            str(seed),
+            "--rounds-scale",
+            str(rounds_scale),
+        ],
+        cwd=REPO_ROOT,
+        check=True,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    return json.loads(process.stdout.splitlines()[-1])
+
+
+def git_revision() -> Optional[str]:
+    """Get the current git revision of the repository.
+
+    Returns:
+        Optional[str]: Short hash of HEAD or None if it is not available.
+    """
+    try:
+        process = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_ROOT,
+            check=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    return process.stdout.strip()
+
+
+def load_latest_records(path: str) -> Dict[str, Dict[str, Any]]:
+    """Load the latest record of every case from a JSONL file with benchmark results.
+
+    Args:
+        path (str): Path to the JSONL file.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Latest records keyed by case names.
+    """
+    records = {}
+    with open(path, "r") as file:
+        for line in file:
+            if line.strip():
+                record = json.loads(line)
+                records[record["case"]] = record
+
+    return records
+
+
+def format_record(
+    record: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None
+) -> str:
+    """Format one benchmark record as a line of the summary table.
+
+    Args:
+        record (Dict[str, Any]): Benchmark record.
+        baseline (Dict[str, Any], optional): Previous record of the same case.
+
+    Returns:
+        str: Formatted line.
+    """
+    line = (
+        f"{record['case']:<24} {record['rounds_per_sec']:>12,.0f} "
+        f"{record['peak_rss_kb'] / 1024:>10.1f} {record['allocated_blocks_per_round']:>10.2f}"
+    )
+    if baseline is not None:
+        speedup = record["rounds_per_sec"] / baseline["rounds_per_sec"]
+        line += f" {speedup:>8.2f}x"
+
+    return line
+
+
+def main() -> None:
+    """Run selected benchmark cases and append their records to the output file."""
+    parser = argparse.ArgumentParser(description="Simulation benchmark suite")
+    parser.add_argument(
+        "--cases",
+        nargs="+",
+        choices=list(BENCHMARK_CASES),
+        default=list(BENCHMARK_CASES),
+        help="Benchmark cases (default is all)",
+    )
+    parser.add_argument("--seed", type=int, default=42, help="Seed of every run")
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="Number of runs of every case, the fastest one is recorded",
+    )
+    parser.add_argument(
+        "--rounds-scale",
+        type=float,
+        default=1.0,
+        help="Multiplier of the number of rounds of all cases",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=os.path.join("benchmarks", "results.jsonl"),
+        help="JSONL file, to which are records appended",
+    )
+    parser.add_argument(
+        "--compare",
+        type=str,
+        required=False,
+        help="JSONL file with previous records for computing speedups",
+    )
+    parser.add_argument("--worker", type=str, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_case(args.worker, args.seed, args.rounds_scale)))
+        return
+
+    baselines = load_latest_records(args.compare) if args.compare else {}
+    metadata = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+    }
+
+    header = f"{'case':<24} {'rounds/s':>12} {'RSS [MB]':>10} {'blocks/r':>10}"
+    print(header + (f" {'speedup':>9}" if baselines else ""))
+    records = []
+    for case in args.cases:
+        runs = [
+            run_case_process(case, args.seed, args.rounds_scale)
+            for _ in range(args.repeat)
+        ]
+        record = max(runs, key=lambda run: run["rounds_per_sec"])
+        record.update(metadata)
+        records.append(record)
+        print(format_record(record, baselines.get(case)))
+
+    with open(os.path.join(REPO_ROOT, args.output), "a") as file:
+        file.writelines(json.dumps(record) + "\n" for record in records)
+
+
+if __name__ == "__main__":
+    main()
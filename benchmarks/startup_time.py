@@ -0,0 +1,145 @@
+"""Startup-time regression check for main.py.
+
+Script measures a cold start of `main.py nakamoto` with a tiny simulation
+and fails if it exceeds the time budget or if any heavy dependency, which should
+be imported lazily, is loaded during the start.
+
+Usage:
+    python benchmarks/startup_time.py --budget 0.25 --repeat 5
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules, which must not be imported by a plain simulation run with default log level
+HEAVY_MODULES = ["matplotlib", "numpy", "pandas", "structlog", "tqdm"]
+
+TINY_CONFIG = """
+- simulation1:
+    consensus_name: Nakamoto
+    miners:
+      honest:
+        mining_power: 60
+      selfish:
+        - mining_power: 40
+    gamma: 0.5
+    simulation_mining_rounds: 10
+"""
+
+MODULES_CHECK = """
+import runpy, sys
+sys.argv = {argv!r}
+runpy.run_path("main.py", run_name="__main__")
+print("HEAVY:" + ",".join(m for m in {heavy!r} if m in sys.modules), file=sys.stderr)
+"""
+
+
+def main_argv(config_path: str, results_path: str) -> List[str]:
+    """Get arguments of the measured main.py invocation.
+
+    Args:
+        config_path (str): Path to the tiny config.
+        results_path (str): Path to the results file.
+
+    Returns:
+        List[str]: Arguments of main.py including the script name.
+    """
+    return ["main.py", "--results", results_path, "nakamoto", "--config", config_path]
+
+
+def measure_start(argv: List[str], repeat: int) -> List[float]:
+    """Measure wall time of repeated cold starts.
+
+    Args:
+        argv (List[str]): Arguments of main.py including the script name.
+        repeat (int): Number of measured starts.
+
+    Returns:
+        List[float]: Wall times in seconds.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable] + argv,
+            cwd=REPO_ROOT,
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        times.append(time.perf_counter() - start)
+
+    return times
+
+
+def loaded_heavy_modules(argv: List[str]) -> List[str]:
+    """Get heavy modules, which were imported during the start.
+
+    Args:
+        argv (List[str]): Arguments of main.py including the script name.
+
+    Returns:
+        List[str]: Names of loaded heavy modules.
+    """
+    process = subprocess.run(
+        [sys.executable, "-c", MODULES_CHECK.format(argv=argv, heavy=HEAVY_MODULES)],
+        cwd=REPO_ROOT,
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    heavy_line = [
+        line for line in process.stderr.splitlines() if line.startswith("HEAVY:")
+    ][-1]
+    return [module for module in heavy_line[len("HEAVY:") :].split(",") if module]
+
+
+def main() -> None:
+    """Run the startup-time check and exit with non-zero code on regression."""
+    parser = argparse.ArgumentParser(description="Startup-time check of main.py")
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=0.25,
+        help="Maximum allowed median wall time of the start in seconds",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="Number of starts")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config_path = os.path.join(tmp_dir, "config.yaml")
+        with open(config_path, "w") as file:
+            file.write(TINY_CONFIG)
+        argv = main_argv(config_path, os.path.join(tmp_dir, "results.jsonl"))
+
+        times = sorted(measure_start(argv, args.repeat))
+        heavy = loaded_heavy_modules(argv)
+
+    median = times[len(times) // 2]
+    print(
+        f"main.py nakamoto cold start: median {median:.3f} s, "
+        f"min {times[0]:.3f} s, budget {args.budget:.3f} s"
+    )
+
+    failed = False
+    if heavy:
+        print(f"FAIL: heavy modules imported during the start: {heavy}")
+        failed = True
+    if median > args.budget:
+        print("FAIL: startup-time budget exceeded")
+        failed = True
+
+    if failed:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,7 @@ Author: Tomáš Hladký (xhladk15)
 Date: 18.9.2023
 """
 import random
-from typing import Set
+from typing import Optional, Set
 
 from base.blockchain import Blockchain
 from base.miner_base import HonestMinerAction as Action
@@ -19,8 +19,8 @@ import json
 class HonestMinerStrategy(NakamotoHonestMinerStrategy):
     """Honest miner class implementation for Fruitchain consensus."""
 
-    def __init__(self, mining_power: int):
-        super().__init__(mining_power)
+    def __init__(self, mining_power: int, rng: Optional[random.Random] = None):
+        super().__init__(mining_power, rng)
         self.fruit_queue = []
 
     def mine_new_fruit(self):
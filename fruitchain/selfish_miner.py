@@ -21,8 +21,8 @@ BLOCK_REWARD = 10
 class SelfishMinerStrategy(NakamotoSelfishMinerStrategy):
     """Selfish miner class implementation for Fruitchain consensus."""
 
-    def __init__(self, mining_power: int):
-        super().__init__(mining_power)
+    def __init__(self, mining_power: int, rng: Optional[random.Random] = None):
+        super().__init__(mining_power, rng)
         self.fruit_queue = []
         self.private_queue = []
 
@@ -103,7 +103,7 @@ class SelfishMinerStrategy(NakamotoSelfishMinerStrategy):
                 # my new block and integrate block to the main chain
                 self.action = SA.MATCH
 
-                winner = random.choice(match_competitors + [public_blockchain])
+                winner = self.rng.choice(match_competitors + [public_blockchain])
                 if winner is not public_blockchain:
                     public_blockchain.chain[-1] = winner.blockchain.chain[-1]
 
@@ -171,7 +171,7 @@ class SelfishMinerStrategy(NakamotoSelfishMinerStrategy):
     #             # my new block and integrate block to the main chain
     #             self.action = SA.MATCH
 
-    #             winner = random.choice(match_competitors + [public_blockchain])
+    #             winner = self.rng.choice(match_competitors + [public_blockchain])
     #             if winner is not public_blockchain:
     #                 public_blockchain.chain[-1] = winner.blockchain.chain[-1]
 
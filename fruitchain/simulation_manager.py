@@ -4,7 +4,7 @@ whole simulation of selfish mining for Nakamoto consensus.
 Author: Tomáš Hladký (xhladk15)
 Date: 18.9.2023
 """
-import random
+from typing import List, Optional
 
 from base.blockchain import Blockchain
 from base.miner_base import HonestMinerAction as HA
@@ -14,26 +14,42 @@ from base.simulation_manager_base import ActionObjectStore
 from nakamoto.simulation_manager import SimulationManager as NakamotoSimulationManager
 from fruitchain.honest_miner import HonestMinerStrategy
 from fruitchain.selfish_miner import SelfishMinerStrategy
-from public_blockchain_functions import (
-    calculate_percentage,
-    plot_block_counts,
-    print_attackers_success,
-    print_honest_miner_info,
-)
+from base.results import SimulationResult
+from base.rng import SeedSequence
 from fruitchain.sim_config import SimulationConfig
 from fruitchain.fruitchain_types import FruitchainAction
-from tqdm import tqdm
 
 import csv
+import json
 
 
 class SimulationManager(NakamotoSimulationManager):
     # pylint: disable=too-many-instance-attributes
     """Mediator class for Nakamoto consensus for running whole simulation."""
 
-    def __init__(self, simulation_config: dict, blockchain: str):
+    PROFILED_METHODS = NakamotoSimulationManager.PROFILED_METHODS + (
+        "choose_mining_action",
+        "resolve_fruit_match",
+        "get_max_chain",
+    )
+    PROFILED_MINER_METHODS = NakamotoSimulationManager.PROFILED_MINER_METHODS + (
+        "mine_new_fruit",
+        "receive_new_fruit",
+    )
+    # fruits are kept by miners across forks, so there are no clean regeneration points
+    REGENERATIVE = False
+    # overridden updates of private chains with fruits don't report their changes
+    INCREMENTAL_DECISIONS = False
+    BLOCK_CHILDREN = True
+
+    def __init__(
+        self,
+        simulation_config: dict,
+        blockchain: str,
+        seed_sequence: Optional[SeedSequence] = None,
+    ):
         super().__init__(
-            simulation_config, blockchain
+            simulation_config, blockchain, seed_sequence
         )  # create everything necessary from Nakamoto
 
         if blockchain.out is None:
@@ -42,9 +58,9 @@ class SimulationManager(NakamotoSimulationManager):
             self.out_path = blockchain.out
 
         self.honest_miner = HonestMinerStrategy(
-            mining_power=self.config.honest_miner)
+            mining_power=self.config.honest_miner, rng=self.rng)
         self.selfish_miners = [
-            SelfishMinerStrategy(mining_power=sm_power)
+            SelfishMinerStrategy(mining_power=sm_power, rng=self.rng)
             for sm_power in self.config.selfish_miners
         ]
         self.miners = [self.honest_miner] + self.selfish_miners
@@ -85,89 +101,91 @@ class SimulationManager(NakamotoSimulationManager):
 
         blocks_mined = 0
         # for blocks_mined in range(self.config.simulation_mining_rounds):
-        with tqdm(total=self.config.simulation_mining_rounds) as pbar:
-            while blocks_mined < self.config.simulation_mining_rounds:
-                # competitors with match actions
-                action = self.choose_mining_action()
-                # print(action)
-
-                leader = None
-                if self.ongoing_fork and action == FruitchainAction.MINE_BLOCK:
-                    # leader selection based on fruit quantity
-                    # highest_fruit_count = -1
-
-                    # get leading competitors
-                    # highest_blockchain_size = -1
-                    # competitors = []
-                    # for miner in self.miners:
-                    #     if miner.miner_type == MinerType.SELFISH and miner.blockchain.size() >= highest_blockchain_size:
-                    #             competitors.append(miner)
-                    #             highest_blockchain_size = miner.blockchain.size()
-                    #     elif miner.miner_type == MinerType.HONEST and self.public_blockchain.size() >= highest_blockchain_size:
-                    #         competitors.append(miner)
-                    #         highest_blockchain_size = self.public_blockchain.size()
-
-                    # Find the maximum fruit count using the custom key function
-                    max_fruit_count = max(self.miners, key=lambda miner: miner.get_fruit_count()).get_fruit_count()
-
-                    # Filter miners with the maximum fruit count
-                    max_fruit_miners = [miner for miner in self.miners if miner.get_fruit_count() == max_fruit_count]
-
-                    # Randomly select one miner from the list of miners with the maximum fruit count
-                    if self.config.gamma == 0.5:
-                        leader = random.choice(max_fruit_miners)
-                    elif self.config.gamma == 0.0:
-                        contains_honest = False
-                        for miner in max_fruit_miners:
-                            if miner.miner_type == MinerType.HONEST:
-                                contains_honest = True
-                                break
-
-                        if contains_honest:
-                            honest_miners = [miner for miner in max_fruit_miners if
-                                             miner.miner_type == MinerType.HONEST]
-                            leader = random.choice(honest_miners)
-                        else:
-                            leader = random.choice(max_fruit_miners)
-                    elif self.config.gamma == 1.0:
-                        contains_selfish = False
-                        for miner in max_fruit_miners:
-                            if miner.miner_type == MinerType.SELFISH:
-                                contains_selfish = True
-                                break
-
-                        if contains_selfish:
-                            selfish_miners = [miner for miner in max_fruit_miners if
-                                              miner.miner_type == MinerType.SELFISH]
-                            leader = random.choice(selfish_miners)
-                        else:
-                            leader = random.choice(max_fruit_miners)
-
-                    # else:
-                    #     for miner in competitors:
-                    #         fruit_count = miner.get_fruit_count()
-                    #         if fruit_count >= highest_fruit_count:
-                    #             if self.config.gamma == 1.0:
-                    #                 if leader is None or miner.miner_type == MinerType.SELFISH:
-                    #                     # higher chance for selfish if their fruit content count equals
-                    #                     leader = miner
-                    #                     exit(1)
-                    #             elif self.config.gamma == 0.0:
-                    #                 if leader is None or miner.miner_type == MinerType.HONEST:
-                    #                     # higher chance for selfish if their fruit content count equals
-                    #                     leader = miner                                    
-                else:
-                    leader = self.choose_leader(self.miners, self.miners_info)
+        while blocks_mined < self.config.simulation_mining_rounds:
+            # competitors with match actions
+            action = self.choose_mining_action()
+            # print(action)
+
+            leader = None
+            if self.ongoing_fork and action == FruitchainAction.MINE_BLOCK:
+                # leader selection based on fruit quantity
+                # highest_fruit_count = -1
+
+                # get leading competitors
+                # highest_blockchain_size = -1
+                # competitors = []
+                # for miner in self.miners:
+                #     if miner.miner_type == MinerType.SELFISH and miner.blockchain.size() >= highest_blockchain_size:
+                #             competitors.append(miner)
+                #             highest_blockchain_size = miner.blockchain.size()
+                #     elif miner.miner_type == MinerType.HONEST and self.public_blockchain.size() >= highest_blockchain_size:
+                #         competitors.append(miner)
+                #         highest_blockchain_size = self.public_blockchain.size()
+
+                # Find the maximum fruit count using the custom key function
+                max_fruit_count = max(self.miners, key=lambda miner: miner.get_fruit_count()).get_fruit_count()
+
+                # Filter miners with the maximum fruit count
+                max_fruit_miners = [miner for miner in self.miners if miner.get_fruit_count() == max_fruit_count]
+
+                # Randomly select one miner from the list of miners with the maximum fruit count
+                if self.config.gamma == 0.5:
+                    leader = self.rng.choice(max_fruit_miners)
+                elif self.config.gamma == 0.0:
+                    contains_honest = False
+                    for miner in max_fruit_miners:
+                        if miner.miner_type == MinerType.HONEST:
+                            contains_honest = True
+                            break
+
+                    if contains_honest:
+                        honest_miners = [miner for miner in max_fruit_miners if
+                                         miner.miner_type == MinerType.HONEST]
+                        leader = self.rng.choice(honest_miners)
+                    else:
+                        leader = self.rng.choice(max_fruit_miners)
+                elif self.config.gamma == 1.0:
+                    contains_selfish = False
+                    for miner in max_fruit_miners:
+                        if miner.miner_type == MinerType.SELFISH:
+                            contains_selfish = True
+                            break
+
+                    if contains_selfish:
+                        selfish_miners = [miner for miner in max_fruit_miners if
+                                          miner.miner_type == MinerType.SELFISH]
+                        leader = self.rng.choice(selfish_miners)
+                    else:
+                        leader = self.rng.choice(max_fruit_miners)
+
+                # else:
+                #     for miner in competitors:
+                #         fruit_count = miner.get_fruit_count()
+                #         if fruit_count >= highest_fruit_count:
+                #             if self.config.gamma == 1.0:
+                #                 if leader is None or miner.miner_type == MinerType.SELFISH:
+                #                     # higher chance for selfish if their fruit content count equals
+                #                     leader = miner
+                #                     exit(1)
+                #             elif self.config.gamma == 0.0:
+                #                 if leader is None or miner.miner_type == MinerType.HONEST:
+                #                     # higher chance for selfish if their fruit content count equals
+                #                     leader = miner                                    
+            else:
+                leader = self.choose_leader(self.miners, self.miners_info)
 
-                self.one_round(leader, blocks_mined, action)
+            self.one_round(leader, blocks_mined, action)
 
-                if action == FruitchainAction.MINE_BLOCK:
-                    self.winns[leader.miner_id] += 1
-                    
-                    curr_blocks_mined = len(self.get_max_chain().chain)
-                    blocks_mined = curr_blocks_mined
-                    pbar.n = blocks_mined
-                    pbar.refresh()
+            if action == FruitchainAction.MINE_BLOCK:
+                self.winns[leader.miner_id] += 1
+                
+                curr_blocks_mined = len(self.get_max_chain().chain)
+                blocks_mined = curr_blocks_mined
+                self.progress.update(blocks_mined)
+                if self.observed and self.observe_round(blocks_mined, leader):
+                    break
+
+        self.progress.finish(self.simulated_rounds)
 
         # self.log.info(self.config.simulation_mining_rounds)
         # self.log.info(self.winns)
@@ -251,24 +269,7 @@ class SimulationManager(NakamotoSimulationManager):
                 elif action not in [SA.MATCH, SA.ADOPT]:
                     raise Exception("Fatal error ongoing fork")
 
-            while True:
-                # override loop
-                self.action_store.clear()
-
-                for selfish_miner in self.selfish_miners:
-                    action = selfish_miner.decide_next_action(
-                        self.public_blockchain, leader
-                    )
-                    self.action_store.add_object(action, selfish_miner)
-                all_actions = self.action_store.get_actions()
-
-                # replacement for `do-while` which is not in python
-                condition = SA.OVERRIDE in all_actions
-                if not condition:
-                    break
-
-                self.resolve_overrides()
-
+            all_actions = self.decide_next_actions(leader)
             if SA.MATCH in all_actions:
                 self.resolve_matches()
 
@@ -290,7 +291,7 @@ class SimulationManager(NakamotoSimulationManager):
             self.ongoing_fork = False
 
             # random choice of winner
-            winner = random.choice(match_objects + [self.honest_miner])
+            winner = self.rng.choice(match_objects + [self.honest_miner])
 
             # winner selection based on fruit quantity
             # highest_fruit_count = -1
@@ -326,7 +327,7 @@ class SimulationManager(NakamotoSimulationManager):
                     if self.config.gamma == 1:
                         self.resolve_fruit_match(match_obj, [])
                     elif self.config.gamma == 0.5:
-                        winner = random.choice([match_obj, self.honest_miner])
+                        winner = self.rng.choice([match_obj, self.honest_miner])
                         if winner == match_obj:
                             self.resolve_fruit_match(match_obj, [])
                     else:
@@ -358,7 +359,7 @@ class SimulationManager(NakamotoSimulationManager):
                         isHonest = True
                 
                 if not isHonest:
-                    winner = random.choice(max_fruit_miners)
+                    winner = self.rng.choice(max_fruit_miners)
                     self.resolve_fruit_match(winner, [])
                 else:
                     if self.config.gamma == 1:
@@ -367,10 +368,10 @@ class SimulationManager(NakamotoSimulationManager):
                         for miner in max_fruit_miners:
                             if self.honest_miner is not miner:
                                 max_fruit_miners_selfish.append(miner)
-                        winner = random.choice(max_fruit_miners_selfish)
+                        winner = self.rng.choice(max_fruit_miners_selfish)
                         self.resolve_fruit_match(winner, [])
                     elif self.config.gamma == 0.5:
-                        winner = random.choice(max_fruit_miners_selfish)
+                        winner = self.rng.choice(max_fruit_miners_selfish)
                         if winner is not self.honest_miner:
                             self.resolve_fruit_match(winner, [])
                     else:
@@ -389,10 +390,11 @@ class SimulationManager(NakamotoSimulationManager):
             miner.clear_fruit_queue()
 
     def choose_mining_action(self) -> FruitchainAction:
-        choices_list = [FruitchainAction.MINE_FRUIT, FruitchainAction.MINE_BLOCK]
-        weights = (self.config.fruit_mine_prob,
-                   self.config.superblock_prob)
-        return random.choices(choices_list, weights=weights, k=1)[0]
+        # inverse CDF of one uniform number from the block type stream
+        total = self.config.fruit_mine_prob + self.config.superblock_prob
+        if self.block_type_rng.random() * total < self.config.fruit_mine_prob:
+            return FruitchainAction.MINE_FRUIT
+        return FruitchainAction.MINE_BLOCK
     
     def get_max_chain(self):
         max_chain = self.public_blockchain
@@ -406,7 +408,18 @@ class SimulationManager(NakamotoSimulationManager):
 
         return max_chain
 
-    def run(self):
+    def block_children(self, block) -> List[int]:
+        """Get miner IDs of fruits of the block for the export.
+
+        Args:
+            block (Block): Block of the result chain.
+
+        Returns:
+            List[int]: Miner IDs of fruits.
+        """
+        return json.loads(block.data)
+
+    def run(self) -> SimulationResult:
         """This method is entry point for running all checks for specific provider monitor."""
         # self.log.info("Mediator in Fruitchain")
         # print(type(self.config))
@@ -423,23 +436,16 @@ class SimulationManager(NakamotoSimulationManager):
         #             curr_max = len(miner.blockchain.chain)
         self.public_blockchain = self.get_max_chain()
 
-        block_counts = {f"Honest miner {self.honest_miner.miner_id}": 0}
-        for miner in self.selfish_miners:
-            block_counts.update({f"Selfish miner {miner.miner_id}": 0})
+        block_counts, _, strong_counts = self.count_blocks(self.public_blockchain.chain)
 
+        # fruits are counted as weak blocks of their miners
+        fruit_counts = {miner.miner_id: 0 for miner in self.miners}
         for block in self.public_blockchain.chain:
-            block_counts[block.miner] += 1
+            for fruit_miner_id in json.loads(block.data):
+                fruit_counts[fruit_miner_id] += 1
 
-        attacker_ids = [
-            miner.miner_id for miner in self.selfish_miners
-        ]  # List of attacker IDs
         honest_miner_id = self.honest_miner.miner_id  # Honest miner ID
 
-        total_blocks = sum(block_counts.values())
-        percentages = calculate_percentage(block_counts, total_blocks)
-        print_attackers_success(block_counts, percentages, self.winns, attacker_ids)
-        print_honest_miner_info(block_counts, percentages, self.winns, honest_miner_id)
-
         # Store results
         f = open(self.out_path, 'w')
         writer = csv.writer(f)
@@ -463,3 +469,5 @@ class SimulationManager(NakamotoSimulationManager):
         # self.log.info(self.selfish_miners[0].blockchain.chain)
 
         # plot_block_counts(block_counts, self.miners_info)
+
+        return self.build_result(block_counts, fruit_counts, strong_counts)
@@ -3,42 +3,428 @@
 Author: Jan Jakub Kubik (xkubik32)
 Date: 14.3.2023
 """
+import copy
 import importlib
+import io
+import os
+import signal
+import sys
+import time
 from argparse import Namespace
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import redirect_stdout
+from itertools import count
+from typing import Dict, List, Optional, Tuple
 
-from base.logs import create_logger
+from base.estimators import (
+    estimate_shares,
+    format_paired_differences,
+    format_share_estimates,
+    paired_differences,
+)
+from base.event_tape import EventTape
+from base.logs import create_logger, set_log_level
+from base.miner_base import MinerStrategyBase
+from base.profiling import PhaseProfiler, save_profiles
+from base.result_sinks import create_result_sink
+from base.results import SimulationResult
+from base.rng import SeedSequence, parse_spawn_key
+from base.scheduler import peak_memory
+from public_blockchain_functions import print_simulation_result
 from sm_utils import load_simulations_config, parse_args
 
 
-def run_simulations(parsed_args: Namespace) -> None:
+def run_traced(sim_manager, trace_path: str):
+    """Run the simulation and dump its state trace if it fails or on SIGUSR1.
+
+    Args:
+        sim_manager (SimulationManagerBase): Manager with enabled state trace.
+        trace_path (str): Path to the dumped trace.
+
+    Returns:
+        SimulationResult: Result of the simulation.
+    """
+
+    def request_dump(*_):
+        sim_manager.state_trace.request_dump(trace_path)
+
+    # SIGUSR1 is not available on Windows
+    on_demand = hasattr(signal, "SIGUSR1")
+    if on_demand:
+        previous_handler = signal.signal(signal.SIGUSR1, request_dump)
+    try:
+        return sim_manager.run()
+    except BaseException:
+        sim_manager.state_trace.dump(trace_path)
+        print(f"State trace written to {trace_path}", file=sys.stderr)
+        raise
+    finally:
+        if on_demand:
+            signal.signal(signal.SIGUSR1, previous_handler)
+
+
+def create_seed_sequences(
+    parsed_args: Namespace, simulations_count: int
+) -> List[List[SeedSequence]]:
+    """Create seed tree nodes of all replicas of all simulations.
+
+    Replica R of simulation N gets the spawn key `<spawn-key>.N.R` (just `<spawn-key>.N`
+    if there is only one replica). With common random numbers all simulations
+    share the nodes of simulation 0. Antithetic replicas form pairs, where the second
+    replica is the antithetic twin of the first one, so pair K has the key `<spawn-key>.N.K`.
+
+    Args:
+        parsed_args (Namespace): Valid parsed program arguments.
+        simulations_count (int): Number of simulations in the config.
+
+    Returns:
+        List[List[SeedSequence]]: Nodes of replicas for every simulation.
+    """
+    root = SeedSequence(parsed_args.seed, parse_spawn_key(parsed_args.spawn_key))
+    seed_sequences = []
+    for simulation_index in range(simulations_count):
+        node = root.child(0 if parsed_args.crn else simulation_index)
+        if parsed_args.replicas == 1:
+            seed_sequences.append([node])
+        elif parsed_args.antithetic:
+            pairs = [node.child(pair) for pair in range(parsed_args.replicas // 2)]
+            seed_sequences.append(
+                [twin for pair in pairs for twin in (pair, pair.antithetic_twin())]
+            )
+        else:
+            seed_sequences.append(
+                [node.child(replica) for replica in range(parsed_args.replicas)]
+            )
+
+    return seed_sequences
+
+
+def series_path(path: str, run_index: int, runs_count: int) -> str:
+    """Get path of the time series file of the run.
+
+    Args:
+        path (str): Path given by the user, e.g. `series.npy`.
+        run_index (int): Index of the run.
+        runs_count (int): Number of all runs.
+
+    Returns:
+        str: The given path for a single run, otherwise with the run index, e.g. `series_3.npy`.
+    """
+    if runs_count == 1:
+        return path
+    root, extension = os.path.splitext(path)
+    return f"{root}_{run_index}{extension or '.npy'}"
+
+
+def simulation_module_path(parsed_args: Namespace) -> str:
+    """Get the package path of the simulated blockchain, e.g. `subchain.weak`.
+
+    Args:
+        parsed_args (Namespace): Valid parsed program arguments.
+
+    Returns:
+        str: Dot separated path of the package.
+    """
+    if parsed_args.blockchain == "subchain":
+        return parsed_args.blockchain + "." + parsed_args.option
+    return parsed_args.blockchain
+
+
+def simulation_manager_class(parsed_args: Namespace) -> type:
+    """Get the simulation manager class of the simulated blockchain.
+
+    Args:
+        parsed_args (Namespace): Valid parsed program arguments.
+
+    Returns:
+        type: Class of the simulation manager.
+    """
+    mediator_module = importlib.import_module(
+        simulation_module_path(parsed_args) + ".simulation_manager"
+    )
+    return mediator_module.SimulationManager
+
+
+def run_single_simulation(
+    parsed_args: Namespace,
+    simulation_config: Dict,
+    seed_sequence: SeedSequence,
+    run_index: int,
+    runs_count: int,
+) -> Tuple[SimulationResult, Optional[PhaseProfiler]]:
+    """Run one replica of the simulation with all enabled recordings and exports.
+
+    Args:
+        parsed_args (Namespace): Valid parsed program arguments.
+        simulation_config (Dict): Config of the simulation.
+        seed_sequence (SeedSequence): Seed tree node of the replica.
+        run_index (int): Index of the run, which selects paths of its output files.
+        runs_count (int): Number of all runs.
+
+    Returns:
+        Tuple[SimulationResult, Optional[PhaseProfiler]]: Result of the simulation
+            and its profiler (None if profiling is disabled).
+    """
+    if getattr(parsed_args, "regenerative", False):
+        # pylint: disable=import-outside-toplevel
+        from nakamoto.regenerative import run_regenerative
+
+        result = run_regenerative(
+            simulation_config,
+            parsed_args.workers,
+            seed_sequence,
+            parsed_args.confidence,
+        )
+        return result, None
+
+    sim_manager = simulation_manager_class(parsed_args)(
+        simulation_config=simulation_config,
+        blockchain=parsed_args,
+        seed_sequence=seed_sequence,
+    )
+    if parsed_args.fork_stats:
+        sim_manager.enable_fork_statistics()
+    profiler = None
+    if parsed_args.profile or parsed_args.profile_out:
+        profiler = PhaseProfiler()
+        sim_manager.enable_profiling(profiler)
+    tape = None
+    if parsed_args.record_tape:
+        tape = sim_manager.record_event_tape(
+            series_path(parsed_args.record_tape, run_index, runs_count)
+        )
+    elif parsed_args.replay_tape:
+        sim_manager.replay_event_tape(EventTape(parsed_args.replay_tape))
+    start = time.perf_counter()
+    try:
+        if parsed_args.trace:
+            sim_manager.enable_state_trace(parsed_args.trace)
+            result = run_traced(
+                sim_manager,
+                series_path(parsed_args.trace_out, run_index, runs_count),
+            )
+        else:
+            result = sim_manager.run()
+    finally:
+        if tape is not None:
+            tape.close()
+    result.duration = time.perf_counter() - start
+    result.peak_memory = peak_memory()
+    if parsed_args.chain_out:
+        sim_manager.export_result_chain(
+            series_path(parsed_args.chain_out, run_index, runs_count)
+        )
+    if parsed_args.series_out:
+        sim_manager.revenue_series.save(
+            series_path(parsed_args.series_out, run_index, runs_count)
+        )
+    return result, profiler
+
+
+def _first_miner_ids(parsed_args: Namespace, runs: List[Tuple]) -> List[int]:
+    """Get IDs of the first miners of runs as if runs were run one after another.
+
+    Miner IDs are counted over the whole process, so workers of `--jobs` continue
+    from these IDs and results don't depend on the distribution of runs to workers.
+    Managers are just created to count their miners, which is cheap.
+    """
+    manager_class = simulation_manager_class(parsed_args)
+    next_id = next(MinerStrategyBase.counter)
+    miners_counts: Dict[int, int] = {}
+    first_ids = []
+    for simulation_index, simulation_config, seed_sequence in runs:
+        if simulation_index not in miners_counts:
+            MinerStrategyBase.counter = count(start=0)
+            with redirect_stdout(io.StringIO()):
+                manager_class(
+                    simulation_config=simulation_config,
+                    blockchain=parsed_args,
+                    seed_sequence=seed_sequence,
+                )
+            miners_counts[simulation_index] = next(MinerStrategyBase.counter)
+        first_ids.append(next_id)
+        next_id += miners_counts[simulation_index]
+    MinerStrategyBase.counter = count(start=next_id)
+    return first_ids
+
+
+# pylint: disable=too-many-arguments
+def _run_parallel_simulation(
+    parsed_args: Namespace,
+    simulation_config: Dict,
+    seed_sequence: SeedSequence,
+    run_index: int,
+    runs_count: int,
+    first_miner_id: int,
+) -> Tuple[SimulationResult, Optional[PhaseProfiler], str]:
+    """Run the simulation in a worker process of `--jobs` with captured output."""
+    MinerStrategyBase.counter = count(start=first_miner_id)
+    if parsed_args.blockchain == "fruitchain":
+        # every run writes its own file of fruits
+        parsed_args.out = series_path(
+            parsed_args.out or "fruit_res.csv", run_index, runs_count
+        )
+    output = io.StringIO()
+    with redirect_stdout(output):
+        result, profiler = run_single_simulation(
+            parsed_args, simulation_config, seed_sequence, run_index, runs_count
+        )
+    return result, profiler, output.getvalue()
+
+
+def run_simulations(
+    parsed_args: Namespace, simulations_config: Optional[List[Dict]] = None
+) -> List[SimulationResult]:
     """Run selfish mining simulations.
 
     Run selfish mining simulations according to the YAML config for the selected consensus protocol.
+    Results are printed to stdout or written in bulk to the results file if it is set.
+    Phase profiles are printed to stderr or saved to the profile file if profiling is enabled.
+    Variance-reduced share estimates are printed if there are more replicas.
+    With common random numbers, paired differences against the first simulation are printed.
+    Nakamoto simulations with `--regenerative` are split into cycles run in parallel processes.
+    With `--jobs`, runs are distributed to worker processes and their results
+    and outputs are collected in the order of the config.
 
     Args:
         parsed_args (Namespace): Valid parsed program arguments.
+        simulations_config (Optional[List[Dict]], optional): Loaded config, which is used
+            instead of the config file, e.g. sent to the simulation server. Defaults to None.
+
+    Returns:
+        List[SimulationResult]: Results of all runs.
     """
-    if parsed_args.blockchain == "subchain":
-        module_path = parsed_args.blockchain + "." + parsed_args.option
-        config_path = parsed_args.blockchain + "/" + parsed_args.option
-    else:
-        module_path = config_path = parsed_args.blockchain
+    if simulations_config is None:
+        if parsed_args.config is None:
+            parsed_args.config = (
+                simulation_module_path(parsed_args).replace(".", "/") + "/config.yaml"
+            )
+        print(parsed_args.config)
+        simulations_config = load_simulations_config(parsed_args.config)
 
-    print(parsed_args.config)
+    seed_sequences = create_seed_sequences(parsed_args, len(simulations_config))
+    runs_count = len(simulations_config) * parsed_args.replicas
+    runs = [
+        (simulation_index, simulation_config, seed_sequence)
+        for simulation_index, (simulation_config, replicas) in enumerate(
+            zip(simulations_config, seed_sequences)
+        )
+        for seed_sequence in replicas
+    ]
 
-    mediator_module = importlib.import_module(module_path + "." + "simulation_manager")
-    # simulations_config = load_simulations_config(config_path + "/" + "config.yaml")
-    simulations_config = load_simulations_config(parsed_args.config)
-    for simulation_config in simulations_config:
-        sim_manager = mediator_module.SimulationManager(
-            simulation_config=simulation_config, blockchain=parsed_args
+    jobs = min(getattr(parsed_args, "jobs", 1), len(runs))
+    executor = None
+    futures: List[Future] = []
+    if jobs > 1:
+        worker_args = copy.copy(parsed_args)
+        if worker_args.progress != "machine":
+            # progress lines of parallel runs would overwrite each other
+            worker_args.progress = "off"
+        executor = ProcessPoolExecutor(jobs)
+        # runs are finished in any order, but they are collected in the config order
+        first_miner_ids = _first_miner_ids(worker_args, runs)
+        futures = [
+            executor.submit(
+                _run_parallel_simulation,
+                worker_args,
+                simulation_config,
+                seed_sequence,
+                run_index,
+                runs_count,
+                first_miner_ids[run_index],
+            )
+            for run_index, (_, simulation_config, seed_sequence) in enumerate(runs)
+        ]
+        outcomes = (future.result() for future in futures)
+    else:
+        outcomes = (
+            run_single_simulation(
+                parsed_args, simulation_config, seed_sequence, run_index, runs_count
+            )
+            + ("",)
+            for run_index, (_, simulation_config, seed_sequence) in enumerate(runs)
         )
-        sim_manager.run()
+
+    results = []
+    results_by_simulation: List[List[SimulationResult]] = [
+        [] for _ in simulations_config
+    ]
+    profiles = []
+    try:
+        for (simulation_index, _, _), (result, profiler, output) in zip(runs, outcomes):
+            sys.stdout.write(output)
+            results.append(result)
+            results_by_simulation[simulation_index].append(result)
+            if not parsed_args.results:
+                print_simulation_result(result)
+            if profiler is None:
+                continue
+            if parsed_args.profile_out:
+                profiles.append(
+                    {
+                        "consensus_name": result.consensus_name,
+                        "phases": profiler.report(),
+                    }
+                )
+            elif parsed_args.profile:
+                print(profiler.format_report(result.consensus_name), file=sys.stderr)
+    finally:
+        if executor is not None:
+            # runs, which haven't started yet, aren't waited for if collecting fails
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    if parsed_args.replicas > 1:
+        estimates = []
+        for config_index, replicas_results in enumerate(results_by_simulation):
+            estimates += estimate_shares(
+                replicas_results, config_index, parsed_args.antithetic
+            )
+        print(format_share_estimates(estimates))
+
+    if parsed_args.crn and len(results_by_simulation) > 1:
+        baseline = results_by_simulation[0]
+        differences = []
+        for config_index, compared in enumerate(results_by_simulation[1:], start=1):
+            differences += paired_differences(
+                list(zip(baseline, compared)), config_index
+            )
+        print(format_paired_differences(differences))
+
+    if parsed_args.results:
+        create_result_sink(parsed_args.results).write(results)
+
+    if parsed_args.profile_out:
+        save_profiles(profiles, parsed_args.profile_out)
+
+    if parsed_args.plot:
+        # plotting is a separate stage, so matplotlib is loaded only if it is requested
+        # pylint: disable=import-outside-toplevel
+        from report import render_results
+
+        render_results(results, show=True)
+
+    return results
 
 
 def main() -> None:
     """Main function of the whole program."""
     args = parse_args()
+    if args.log_level is not None:
+        set_log_level(args.log_level)
+    if args.blockchain in ("serve", "submit"):
+        # pylint: disable=import-outside-toplevel
+        from server import serve, submit
+
+        (serve if args.blockchain == "serve" else submit)(args)
+        return
+    if args.blockchain in ("worker", "broker"):
+        # pylint: disable=import-outside-toplevel
+        from worker import run_broker, run_workers
+
+        (run_workers if args.blockchain == "worker" else run_broker)(args)
+        return
     run_simulations(args)
     log = create_logger("main")
     log.info("logging")
@@ -4,10 +4,10 @@ honest miner for Nakamoto consensus protocol.
 Author: Jan Jakub Kubik (xkubik32)
 Date: 15.3.2023
 """
-import random
 from typing import Set
 
 from base.blockchain import Blockchain
+from base.logs import ROUND_LOGGING
 from base.miner_base import HonestMinerAction as Action
 from base.miner_base import HonestMinerStrategyBase
 
@@ -36,16 +36,18 @@ class HonestMinerStrategy(HonestMinerStrategyBase):
         Returns:
             bool: Whether the fork is ongoing after the block is mined.
         """
-        self.log.info(
-            f"Honest miner: {self.miner_id} is leader of round: {mining_round}"
-        )
+        if ROUND_LOGGING:
+            self.log.debug(
+                "Honest miner: %s is leader of round: %s", self.miner_id, mining_round
+            )
         if ongoing_fork:
             ongoing_fork = False
             if gamma == 0.5:
-                if random.random() <= 0.5:
-                    self.log.info("Previous blocks won selfish miner")
+                if self.rng.random() <= 0.5:
+                    if ROUND_LOGGING:
+                        self.log.debug("Previous blocks won selfish miner")
 
-                    wining_selfish_miner = random.choice(match_competitors)
+                    wining_selfish_miner = self.rng.choice(match_competitors)
                     public_blockchain.override_chain(wining_selfish_miner)
                     # cleaning of competing SM is performed via ADOPT
                     wining_selfish_miner.clear_private_chain()
@@ -0,0 +1,189 @@
+"""Module contains regenerative-cycle engine for long Nakamoto simulations.
+
+Nakamoto simulation regenerates whenever no selfish miner has a private chain
+and there is no ongoing fork: the future of the run doesn't depend on its past
+and blocks in the public blockchain, except the last one, can't be overridden
+any more (the next private chain forks from the last block ID). Rounds between
+two regenerations form independent and identically distributed cycles, so
+the revenue share of a miner is estimated as the ratio of its settled blocks
+and all settled blocks summed over cycles, with the confidence interval from
+the cycle data.
+
+Cycles are independent, so one long run is split into many shorter ones simulated
+in parallel processes, each with its own random stream. Public blockchain is
+compacted at regeneration points, so memory doesn't grow with the number of rounds.
+
+Usage:
+    python main.py nakamoto --regenerative --workers 8
+"""
+from argparse import Namespace
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from base.miner_base import MinerType
+from base.online_stats import CycleStatistics
+from base.results import MinerResult, SimulationResult
+from base.rng import SeedSequence
+from nakamoto.simulation_manager import SimulationManager
+
+
+class RegenerativeSimulationManager(SimulationManager):
+    """Nakamoto simulation manager collecting statistics of regenerative cycles."""
+
+    def compact_public_blockchain(self) -> int:
+        """Drop settled blocks from the public blockchain at a regeneration point.
+
+        Block IDs are shifted together with the chain, so they stay consistent.
+        The last block ID stays positive, so the edge case of the first block
+        of the simulation mined by a selfish miner is not triggered again.
+
+        Returns:
+            int: Number of dropped blocks.
+        """
+        public_blockchain = self.public_blockchain
+        dropped = self.settled_length()
+        if dropped > 0:
+            del public_blockchain.chain[:dropped]
+            public_blockchain.last_block_id -= dropped
+        return dropped
+
+    def run_cycles(self, rounds: int) -> CycleStatistics:
+        """Simulate the given number of rounds and collect statistics of cycles.
+
+        A cycle counts blocks settled during it (see `settled_length`), the last
+        public block of a regeneration point is counted by the next cycle, when
+        it can't be replaced any more. The last unfinished cycle is discarded.
+
+        Args:
+            rounds (int): Number of simulated rounds.
+
+        Returns:
+            CycleStatistics: Statistics of finished cycles.
+        """
+        miner_indexes = {
+            miner.miner_id: index for index, miner in enumerate(self.miners)
+        }
+        statistics = CycleStatistics(miners=len(self.miners))
+        cycle_start = 0
+        cycle_rounds = 0
+
+        for round_id in range(rounds):
+            leader = self.choose_leader(self.miners, self.miners_info)
+            self.winns[leader.miner_id] += 1
+            self.one_round(leader, round_id)
+            cycle_rounds += 1
+            self.progress.update(round_id)
+
+            if self.is_regenerated():
+                settled = self.settled_length()
+                blocks = [0] * len(self.miners)
+                for block in self.public_blockchain.chain[cycle_start:settled]:
+                    blocks[miner_indexes[block.miner_id]] += 1
+                statistics.add_cycle(blocks, cycle_rounds)
+                cycle_rounds = 0
+
+                cycle_start = settled - self.compact_public_blockchain()
+
+        self.progress.finish(rounds)
+        return statistics
+
+
+def _run_worker(
+    simulation_config: Dict[str, Any], rounds: int, seed_sequence: SeedSequence
+) -> Tuple[CycleStatistics, List[int]]:
+    """Run cycles of one worker process.
+
+    Args:
+        simulation_config (Dict[str, Any]): Simulation config from YAML.
+        rounds (int): Number of rounds of the worker.
+        seed_sequence (SeedSequence): Node of the seed tree of the worker.
+
+    Returns:
+        Tuple[CycleStatistics, List[int]]: Statistics of cycles and won rounds per miner.
+    """
+    sim_manager = RegenerativeSimulationManager(
+        simulation_config=simulation_config,
+        blockchain=Namespace(progress="off"),
+        seed_sequence=seed_sequence,
+    )
+    statistics = sim_manager.run_cycles(rounds)
+    return statistics, [
+        sim_manager.winns[miner.miner_id] for miner in sim_manager.miners
+    ]
+
+
+def run_regenerative(
+    simulation_config: Dict[str, Any],
+    workers: int,
+    seed_sequence: Optional[SeedSequence] = None,
+    confidence: float = 0.95,
+) -> SimulationResult:
+    """Run one long Nakamoto simulation as independent cycles in parallel processes.
+
+    Rounds of the simulation are split evenly among workers, every worker
+    has its own child of the seed tree.
+
+    Args:
+        simulation_config (Dict[str, Any]): Simulation config from YAML.
+        workers (int): Number of worker processes.
+        seed_sequence (SeedSequence, optional): Node of the seed tree of the simulation.
+        confidence (float, optional): Confidence level of intervals. Defaults to 0.95.
+
+    Returns:
+        SimulationResult: Result with ratio estimates of shares and their intervals.
+    """
+    if seed_sequence is None:
+        seed_sequence = SeedSequence()
+    # the manager validates the config and creates miners in the same order as workers
+    sim_manager = RegenerativeSimulationManager(
+        simulation_config=simulation_config,
+        blockchain=Namespace(progress="off"),
+        seed_sequence=seed_sequence,
+    )
+    config = sim_manager.config
+    rounds = config.simulation_mining_rounds
+    worker_rounds = [
+        rounds // workers + (1 if index < rounds % workers else 0)
+        for index in range(workers)
+    ]
+
+    statistics = CycleStatistics(miners=len(sim_manager.miners))
+    wins = [0] * len(sim_manager.miners)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_run_worker, simulation_config, count, child)
+            for count, child in zip(worker_rounds, seed_sequence.spawn(workers))
+        ]
+        for future in futures:
+            worker_statistics, worker_wins = future.result()
+            statistics.merge(worker_statistics)
+            wins = [total + count for total, count in zip(wins, worker_wins)]
+
+    miners = []
+    for index, miner in enumerate(sim_manager.miners):
+        miner_type = "honest" if miner.miner_type == MinerType.HONEST else "selfish"
+        miners.append(
+            MinerResult(
+                index=index,
+                miner_id=miner.miner_id,
+                miner_type=miner_type,
+                mining_power=miner.mining_power,
+                blocks=statistics.block_sums[index],
+                share=statistics.share(index),
+                wins=wins[index],
+                strong_blocks=int(statistics.block_sums[index]),
+                share_ci=statistics.share_ci(index, confidence),
+            )
+        )
+
+    return SimulationResult(
+        consensus_name=config.consensus_name,
+        rounds=statistics.rounds,
+        total_blocks=statistics.total_sum,
+        miners=miners,
+        config=asdict(config),
+        seed=seed_sequence.entropy,
+        spawn_key=list(seed_sequence.spawn_key),
+        antithetic=seed_sequence.antithetic,
+    )
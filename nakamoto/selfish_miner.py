@@ -5,19 +5,28 @@ Author: Jan Jakub Kubik (xkubik32)
 Date: 15.3.2023
 """
 import random
-from typing import Optional, Set
+from typing import Any, Callable, List, Optional, Set
 
 from base.blockchain import Blockchain
+from base.logs import ROUND_LOGGING
 from base.miner_base import SelfishMinerAction as SA
 from base.miner_base import SelfishMinerStrategyBase
 
 
 class SelfishMinerStrategy(SelfishMinerStrategyBase):
-    """Selfish miner class implementation for Nakamoto consensus."""
+    """Selfish miner class implementation for Nakamoto consensus.
 
-    def __init__(self, mining_power: int):
-        super().__init__(mining_power)
+    Attributes:
+        blockchain (Blockchain): Private blockchain of the selfish miner.
+        chain_observers (List[Callable[[SelfishMinerStrategy], Any]]): Callbacks
+            of changes of the private blockchain, which are inputs of decisions
+            of the miner. Empty by default.
+    """
+
+    def __init__(self, mining_power: int, rng: Optional[random.Random] = None):
+        super().__init__(mining_power, rng)
         self.blockchain = Blockchain(owner=self.miner_id)
+        self.chain_observers: List[Callable[["SelfishMinerStrategy"], Any]] = []
 
     def __postinit__(self):
         if not hasattr(self, "private_blockchain"):
@@ -29,6 +38,8 @@ class SelfishMinerStrategy(SelfishMinerStrategyBase):
         """Clear private chain after it overrides the main chain."""
         self.blockchain.chain = []
         self.blockchain.fork_block_id = None
+        for observer in self.chain_observers:
+            observer(self)
 
     # pylint: disable=too-many-arguments
     def mine_new_block(
@@ -52,9 +63,10 @@ class SelfishMinerStrategy(SelfishMinerStrategyBase):
         Returns:
             bool: Whether the fork is ongoing after the block is mined.
         """
-        self.log.info(
-            f"Selfish miner: {self.miner_id} is leader of round: {mining_round}"
-        )
+        if ROUND_LOGGING:
+            self.log.debug(
+                "Selfish miner: %s is leader of round: %s", self.miner_id, mining_round
+            )
         self.update_private_blockchain(public_blockchain, mining_round)
 
         if ongoing_fork:
@@ -79,7 +91,7 @@ class SelfishMinerStrategy(SelfishMinerStrategyBase):
                 # my new block and integrate block to the main chain
                 self.action = SA.MATCH
 
-                winner = random.choice(match_competitors + [public_blockchain])
+                winner = self.rng.choice(match_competitors + [public_blockchain])
                 if winner is not public_blockchain:
                     public_blockchain.chain[-1] = winner.blockchain.chain[-1]
 
@@ -171,3 +183,5 @@ class SelfishMinerStrategy(SelfishMinerStrategyBase):
                 f"Selfish miner {self.miner_id}",
                 self.miner_id,
             )
+        for observer in self.chain_observers:
+            observer(self)
@@ -4,33 +4,67 @@ whole simulation of selfish mining for Nakamoto consensus.
 Author: Jan Jakub Kubik (xkubik32)
 Date: 17.3.2023
 """
-import random
+from dataclasses import asdict
+from typing import Dict, List, Optional, Tuple
 
 from base.blockchain import Blockchain
+from base.chain_export import export_chain
+from base.logs import ROUND_LOGGING
 from base.miner_base import HonestMinerAction as HA
 from base.miner_base import MinerType
 from base.miner_base import SelfishMinerAction as SA
+from base.online_stats import CycleStatistics, split_batches
+from base.results import MinerResult, SimulationResult
+from base.revenue_series import RevenueSeries
+from base.rng import SeedSequence
 from base.sim_config_base import SimulationConfigBase as SimulationConfig
-from base.simulation_manager_base import ActionObjectStore, SimulationManagerBase
+from base.simulation_manager_base import (
+    ActionIndex,
+    ActionObjectStore,
+    SimulationManagerBase,
+)
 from nakamoto.honest_miner import HonestMinerStrategy
 from nakamoto.selfish_miner import SelfishMinerStrategy
-from public_blockchain_functions import (
-    calculate_percentage,
-    plot_block_counts,
-    print_attackers_success,
-    print_honest_miner_info,
-)
+from public_blockchain_functions import calculate_percentage
 
 
 class SimulationManager(SimulationManagerBase):
     # pylint: disable=too-many-instance-attributes
     """Mediator class for Nakamoto consensus for running whole simulation."""
 
-    def __init__(self, simulation_config: dict, blockchain: str):
-        super().__init__(simulation_config, blockchain)
-        self.honest_miner = HonestMinerStrategy(mining_power=self.config.honest_miner)
+    PROFILED_METHODS = SimulationManagerBase.PROFILED_METHODS + (
+        "one_round",
+        "decide_next_actions",
+        "add_honest_block",
+        "selfish_override",
+    )
+    PROFILED_MINER_METHODS = SimulationManagerBase.PROFILED_MINER_METHODS + (
+        "decide_next_action",
+    )
+    # Confidence intervals are computed from regenerative cycles, protocols
+    # without clean regeneration points use batch means of the public blockchain
+    REGENERATIVE = True
+    # blocks of protocols with weak headers or fruits have children exported with them
+    BLOCK_CHILDREN = False
+    # Decisions of Nakamoto selfish miners depend only on their private chains and
+    # the last block ID of the public blockchain, so just miners with changed inputs
+    # decide again. Protocols with other inputs of decisions decide with all miners.
+    INCREMENTAL_DECISIONS = True
+    # with a few selfish miners, the bookkeeping costs more than deciding with all
+    INCREMENTAL_MIN_MINERS = 8
+
+    def __init__(
+        self,
+        simulation_config: dict,
+        blockchain: str,
+        seed_sequence: Optional[SeedSequence] = None,
+    ):
+        super().__init__(simulation_config, blockchain, seed_sequence)
+        self.honest_miner = HonestMinerStrategy(
+            mining_power=self.config.honest_miner, rng=self.rng
+        )
         self.selfish_miners = [
-            SelfishMinerStrategy(mining_power=sm_power)
+            SelfishMinerStrategy(mining_power=sm_power, rng=self.rng)
             for sm_power in self.config.selfish_miners
         ]
         self.miners = [self.honest_miner] + self.selfish_miners
@@ -38,7 +72,20 @@ class SimulationManager(SimulationManagerBase):
             sm.mining_power for sm in self.selfish_miners
         ]
         self.public_blockchain = Blockchain(owner="public blockchain")
-        self.action_store = ActionObjectStore()
+        self.incremental_decisions = (
+            self.INCREMENTAL_DECISIONS
+            and len(self.selfish_miners) >= self.INCREMENTAL_MIN_MINERS
+        )
+        if self.incremental_decisions:
+            self.action_store = ActionIndex(self.selfish_miners)
+            # every miner decides in the first round
+            self._changed_miners = set(self.selfish_miners)
+            self._miners_with_chain = set()
+            self._decided_block_id = None
+            for selfish_miner in self.selfish_miners:
+                selfish_miner.chain_observers.append(self._changed_miners.add)
+        else:
+            self.action_store = ActionObjectStore()
         self.ongoing_fork = False
 
         self.winns = {
@@ -78,14 +125,15 @@ class SimulationManager(SimulationManagerBase):
 
     def resolve_matches(self) -> None:
         """Resolve matches between honest miner and selfish miners."""
-        self.log.info("resolve_matches")
+        if ROUND_LOGGING:
+            self.log.debug("resolve_matches")
         match_objects = self.action_store.get_objects(SA.MATCH)
 
         if self.ongoing_fork:
             self.ongoing_fork = False
 
             # random choice of winner
-            winner = random.choice(match_objects + [self.honest_miner])
+            winner = self.rng.choice(match_objects + [self.honest_miner])
             if winner.miner_type == MinerType.HONEST:
                 # nothing to do. Not necessary to override the last block
                 pass
@@ -105,7 +153,8 @@ class SimulationManager(SimulationManagerBase):
 
             if self.config.gamma == 1:
                 # integrate attacker's last block to the public blockchain
-                self.log.info("SM wins")
+                if ROUND_LOGGING:
+                    self.log.debug("SM wins")
                 self.public_blockchain.override_chain(match_obj)
                 match_obj.clear_private_chain()
                 self.action_store.remove_object(SA.MATCH, match_obj)
@@ -132,7 +181,7 @@ class SimulationManager(SimulationManagerBase):
     def resolve_overrides_select_from_multiple_attackers(self, attackers):
         """Customizable method for selecting of override attacker winner if there
         is more than one attacker with override."""
-        return random.choice(attackers)
+        return self.rng.choice(attackers)
 
     def resolve_overrides(self) -> None:
         """Resolve any overrides that need to occur after mining."""
@@ -255,15 +304,32 @@ class SimulationManager(SimulationManagerBase):
             elif action not in [SA.MATCH, SA.ADOPT]:
                 raise Exception("Fatal error ongoing fork")
 
+        all_actions = self.decide_next_actions(leader)
+        if SA.MATCH in all_actions:
+            self.resolve_matches()
+
+    def decide_next_actions(self, leader) -> List:
+        """Let all selfish miners decide their next actions and resolve overrides
+        until no selfish miner wants to override the public blockchain.
+
+        Args:
+            leader (MinerStrategyBase): Leader of the current round.
+
+        Returns:
+            List: Final actions of all selfish miners.
+        """
         while True:
             # override loop
-            self.action_store.clear()
+            if self.incremental_decisions:
+                self.decide_changed_actions(leader)
+            else:
+                self.action_store.clear()
 
-            for selfish_miner in self.selfish_miners:
-                action = selfish_miner.decide_next_action(
-                    self.public_blockchain, leader
-                )
-                self.action_store.add_object(action, selfish_miner)
+                for selfish_miner in self.selfish_miners:
+                    action = selfish_miner.decide_next_action(
+                        self.public_blockchain, leader
+                    )
+                    self.action_store.add_object(action, selfish_miner)
             all_actions = self.action_store.get_actions()
 
             # replacement for `do-while` which is not in python
@@ -273,8 +339,34 @@ class SimulationManager(SimulationManagerBase):
 
             self.resolve_overrides()
 
-        if SA.MATCH in all_actions:
-            self.resolve_matches()
+        return all_actions
+
+    def decide_changed_actions(self, leader) -> None:
+        """Let selfish miners with changed inputs of decisions decide their next actions.
+
+        Private chains report their changes and miners with a private chain decide
+        after every change of the last block ID of the public blockchain. Actions
+        of other miners are carried forward in the action index.
+
+        Args:
+            leader (MinerStrategyBase): Leader of the current round.
+        """
+        self.action_store.refresh()
+        changed_miners = self._changed_miners
+        if self.public_blockchain.last_block_id != self._decided_block_id:
+            self._decided_block_id = self.public_blockchain.last_block_id
+            changed_miners.update(self._miners_with_chain)
+
+        deciding_miners = list(changed_miners)
+        # adopting miners clear their chains and report the change for the next decision
+        changed_miners.clear()
+        for selfish_miner in deciding_miners:
+            action = selfish_miner.decide_next_action(self.public_blockchain, leader)
+            self.action_store.set_action(selfish_miner, action)
+            if selfish_miner.blockchain.chain:
+                self._miners_with_chain.add(selfish_miner)
+            else:
+                self._miners_with_chain.discard(selfish_miner)
 
     def run_simulation(self):
         """Main business logic for running selfish mining simulation."""
@@ -284,15 +376,24 @@ class SimulationManager(SimulationManagerBase):
             leader = self.choose_leader(self.miners, self.miners_info)
             self.winns[leader.miner_id] += 1
             self.one_round(leader, blocks_mined)
+            self.progress.update(blocks_mined)
+            if self.observed and self.observe_round(blocks_mined + 1, leader):
+                break
 
+        self.progress.finish(self.simulated_rounds)
         self.log.info(self.config.simulation_mining_rounds)
         self.log.info(self.winns)
 
-        # !!! handle extreme case !!!, when any of selfish miner
-        # has the longest chain after the end of simulation.
-        # This happens only if any of SM has higher mining power than HM
-        # Select the selfish miner with the longest chain if any exists
-        # or if the length is the same, then random select
+        self.publish_longest_private_chain()
+
+    def publish_longest_private_chain(self) -> None:
+        """Override the public blockchain with the longest waiting private chain.
+
+        It handles the extreme case, when any of selfish miners has the longest
+        chain after the end of simulation. This happens only if any of SM has higher
+        mining power than HM. If more attackers have the longest chain, the winner
+        is selected randomly.
+        """
         match_attackers = self.action_store.get_objects(SA.WAIT)
         if len(match_attackers) > 0:
             miner_and_len = list()
@@ -305,37 +406,298 @@ class SimulationManager(SimulationManagerBase):
             # Filter the attackers with the highest value
             matching_miners = [obj for obj in miner_and_len if obj[1] == max_value]
             # Select a random object among the ones with the highest value
-            winner = random.choice(matching_miners)[0]
+            winner = self.rng.choice(matching_miners)[0]
             self.public_blockchain.override_chain(winner)
 
-    def run(self):
-        """Run the simulation, process the results and plot the block counts."""
-        self.log.info("Mediator in Nakamoto")
+    def is_regenerated(self) -> bool:
+        """Check if the simulation is in the regeneration state.
 
-        self.run_simulation()
+        Returns:
+            bool: True if there is no private chain and no ongoing fork.
+        """
+        if self.ongoing_fork:
+            return False
+        for selfish_miner in self.selfish_miners:
+            if selfish_miner.blockchain.chain:
+                return False
+        return True
+
+    def settled_length(self) -> int:
+        """Get number of final blocks of the public blockchain at a regeneration point.
+
+        The next private chain forks from the last block ID, so its override
+        can still replace blocks from the position `last_block_id - 1`.
+
+        Returns:
+            int: Number of blocks, which can't be overridden any more.
+        """
+        public_blockchain = self.public_blockchain
+        return max(
+            min(len(public_blockchain.chain), public_blockchain.last_block_id - 1), 0
+        )
+
+    def result_chain(self) -> List:
+        """Get the chain, in which blocks are counted for results.
+
+        Returns:
+            List: List of blocks of the public blockchain.
+        """
+        return self.public_blockchain.chain
+
+    def block_children(self, block) -> List[int]:
+        """Get miner IDs of children of the block (e.g. weak headers) for the export.
+
+        Args:
+            block (Block): Block of the result chain.
+
+        Returns:
+            List[int]: Miner IDs of children, Nakamoto blocks have no children.
+        """
+        return []
+
+    def export_result_chain(self, path: str) -> None:
+        """Export the chain, in which blocks are counted, to the binary file.
+
+        Args:
+            path (str): Path to the output file.
+        """
+        export_chain(
+            path,
+            self.protocol,
+            self.result_chain(),
+            self.block_children if self.BLOCK_CHILDREN else None,
+        )
+
+    def share_counts(self, chain: List) -> List[float]:
+        """Count blocks of all miners in the given chain in the order of miners.
+
+        Args:
+            chain (List): List of blocks, e.g. one cycle or batch.
+
+        Returns:
+            List[float]: Block counts, the honest miner is the first one.
+        """
+        # block counts are keyed by names of the honest and then selfish miners
+        return list(self.count_blocks(chain)[0].values())
 
+    def observe_round(self, rounds: int, leader) -> bool:
+        """Update all enabled observers of the run after the finished round.
+
+        Args:
+            rounds (int): Number of finished rounds.
+            leader (MinerStrategyBase): Leader of the round.
+
+        Returns:
+            bool: True if the simulation should stop.
+        """
+        if self.revenue_series is not None and self.revenue_series.due(rounds):
+            self.revenue_series.record(
+                rounds,
+                len(self.result_chain()),
+                self.ongoing_fork,
+                self.longest_private_chain(),
+                [self.winns[miner.miner_id] for miner in self.miners],
+            )
+        if self.state_trace is not None:
+            action = leader.action
+            self.state_trace.record(
+                rounds,
+                self._miner_positions[leader.miner_id],
+                -1 if action is None else action.value,
+                self.ongoing_fork,
+                len(self.public_blockchain.chain),
+                self.selfish_leads(),
+            )
+        if self.fork_stats is not None:
+            self.fork_stats.record_round(self.ongoing_fork, self.match_count())
+
+        return self.share_monitor is not None and self.update_share_monitor(rounds)
+
+    def longest_private_chain(self) -> int:
+        """Get length of the longest private chain of all selfish miners.
+
+        Returns:
+            int: Number of blocks of the longest private chain.
+        """
+        return max(len(miner.blockchain.chain) for miner in self.selfish_miners)
+
+    def match_count(self) -> int:
+        """Get number of selfish miners matching the public blockchain.
+
+        Returns:
+            int: Number of selfish miners with the MATCH action.
+        """
+        return len(self.action_store.get_objects(SA.MATCH))
+
+    def selfish_leads(self) -> List[int]:
+        """Get leads of private chains of all selfish miners over the public blockchain.
+
+        Returns:
+            List[int]: Leads, 0 for miners without private chain.
+        """
+        leads = []
+        for miner in self.selfish_miners:
+            if miner.blockchain.chain and miner.blockchain.fork_block_id is not None:
+                leads.append(miner.lead_length(self.public_blockchain))
+            else:
+                leads.append(0)
+        return leads
+
+    def update_share_monitor(self, rounds: int) -> bool:
+        """Update online statistics of shares after the finished round.
+
+        Args:
+            rounds (int): Number of finished rounds.
+
+        Returns:
+            bool: True if the requested precision is reached and the simulation should stop.
+        """
+        monitor = self.share_monitor
+        if self.REGENERATIVE:
+            monitor.cycle_rounds += 1
+            if not self.is_regenerated():
+                return False
+            settled = self.settled_length()
+            monitor.add_cycle(
+                self.share_counts(
+                    self.public_blockchain.chain[monitor.cycle_start : settled]
+                ),
+                settled,
+            )
+
+        if monitor.should_check(rounds) and monitor.precision_reached(
+            self.share_statistics()
+        ):
+            self.log.info("Requested precision reached after %s rounds", rounds)
+            self.simulated_rounds = rounds
+            return True
+        return False
+
+    def share_statistics(self) -> Optional[CycleStatistics]:
+        """Get statistics of samples of block counts for confidence intervals of shares.
+
+        Returns:
+            Optional[CycleStatistics]: Statistics of regenerative cycles or batches,
+                                       None if there is no sample yet.
+        """
+        if self.REGENERATIVE:
+            return self.share_monitor.cycles
+
+        chain = self.result_chain()
+        if not chain:
+            return None
+        return CycleStatistics.from_samples(
+            [self.share_counts(batch) for batch in split_batches(chain)]
+        )
+
+    def count_blocks(
+        self, chain: List
+    ) -> Tuple[Dict[str, float], Dict[int, int], Dict[int, int]]:
+        """Count blocks of all miners in the given chain.
+
+        Args:
+            chain (List): List of blocks, usually the final public blockchain.
+
+        Returns:
+            Tuple[Dict[str, float], Dict[int, int], Dict[int, int]]: Block counts keyed by
+                miner names and counts of weak and strong blocks keyed by miner IDs.
+        """
         block_counts = {f"Honest miner {self.honest_miner.miner_id}": 0}
         for miner in self.selfish_miners:
             block_counts.update({f"Selfish miner {miner.miner_id}": 0})
+        weak_counts = {miner.miner_id: 0 for miner in self.miners}
+        strong_counts = {miner.miner_id: 0 for miner in self.miners}
 
-        for block in self.public_blockchain.chain:
+        for block in chain:
             block_counts[block.miner] += 1
+            if block.is_weak:
+                weak_counts[block.miner_id] += 1
+            else:
+                strong_counts[block.miner_id] += 1
+
+        return block_counts, weak_counts, strong_counts
 
-        attacker_ids = [
-            miner.miner_id for miner in self.selfish_miners
-        ]  # List of attacker IDs
-        honest_miner_id = self.honest_miner.miner_id  # Honest miner ID
+    def build_result(
+        self,
+        block_counts: Dict[str, float],
+        weak_counts: Dict[int, int],
+        strong_counts: Dict[int, int],
+    ) -> SimulationResult:
+        """Create structured result of the finished simulation.
 
+        Args:
+            block_counts (Dict[str, float]): Block counts keyed by miner names.
+            weak_counts (Dict[int, int]): Counts of weak blocks keyed by miner IDs.
+            strong_counts (Dict[int, int]): Counts of strong blocks keyed by miner IDs.
+
+        Returns:
+            SimulationResult: Result of the simulation.
+        """
         total_blocks = sum(block_counts.values())
         percentages = calculate_percentage(block_counts, total_blocks)
-        print_attackers_success(block_counts, percentages, self.winns, attacker_ids)
-        print_honest_miner_info(block_counts, percentages, self.winns, honest_miner_id)
+        series = None
+        if self.revenue_series is not None:
+            series = RevenueSeries.to_dict(
+                self.revenue_series.finish(self.result_chain(), self.share_counts)
+            )
+        if self.fork_stats is not None:
+            self.fork_stats.finish(self.result_chain())
+        intervals = None
+        if self.share_monitor is not None:
+            statistics = self.share_statistics()
+            if statistics is not None:
+                intervals = self.share_monitor.intervals(statistics)
+
+        miners = []
+        for index, miner in enumerate(self.miners):
+            miner_type = "honest" if miner.miner_type == MinerType.HONEST else "selfish"
+            miner_name = f"{miner_type.capitalize()} miner {miner.miner_id}"
+            miners.append(
+                MinerResult(
+                    index=index,
+                    miner_id=miner.miner_id,
+                    miner_type=miner_type,
+                    mining_power=miner.mining_power,
+                    blocks=block_counts[miner_name],
+                    share=percentages[miner_name],
+                    wins=self.winns[miner.miner_id],
+                    weak_blocks=weak_counts[miner.miner_id],
+                    strong_blocks=strong_counts[miner.miner_id],
+                    share_ci=intervals[index] if intervals else None,
+                )
+            )
+
+        return SimulationResult(
+            consensus_name=self.config.consensus_name,
+            rounds=self.simulated_rounds,
+            total_blocks=total_blocks,
+            miners=miners,
+            config=asdict(self.config),
+            seed=self.seed_sequence.entropy,
+            spawn_key=list(self.seed_sequence.spawn_key),
+            antithetic=self.seed_sequence.antithetic,
+            series=series,
+            fork_stats=self.fork_stats.to_dict() if self.fork_stats else None,
+        )
+
+    def run(self) -> SimulationResult:
+        """Run the simulation and process the results.
+
+        Returns:
+            SimulationResult: Result of the simulation.
+        """
+        self.log.info("Mediator in Nakamoto")
+
+        self.run_simulation()
+
+        block_counts, weak_counts, strong_counts = self.count_blocks(
+            self.public_blockchain.chain
+        )
 
-        # print(block_counts)
         # import json
         # visualize whole blockchain
         # print(json.dumps(self.public_blockchain.to_dict()))
         # self.log.info(block_counts)
         # self.log.info(self.selfish_miners[0].blockchain.chain)
 
-        plot_block_counts(block_counts, self.miners_info)
+        return self.build_result(block_counts, weak_counts, strong_counts)
@@ -4,23 +4,34 @@ plotting public blockchain after simulation.
 Author: Jan Jakub Kubik (xkubik32)
 Date: 10.4.2023
 """
-from typing import Dict, List, Union
+from typing import Any, Dict, List, Optional, Union
 
-import matplotlib.pyplot as plt
+from base.results import SimulationResult
 
 
-def plot_block_counts(block_counts: Dict[str, int], miners_info: List[float]) -> None:
+def plot_block_counts(
+    block_counts: Dict[str, int], miners_info: List[float], axes: Optional[Any] = None
+) -> None:
     """
     Plots the percentage of blocks mined by each miner.
 
+    Matplotlib is imported only here, so simulations don't load it at all.
+
     Args:
         block_counts (Dict[str, int]): A dictionary with miner names as keys and
                                        the number of blocks mined as values.
         miners_info (List[float]): A list of mining powers for each miner.
+        axes (Any, optional): Matplotlib axes for drawing of the plot. If it is not set,
+                              the current figure is used and shown interactively.
 
     Returns:
         None
     """
+    # pylint: disable=import-outside-toplevel
+    import matplotlib.pyplot as plt
+
+    plot = plt.gca() if axes is None else axes
+
     miner_names = list(block_counts.keys())
     total_blocks = sum(block_counts.values())
     block_percentages = [
@@ -30,12 +41,12 @@ def plot_block_counts(block_counts: Dict[str, int], miners_info: List[float]) ->
     mining_powers = miners_info
     mining_power_labels = [f"{power:.1f}%" for power in mining_powers]
 
-    bars = plt.bar(miner_names, block_percentages)
+    bars = plot.bar(miner_names, block_percentages)
 
     for bar_new, label, miner_name in zip(bars, mining_power_labels, miner_names):
         height = bar_new.get_height()
         block_count = block_counts[miner_name]
-        plt.text(
+        plot.text(
             bar_new.get_x() + bar_new.get_width() / 2,
             height,
             f"{label}\n{block_count} blocks",
@@ -44,13 +55,14 @@ def plot_block_counts(block_counts: Dict[str, int], miners_info: List[float]) ->
             fontsize=10,
         )
 
-    plt.xlabel("Miner")
-    plt.ylabel("Percentage of Blocks Mined")
-    plt.title(
+    plot.set_xlabel("Miner")
+    plot.set_ylabel("Percentage of Blocks Mined")
+    plot.set_title(
         f"Percentage of Blocks Mined by Each Miner (Mining Power and Block "
         f"Count on Top of Bars)\nTotal Blocks: {total_blocks}"
     )
-    plt.show()
+    if axes is None:
+        plt.show()
 
 
 def float_with_comma(number: float) -> str:
@@ -173,3 +185,64 @@ def print_honest_miner_info(
         print(block_counts_same[f"{miner_name} strong"])
     else:
         print(block_counts[miner_name])
+
+
+def print_simulation_result(result: SimulationResult) -> None:
+    """
+    Print the success information of all miners from the simulation result.
+
+    Output is the same as the one of `print_attackers_success` and
+    `print_honest_miner_info` for the given result, followed by the seed of the run.
+
+    Args:
+        result (SimulationResult): Result of the simulation.
+
+    Returns:
+        None
+    """
+    is_strongchain = result.consensus_name.lower() == "strongchain"
+
+    block_counts = result.block_counts()
+    percentages = {}
+    winns = {}
+    block_counts_same = {} if is_strongchain else None
+    for miner in result.miners:
+        name = miner.name
+        percentages[name] = miner.share
+        winns[miner.miner_id] = miner.wins
+        if is_strongchain:
+            block_counts_same[f"{name} weak"] = miner.weak_blocks
+            block_counts_same[f"{name} strong"] = miner.strong_blocks
+
+    attacker_ids = [miner.miner_id for miner in result.selfish_miners]
+    print_attackers_success(
+        block_counts,
+        percentages,
+        winns,
+        attacker_ids,
+        block_counts_same,
+        is_strongchain,
+    )
+    print_honest_miner_info(
+        block_counts,
+        percentages,
+        winns,
+        result.honest_miner.miner_id,
+        block_counts_same,
+        is_strongchain,
+    )
+    for miner in result.miners:
+        if miner.share_ci is not None:
+            print(f"{miner.name} share: {miner.share:.4f} % +- {miner.share_ci:.4f}")
+    if result.fork_stats is not None:
+        stats = result.fork_stats
+        print(
+            f"Overrides: {stats['overrides']}, mean reorg depth: "
+            f"{stats['mean_reorg_depth']:.3f}, forks: {stats['forks']}, "
+            f"mean fork duration: {stats['mean_fork_duration']:.3f}"
+        )
+        print(f"Orphaned blocks: {stats['orphaned']}")
+    if result.seed is not None:
+        spawn_key = ".".join(str(index) for index in result.spawn_key)
+        antithetic = " (antithetic)" if result.antithetic else ""
+        print(f"Seed: {result.seed}, spawn key: {spawn_key}{antithetic}")
@@ -0,0 +1,80 @@
+"""Module with report stage, which renders figures from stored simulation results.
+
+All figures are rendered in one process with the non-interactive Agg backend,
+so simulations never block on `plt.show()` and don't load matplotlib at all.
+
+Usage:
+    python report.py results.jsonl --out-dir figures
+"""
+import argparse
+import os
+from typing import List, Optional, Sequence
+
+from base.results import SimulationResult, load_results
+from public_blockchain_functions import plot_block_counts
+
+
+def render_results(
+    results: Sequence[SimulationResult],
+    out_dir: Optional[str] = None,
+    show: bool = False,
+) -> List[str]:
+    """Render block counts of all results.
+
+    Args:
+        results (Sequence[SimulationResult]): Results for rendering.
+        out_dir (str, optional): Directory for saving of figures as PNG files.
+        show (bool, optional): Show all figures interactively at the end.
+                               Defaults to False, which uses the Agg backend.
+
+    Returns:
+        List[str]: Paths of saved figures.
+    """
+    # pylint: disable=import-outside-toplevel
+    import matplotlib
+
+    if not show:
+        matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    if out_dir is not None:
+        os.makedirs(out_dir, exist_ok=True)
+
+    paths = []
+    for index, result in enumerate(results):
+        figure, axes = plt.subplots(figsize=(12, 7))
+        plot_block_counts(
+            result.block_counts(), [miner.mining_power for miner in result.miners], axes
+        )
+
+        if out_dir is not None:
+            path = os.path.join(out_dir, f"{index}_{result.consensus_name.lower()}.png")
+            figure.savefig(path)
+            paths.append(path)
+        if not show:
+            plt.close(figure)
+
+    if show:
+        plt.show()
+
+    return paths
+
+
+def main() -> None:
+    """Render figures of all results from the given JSONL files."""
+    parser = argparse.ArgumentParser(
+        description="Render figures from stored selfish mining simulation results."
+    )
+    parser.add_argument("results", nargs="+", help="JSONL files with results")
+    parser.add_argument(
+        "--out-dir", type=str, default="figures", help="Output directory for figures"
+    )
+    args = parser.parse_args()
+
+    results = [result for path in args.results for result in load_results(path)]
+    paths = render_results(results, out_dir=args.out_dir)
+    print(f"Rendered {len(paths)} figures into {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,8 @@
-import pandas as pd
-import numpy as np
-import json
 import argparse
+import csv
+import json
+from collections import Counter
+
 
 def main():
     parser = argparse.ArgumentParser()
@@ -11,17 +12,22 @@ def main():
     args = parser.parse_args()
 
     block_reward = args.block_reward  # times of fruits
-    df = pd.read_csv(args.input)
-    block_counts = df['miner_id'].value_counts()
+
+    # Plain csv module is used instead of pandas/numpy, because this script
+    # runs once for every simulation and their import time dominates its runtime
+    with open(args.input, newline='') as file:
+        rows = [(int(row['miner_id']), row['fruits']) for row in csv.DictReader(file)]
+
+    block_counts = Counter(miner_id for miner_id, _ in rows)
     # block_counts = block_counts.sort_index(ascending=True)
 
     print('Miners:')
-    print(block_counts.keys().values)
+    print([miner for miner, _ in block_counts.most_common()])
 
     print('Blocks (count):')
-    print(block_counts.values)
+    print([count for _, count in block_counts.most_common()])
 
-    miners = block_counts.keys().values
+    miners = [miner for miner, _ in block_counts.most_common()]
     # miners.sort()
 
     # Resolve fruit count
@@ -35,27 +41,22 @@ def main():
     total_reward_from_all = 0
 
     # print('Fruits:')
-    for index, row in df.iterrows():
-        fruit_rewards = json.loads(row['fruits'])
-        unique, counts = np.unique(fruit_rewards, return_counts=True)
-        i = 0
-        for miner in unique:
+    for _, fruits in rows:
+        fruit_rewards = Counter(json.loads(fruits))
+        for miner in sorted(fruit_rewards):
             if miner not in fruit_count:
                 fruit_count[miner] = 0
-            fruit_count[miner] += counts[i]
-            i += 1
-        # for miner in miners:
-            # fruit_count[miner] += fruit_rewards.count(miner)
+            fruit_count[miner] += fruit_rewards[miner]
 
     print('Before block count')
     print(fruit_count)
 
     # print(f'Total (with block {block_reward}x reward):')
     total_reward = {}
-    for index, row in df.iterrows():
-        if row['miner_id'] not in fruit_count:
-            fruit_count[row['miner_id']] = 0
-        fruit_count[row['miner_id']] += block_reward
+    for miner_id, _ in rows:
+        if miner_id not in fruit_count:
+            fruit_count[miner_id] = 0
+        fruit_count[miner_id] += block_reward
 
     # Block are also stored in fruit_count
     print('After block count')
@@ -89,4 +90,4 @@ def main():
         json.dump(perc, file)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,416 @@
+"""Module with the simulation server and its client.
+
+The server keeps a pool of warm worker processes with imported simulators and
+accepts jobs over HTTP on a Unix socket or a localhost TCP port:
+
++ `POST /simulate` -- JSON body `{"args": [...], "config": [...]}`, where `args` are
+  arguments of main.py (e.g. `["--seed", "3", "nakamoto"]`) and the optional `config`
+  is the loaded YAML config used instead of the config file. The response is
+  `{"results": [...], "output": "..."}` with results of all runs
+  (see `SimulationResult.to_dict`) and the printed output of the job
++ `GET /health` -- `{"workers": N}`
+
+Errors are returned as `{"error": "..."}` with status 400 for invalid jobs
+and 500 for failed simulations. Shell scripts can submit jobs with curl:
+
+    curl --unix-socket smasf.sock -d '{"args": ["nakamoto"]}' http://localhost/simulate
+
+`SimulationClient` submits jobs from Python (e.g. notebooks) over a persistent
+connection and `main.py submit` submits many jobs read from stdin concurrently.
+"""
+import http.client
+import importlib
+import io
+import json
+import multiprocessing
+import os
+import shlex
+import signal
+import socket
+import stat
+import sys
+import threading
+from argparse import Namespace
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stderr, redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import count
+from socketserver import ThreadingMixIn, UnixStreamServer
+from typing import Any, Dict, List, Optional, Tuple
+
+from base.logs import create_logger
+from base.miner_base import MinerStrategyBase
+from base.results import SimulationResult
+from sm_utils import load_simulations_config, parse_args
+
+# Unix socket of the server if neither --socket nor --port is given
+DEFAULT_SOCKET = "smasf.sock"
+
+# Packages of simulation managers imported by workers before the first job
+SIMULATION_PACKAGES = (
+    "nakamoto",
+    "subchain.weak",
+    "subchain.strong",
+    "strongchain",
+    "fruitchain",
+)
+
+
+class JobError(ValueError):
+    """Invalid job submitted to the server."""
+
+
+class SimulationServerError(RuntimeError):
+    """Error response of the simulation server."""
+
+
+def _warm_up() -> None:
+    for package in SIMULATION_PACKAGES:
+        importlib.import_module(package + ".simulation_manager")
+
+
+def run_job(args: List[str], config: Optional[Any] = None) -> Dict[str, Any]:
+    """Run the job in the worker process.
+
+    Args:
+        args (List[str]): Arguments of main.py.
+        config (Optional[Any], optional): Loaded simulations config, the config
+                                          file of arguments if None. Defaults to None.
+
+    Raises:
+        JobError: Arguments are invalid or not supported by the server.
+
+    Returns:
+        Dict[str, Any]: Results of all runs and the printed output.
+    """
+    # pylint: disable=import-outside-toplevel,cyclic-import
+    from main import run_simulations
+
+    errors = io.StringIO()
+    try:
+        with redirect_stderr(errors):
+            parsed_args = parse_args(args)
+    except SystemExit as error:
+        # the last line of argparse errors is the message without the usage
+        message = errors.getvalue().strip().splitlines()
+        raise JobError(message[-1] if message else "Invalid arguments") from error
+
+    if parsed_args.blockchain in (None, "serve", "submit", "worker", "broker"):
+        raise JobError("Job must simulate one of the blockchains")
+    if parsed_args.plot:
+        raise JobError("--plot isn't supported by the server")
+    if getattr(parsed_args, "regenerative", False):
+        raise JobError("--regenerative runs its own worker processes, use main.py")
+    if parsed_args.jobs > 1:
+        raise JobError("--jobs runs its own worker processes, use main.py")
+    if parsed_args.blockchain == "fruitchain" and parsed_args.out is None:
+        # results are returned, so the file of fruits is written only if it is requested
+        parsed_args.out = os.devnull
+
+    # workers are reused, so miner IDs start from 1 for every job like in main.py
+    MinerStrategyBase.counter = count(start=1)
+    output = io.StringIO()
+    with redirect_stdout(output):
+        results = run_simulations(parsed_args, config)
+    return {
+        "results": [result.to_dict() for result in results],
+        "output": output.getvalue(),
+    }
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    """Handler of HTTP requests, every connection is served by its own thread."""
+
+    # connections are kept alive, so clients pay the connection setup only once
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        """Answer health checks with the number of workers."""
+        if self.path != "/health":
+            self._send(404, {"error": f"Unknown path {self.path}"})
+            return
+        self._send(200, {"workers": self.server.workers})
+
+    def do_POST(self) -> None:  # pylint: disable=invalid-name
+        """Run the simulation job in a worker and send its results."""
+        if self.path != "/simulate":
+            self._send(404, {"error": f"Unknown path {self.path}"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            job = json.loads(self.rfile.read(length))
+            args = job["args"]
+            if not isinstance(args, list) or not all(
+                isinstance(arg, str) for arg in args
+            ):
+                raise TypeError("args must be a list of strings")
+        except (ValueError, KeyError, TypeError) as error:
+            self._send(400, {"error": f"Invalid job: {error}"})
+            return
+
+        try:
+            response = self.server.pool.apply_async(
+                run_job, (args, job.get("config"))
+            ).get()
+        except JobError as error:
+            self._send(400, {"error": str(error)})
+        except Exception as error:  # pylint: disable=broad-except
+            self.server.log.warning("job %s failed: %r", args, error)
+            self._send(500, {"error": f"{type(error).__name__}: {error}"})
+        else:
+            self._send(200, response)
+
+    def _send(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def address_string(self) -> str:
+        # clients of Unix sockets have no address
+        return str(self.client_address[0]) if self.client_address else "local"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        # pylint: disable=redefined-builtin
+        self.server.log.debug(format, *args)
+
+
+class _SimulationServer:
+    """Server state shared by request handlers.
+
+    Attributes:
+        workers (int): Number of worker processes.
+        pool (multiprocessing.pool.Pool): Pool of workers running jobs.
+        log (LazyLogger): Logger of the server.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, server_address: Any, handler: type, workers: int):
+        super().__init__(server_address, handler)
+        self.workers = workers
+        # workers are started and import all simulators before the first job
+        self.pool = multiprocessing.Pool(workers, initializer=_warm_up)
+        self.log = create_logger("server")
+
+
+class _TcpServer(_SimulationServer, ThreadingHTTPServer):
+    pass
+
+
+class _UnixServer(_SimulationServer, ThreadingMixIn, UnixStreamServer):
+    pass
+
+
+def _remove_stale_socket(path: str) -> None:
+    if not os.path.exists(path):
+        return
+    if not stat.S_ISSOCK(os.stat(path).st_mode):
+        raise FileExistsError(f"{path} exists and it isn't a socket")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(path)
+        except OSError:
+            os.remove(path)
+            return
+    raise FileExistsError(f"Another server is listening on {path}")
+
+
+def serve(parsed_args: Namespace) -> None:
+    """Run the simulation server until it is interrupted.
+
+    Args:
+        parsed_args (Namespace): Parsed arguments of the `serve` command.
+    """
+    socket_path = None
+    if parsed_args.port is not None:
+        server = _TcpServer(
+            ("127.0.0.1", parsed_args.port), _RequestHandler, parsed_args.workers
+        )
+        address = f"http://127.0.0.1:{server.server_address[1]}"
+    else:
+        socket_path = parsed_args.socket or DEFAULT_SOCKET
+        _remove_stale_socket(socket_path)
+        server = _UnixServer(socket_path, _RequestHandler, parsed_args.workers)
+        address = socket_path
+
+    print(
+        f"Simulation server with {parsed_args.workers} workers listening on {address}",
+        file=sys.stderr,
+    )
+
+    def stop(*_):
+        raise KeyboardInterrupt
+
+    # SIGTERM stops the server like Ctrl-C, workers keep the default handler
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.pool.terminate()
+        server.pool.join()
+        if socket_path is not None and os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP connection over the Unix socket."""
+
+    def __init__(self, socket_path: str, timeout: Optional[float] = None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class SimulationClient:
+    """Client of the simulation server with one persistent connection.
+
+    It isn't thread-safe, every thread should use its own client.
+
+    Attributes:
+        socket_path (Optional[str]): Unix socket of the server.
+        port (Optional[int]): Localhost TCP port of the server, used instead of
+                              the socket if it is set.
+        timeout (Optional[float]): Timeout of the connection in seconds.
+    """
+
+    def __init__(
+        self,
+        socket_path: Optional[str] = None,
+        port: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ):
+        self.socket_path = socket_path or DEFAULT_SOCKET
+        self.port = port
+        self.timeout = timeout
+        self._connection: Optional[http.client.HTTPConnection] = None
+
+    def _connect(self) -> http.client.HTTPConnection:
+        if self._connection is None:
+            if self.port is not None:
+                self._connection = http.client.HTTPConnection(
+                    "127.0.0.1", self.port, timeout=self.timeout
+                )
+            else:
+                self._connection = _UnixHTTPConnection(self.socket_path, self.timeout)
+        return self._connection
+
+    def request(
+        self, method: str, path: str, body: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Send the request and return the decoded response.
+
+        Args:
+            method (str): HTTP method.
+            path (str): Path of the endpoint, e.g. `/simulate`.
+            body (Optional[Dict[str, Any]], optional): JSON body. Defaults to None.
+
+        Raises:
+            SimulationServerError: Server returned an error.
+
+        Returns:
+            Dict[str, Any]: Decoded JSON response.
+        """
+        data = None if body is None else json.dumps(body).encode()
+        headers = {"Content-Type": "application/json"}
+        # the kept-alive connection could be closed by the server, then it is renewed
+        for attempt in range(2):
+            connection = self._connect()
+            try:
+                connection.request(method, path, data, headers)
+                response = connection.getresponse()
+                payload = json.loads(response.read())
+                break
+            except (http.client.RemoteDisconnected, BrokenPipeError):
+                self.close()
+                if attempt:
+                    raise
+
+        if response.status != 200:
+            raise SimulationServerError(payload.get("error", response.reason))
+        return payload
+
+    def simulate(
+        self, args: List[str], config: Optional[Any] = None
+    ) -> List[SimulationResult]:
+        """Run the simulation job on the server.
+
+        Args:
+            args (List[str]): Arguments of main.py, e.g. `["--seed", "3", "nakamoto"]`.
+            config (Optional[Any], optional): Simulations config in the format
+                of YAML configs, the config file of arguments on the server if None.
+                Defaults to None.
+
+        Returns:
+            List[SimulationResult]: Results of all runs.
+        """
+        response = self.request("POST", "/simulate", {"args": args, "config": config})
+        return [SimulationResult.from_dict(result) for result in response["results"]]
+
+    def close(self) -> None:
+        """Close the connection."""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+def _inline_config(args: List[str]) -> Tuple[List[str], Optional[Any]]:
+    """Load the config file of the job, so it is found independently of the server."""
+    for index, arg in enumerate(args):
+        if arg == "--config" and index + 1 < len(args):
+            return args[:index] + args[index + 2 :], load_simulations_config(
+                args[index + 1]
+            )
+        if arg.startswith("--config="):
+            return args[:index] + args[index + 1 :], load_simulations_config(
+                arg.split("=", 1)[1]
+            )
+    return args, None
+
+
+def submit(parsed_args: Namespace) -> None:
+    """Submit jobs to the server and print their results as JSON lines in their order.
+
+    Args:
+        parsed_args (Namespace): Parsed arguments of the `submit` command.
+    """
+    if parsed_args.job:
+        jobs = [parsed_args.job]
+    else:
+        jobs = [
+            shlex.split(line)
+            for line in sys.stdin
+            if line.strip() and not line.lstrip().startswith("#")
+        ]
+
+    local = threading.local()
+
+    def submit_job(job: List[str]) -> Dict[str, Any]:
+        if not hasattr(local, "client"):
+            local.client = SimulationClient(parsed_args.socket, parsed_args.port)
+        try:
+            args, config = _inline_config(job)
+            response = local.client.request(
+                "POST", "/simulate", {"args": args, "config": config}
+            )
+        except (SimulationServerError, OSError) as error:
+            return {"job": job, "error": str(error)}
+        return {"job": job, "results": response["results"]}
+
+    failed = False
+    with ThreadPoolExecutor(parsed_args.concurrency) as executor:
+        for record in executor.map(submit_job, jobs):
+            failed |= "error" in record
+            print(json.dumps(record), flush=True)
+    if failed:
+        sys.exit(1)
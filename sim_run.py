@@ -1,17 +1,27 @@
-from concurrent.futures import ProcessPoolExecutor
-import subprocess
+import os
+import secrets
+import sys
 from datetime import datetime
 import time
 import numpy as np
 import argparse
 import yaml
 
+from base.orchestrator import SweepCommand, SweepJournal, SweepOrchestrator
+from base.result_sinks import JsonlResultSink, create_result_sink
+from base.result_store import ResultStore
+from base.results import SimulationResult
+from base.scheduler import CostModel, Job, order_jobs
+from base.work_queue import open_work_queue
+from worker import run_queued_jobs
+
 # ================= USER SPACE =================
 
 # ----- General settings -----
 
-# Maximum number of running concurrent simulations
-MAX_INSTANCES = 2
+# Maximum number of running concurrent simulations (None uses all CPUs),
+# simulations are also limited by their estimated memory
+MAX_INSTANCES = None
 
 # How many times should be simulations repeated with same configuration
 EXPERIMENT_REPEAT = 10
@@ -23,8 +33,8 @@ MINING_ROUNDS = 500
 
 # Selfish miners power
 num_of_cfgs = (
-    3
-)  # Optional variable, can be removed and specified directly in np.linespace
+    3  # Optional variable, can be removed and specified directly in np.linespace
+)
 SELFISH_MINERS = [
     np.linspace(
         5, 40, num_of_cfgs, dtype=int
@@ -56,8 +66,6 @@ WEAK_TO_STRONG_HEADER_RATIO = 100
 # ==============================================
 
 experiment_counter = 0
-finished_simulations = 0
-total_simulations = 0
 
 program_args = None
 
@@ -68,9 +76,6 @@ def main():
     global program_args
     global config_unique_prefix
 
-    global total_simulations
-    global finished_simulations
-
     parser = argparse.ArgumentParser(
         description="Selfish mining simulator - automated simulation execution"
     )
@@ -81,9 +86,71 @@ def main():
         help="Chain to simulate",
     )
     parser.add_argument("--out", type=str, required=True, help="Output files prefix")
+    parser.add_argument(
+        "--seed",
+        type=int,
+        required=False,
+        help="Root seed of all simulations, every simulation gets its own spawn key",
+    )
+    parser.add_argument(
+        "--memory-limit",
+        type=float,
+        required=False,
+        help="Memory for all running simulations in MB "
+        "(default is 80%% of the available memory)",
+    )
+    parser.add_argument(
+        "--history",
+        type=str,
+        required=False,
+        help="Result store (.store) of past runs: the cost model of simulations is "
+        "calibrated from it and results of this sweep are appended to it",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=2,
+        help="How many times a failed simulation is started again (default is 2)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Resume the interrupted sweep with the same --out, simulations completed "
+        "in its journal (<out>.journal.jsonl) are skipped and its root seed is reused",
+    )
+    parser.add_argument(
+        "--queue",
+        type=str,
+        required=False,
+        help="Distribute simulations to workers (main.py worker) through the work "
+        "queue: tcp://host:port of the broker or a shared directory. Results are "
+        "written to <out>.results.jsonl (and --history), Fruitchain --out files "
+        "must be on a shared filesystem",
+    )
 
     args = parser.parse_args()
+    if args.queue and args.resume:
+        error_exit("--resume isn't supported with --queue")
+    journal_path = f"{args.out}.journal.jsonl"
+    if args.resume:
+        if not os.path.exists(journal_path):
+            error_exit(f"No journal {journal_path} of the interrupted sweep")
+        journal = SweepJournal(journal_path, resume=True)
+        journal_seed = journal.metadata.get("seed")
+        if args.seed is None:
+            args.seed = journal_seed
+        elif journal_seed is not None and args.seed != journal_seed:
+            error_exit(
+                f"--seed differs from the root seed {journal_seed} of the journal"
+            )
+    if args.seed is None:
+        args.seed = secrets.randbits(63)
+    if not args.resume:
+        journal = SweepJournal(
+            journal_path, {"seed": args.seed, "blockchain": args.blockchain}
+        )
     program_args = args
+    print(f"Root seed: {args.seed}")
 
     config_unique_prefix = round(time.time() * 1000)
 
@@ -93,29 +160,52 @@ def main():
         simulations, res_count_simulations = create_fruitchain_simulation_queue()
     elif args.blockchain == "strongchain":
         simulations = create_strongchain_simulation_queue()
-    
-    total_simulations = len(simulations)
-
-     # Log number of launched simulations
-    date_time = datetime.now().strftime('%m-%d-%Y %H:%M:%S')
-    print(f'[{date_time}] Queued: {total_simulations} simulations, running on {MAX_INSTANCES} CPUs')
-
-    # Start simulations on separate CPUs
-    with ProcessPoolExecutor(max_workers=MAX_INSTANCES) as executor:
-        while len(simulations) > 0:
-            sim = simulations.pop(0)
-            future = executor.submit(run_simulation, sim)
-            future.add_done_callback(log_finished_simulation)
-
-    if (args.blockchain == "fruitchain"):
-        total_simulations += len(res_count_simulations)
-        print('Post process part started...')
-        # Start simulations on separate CPUs
-        with ProcessPoolExecutor(max_workers=MAX_INSTANCES) as executor:
-            while len(res_count_simulations) > 0:
-                sim = res_count_simulations.pop(0)
-                future = executor.submit(run_simulation, sim)
-                future.add_done_callback(log_finished_simulation)
+
+    # Log number of launched simulations
+    date_time = datetime.now().strftime("%m-%d-%Y %H:%M:%S")
+    print(
+        f"[{date_time}] Queued: {len(simulations)} simulations, "
+        f"running on {MAX_INSTANCES or os.cpu_count()} CPUs"
+    )
+
+    cost_model = CostModel()
+    if args.history:
+        cost_model.calibrate(ResultStore(args.history).load())
+
+    jobs = []
+    for job_id, sim in enumerate(simulations):
+        # independent random streams of all simulations and replicas
+        sim = sim[:2] + ["--seed", str(args.seed), "--spawn-key", str(job_id)] + sim[2:]
+        if args.history:
+            sim = sim[:2] + ["--results", args.history] + sim[2:]
+        config = load_job_config(sim)
+        command = SweepCommand(sim[sim.index("--out") + 1], sim, MINING_ROUNDS)
+        jobs.append(Job(command, cost_model.runtime(config), cost_model.memory(config)))
+
+    # Start simulations on separate CPUs, the longest ones first. Every simulation
+    # is a separate process, progress and results of all of them are read
+    # in one event loop. Ctrl-C terminates running simulations and keeps finished ones.
+    memory_limit = args.memory_limit * 2 ** 20 if args.memory_limit else None
+    orchestrator = SweepOrchestrator(
+        MAX_INSTANCES, memory_limit, args.retries, journal=journal
+    )
+    try:
+        if args.queue:
+            run_distributed_simulations(jobs)
+        else:
+            orchestrator.run(jobs)
+
+        if (args.blockchain == "fruitchain") and not orchestrator.cancelled:
+            print("Post process part started...")
+            orchestrator.run(
+                [Job(SweepCommand(" ".join(sim), sim)) for sim in res_count_simulations]
+            )
+    finally:
+        journal.close()
+
+    if orchestrator.cancelled:
+        print(f"Sweep was interrupted, continue it with: --out {args.out} --resume")
+        sys.exit(130)
 
 
 def create_miners_settings():
@@ -152,9 +242,9 @@ def create_fruitchain_simulation_queue():
 
     all_selfish_mining_power, honest_mining_power = create_miners_settings()
 
-    print('Simulation powers:')
-    print(f'All selfish: {all_selfish_mining_power}')
-    print(f'Honest: {honest_mining_power}')
+    print("Simulation powers:")
+    print(f"All selfish: {all_selfish_mining_power}")
+    print(f"Honest: {honest_mining_power}")
 
     # Create all required configs
     for i in range(0, len(all_selfish_mining_power)):
@@ -164,7 +254,10 @@ def create_fruitchain_simulation_queue():
                     "consensus_name": "Fruitchain",
                     "miners": {
                         "honest": {"mining_power": int(honest_mining_power[i])},
-                        "selfish": [{"mining_power": int(SELFISH_MINERS[j][i])} for j in range(0, len(SELFISH_MINERS))],
+                        "selfish": [
+                            {"mining_power": int(SELFISH_MINERS[j][i])}
+                            for j in range(0, len(SELFISH_MINERS))
+                        ],
                     },
                     "gamma": GAMMA,
                     "simulation_mining_rounds": MINING_ROUNDS,
@@ -177,7 +270,7 @@ def create_fruitchain_simulation_queue():
         with open(f"/tmp/fruitchain_cfg_{config_unique_prefix}_{i}.yaml", "w") as file:
             yaml.dump(fruit_yaml, file)
 
-    run_base = [f"python3", "main.py"]
+    run_base = [f"python3", "main.py", "--progress", "machine"]
     res_count_base = [f"python3", "res_count.py"]
 
     for experiment_i in range(0, EXPERIMENT_REPEAT):
@@ -202,20 +295,21 @@ def create_fruitchain_simulation_queue():
                     "--tag",
                     f"{program_args.out}_{i}_{experiment_i}",
                     "--block_reward",
-                    f"{int(SUPERBLOCK_MINE_PROB / (FRUIT_MINE_PROB + SUPERBLOCK_MINE_PROB) * 100)}"
+                    f"{int(SUPERBLOCK_MINE_PROB / (FRUIT_MINE_PROB + SUPERBLOCK_MINE_PROB) * 100)}",
                 ]
             )
 
     return simulations, res_count_simulations
 
+
 def create_strongchain_simulation_queue():
     simulations = []
 
     all_selfish_mining_power, honest_mining_power = create_miners_settings()
 
-    print('Simulation powers:')
-    print(f'All selfish: {all_selfish_mining_power}')
-    print(f'Honest: {honest_mining_power}')
+    print("Simulation powers:")
+    print(f"All selfish: {all_selfish_mining_power}")
+    print(f"Honest: {honest_mining_power}")
 
     # Create all required configs
     for i in range(0, len(all_selfish_mining_power)):
@@ -225,10 +319,13 @@ def create_strongchain_simulation_queue():
                     "consensus_name": "Strongchain",
                     "miners": {
                         "honest": {"mining_power": int(honest_mining_power[i])},
-                        "selfish": [{"mining_power": int(SELFISH_MINERS[j][i])} for j in range(0, len(SELFISH_MINERS))],
+                        "selfish": [
+                            {"mining_power": int(SELFISH_MINERS[j][i])}
+                            for j in range(0, len(SELFISH_MINERS))
+                        ],
                     },
                     "simulation_mining_rounds": MINING_ROUNDS,
-                    "weak_to_strong_header_ratio": WEAK_TO_STRONG_HEADER_RATIO
+                    "weak_to_strong_header_ratio": WEAK_TO_STRONG_HEADER_RATIO,
                 }
             }
         ]
@@ -236,7 +333,7 @@ def create_strongchain_simulation_queue():
         with open(f"/tmp/strongchain_cfg_{config_unique_prefix}_{i}.yaml", "w") as file:
             yaml.dump(fruit_yaml, file)
 
-    run_base = [f"python3", "main.py"]
+    run_base = [f"python3", "main.py", "--progress", "machine"]
 
     for experiment_i in range(0, EXPERIMENT_REPEAT):
         for i in range(0, len(all_selfish_mining_power)):
@@ -254,20 +351,61 @@ def create_strongchain_simulation_queue():
     return simulations
 
 
-def run_simulation(simulation):
-    subprocess.run(simulation, stdout=subprocess.DEVNULL)
+def run_distributed_simulations(jobs):
+    # workers get arguments of main.py with inline configs, results are written here
+    queued_jobs = {}
+    for index, job in enumerate(order_jobs(jobs)):
+        args = job.payload.args[2:]
+        for option in ("--config", "--results"):
+            if option in args:
+                position = args.index(option)
+                args = args[:position] + args[position + 2 :]
+        args[args.index("--progress") + 1] = "off"
+        # IDs are ordered like jobs, so the longest jobs are claimed first
+        queued_jobs[f"{index:06d}"] = {
+            "key": job.payload.key,
+            "args": args,
+            "config": load_job_config(job.payload.args),
+        }
+
+    results = []
+    finished = 0
+
+    def log_record(job_id, record):
+        nonlocal finished
+        finished += 1
+        status = "Failed" if "error" in record else "Finished"
+        date_time = datetime.now().strftime("%m-%d-%Y %H:%M:%S")
+        print(
+            f"[{date_time}] {status}: {finished}/{len(queued_jobs)} "
+            f'{queued_jobs[job_id]["key"]} ({record["worker"]})'
+        )
+        if "error" in record:
+            print(f'Error: {record["error"]}')
+        results.extend(
+            SimulationResult.from_dict(result) for result in record.get("results", [])
+        )
+
+    print(f"Waiting for workers of the queue {program_args.queue}...")
+    run_queued_jobs(
+        open_work_queue(program_args.queue),
+        queued_jobs,
+        program_args.retries,
+        on_record=log_record,
+    )
+    JsonlResultSink(f"{program_args.out}.results.jsonl").write(results)
+    if program_args.history:
+        create_result_sink(program_args.history).write(results)
 
 
-def log_finished_simulation(_):
-    global finished_simulations
-    finished_simulations += 1
-    date_time = datetime.now().strftime('%m-%d-%Y %H:%M:%S')
-    print(f'[{date_time}] Finished: {finished_simulations}/{total_simulations}')
+def load_job_config(simulation):
+    with open(simulation[simulation.index("--config") + 1]) as file:
+        return yaml.safe_load(file)
 
 
 def error_exit(msg):
     print(f"Error: {msg}")
-    exit(1)
+    sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -3,15 +3,21 @@
 Author: Jan Jakub Kubik (xkubik32)
 Date: 13.3.2023
 """
-from argparse import ArgumentParser, Namespace
-from typing import Dict
+import os
+from argparse import REMAINDER, ArgumentParser, Namespace
+from typing import Dict, List, Optional
 
-import yaml
+from base.progress import PROGRESS_MODES
 
 
-def parse_args() -> Namespace:
+def parse_args(argv: Optional[List[str]] = None) -> Namespace:
     """Parse all program arguments.
 
+    Args:
+        argv (Optional[List[str]], optional): Arguments, `sys.argv` if None,
+                                              e.g. jobs of the simulation server.
+                                              Defaults to None.
+
     Returns:
         Namespace: Parsed program arguments.
     """
@@ -34,23 +40,308 @@ def parse_args() -> Namespace:
     )
 
     # Create the parser for the second choice
-    subparsers.add_parser("nakamoto", help="Nakamoto blockchain simulation")
+    nakamoto = subparsers.add_parser("nakamoto", help="Nakamoto blockchain simulation")
+    nakamoto.add_argument(
+        "--regenerative",
+        action="store_true",
+        help="Split every simulation into regenerative cycles simulated in parallel "
+        "processes and report shares with confidence intervals",
+    )
+    nakamoto.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of worker processes of --regenerative (default is number of CPUs)",
+    )
 
     # Create the parser for the third choice
-    subparsers.add_parser("strongchain", help="Strongchain blockchain simulation")
+    strongchain = subparsers.add_parser(
+        "strongchain", help="Strongchain blockchain simulation"
+    )
 
     # Create the parser for the 4th choice
     fruitchain = subparsers.add_parser(
         "fruitchain", help="Fruitchain blockchain simulation"
     )
 
-    fruitchain.add_argument(
-        "--config", type=str, required=False, help="Config file"
+    for blockchain_parser in [subchain, nakamoto, strongchain, fruitchain]:
+        blockchain_parser.add_argument(
+            "--config",
+            type=str,
+            required=False,
+            help="Config file (default is config.yaml in the directory of the blockchain)",
+        )
+
+    serve = subparsers.add_parser(
+        "serve",
+        help="Run the simulation server with warm worker processes, which accepts "
+        "simulation jobs over a Unix socket or localhost HTTP",
+    )
+    serve.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of worker processes (default is number of CPUs)",
+    )
+    submit = subparsers.add_parser(
+        "submit",
+        help="Submit simulation jobs to the server and print their results as JSON lines",
+    )
+    submit.add_argument(
+        "--concurrency",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of jobs submitted at once (default is number of CPUs)",
+    )
+    submit.add_argument(
+        "job",
+        nargs=REMAINDER,
+        help="Arguments of the job as for main.py, e.g. 'nakamoto --config c.yaml'. "
+        "Jobs are read from stdin (one per line) if there are none",
+    )
+    worker = subparsers.add_parser(
+        "worker",
+        help="Run jobs of the distributed sweep from the work queue until it is closed",
+    )
+    worker.add_argument(
+        "queue",
+        type=str,
+        help="Work queue: tcp://host:port of the broker or a shared directory",
+    )
+    worker.add_argument(
+        "--processes",
+        type=int,
+        default=1,
+        help="Number of worker processes on this host (default is 1)",
+    )
+    worker.add_argument(
+        "--poll",
+        type=float,
+        default=1.0,
+        help="Seconds between checks of the empty work queue (default is 1)",
+    )
+    broker = subparsers.add_parser(
+        "broker", help="Serve the in-memory work queue of distributed sweeps over TCP"
+    )
+    broker.add_argument(
+        "--host",
+        type=str,
+        default="127.0.0.1",
+        help="Address of the broker, use 0.0.0.0 for workers on other hosts "
+        "(default is 127.0.0.1)",
+    )
+    broker.add_argument(
+        "--port",
+        type=int,
+        default=8766,
+        help="TCP port of the broker (default is 8766)",
     )
 
+    for server_parser in [serve, submit]:
+        endpoint = server_parser.add_mutually_exclusive_group()
+        endpoint.add_argument(
+            "--socket",
+            type=str,
+            required=False,
+            help="Unix socket of the server (default is smasf.sock)",
+        )
+        endpoint.add_argument(
+            "--port",
+            type=int,
+            required=False,
+            help="Localhost TCP port of the server instead of the Unix socket",
+        )
+
     parser.add_argument("--out", type=str, required=False, help="Output file path")
+    parser.add_argument(
+        "--results",
+        type=str,
+        required=False,
+        help="Write structured results to this file (.jsonl, .csv or .parquet) "
+        "or result store directory (.store) instead of printing them",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        required=False,
+        help="Root seed of random streams (default is random, it is stored in results)",
+    )
+    parser.add_argument(
+        "--spawn-key",
+        type=str,
+        default="",
+        help="Dot separated path in the seed tree, e.g. '3' for the 4th replica. "
+        "Simulation N of the config gets the path '<spawn-key>.N'",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes running simulations of the config and their "
+        "replicas in parallel, results are collected in the config order "
+        "(Fruitchain --out files get run indexes)",
+    )
+    parser.add_argument(
+        "--replicas",
+        type=int,
+        default=1,
+        help="Number of replicas of every simulation with independent random streams, "
+        "shares are then estimated with the control variate of won rounds",
+    )
+    parser.add_argument(
+        "--antithetic",
+        action="store_true",
+        help="Run replicas as antithetic pairs with mirrored leader and block type "
+        "streams (requires even --replicas)",
+    )
+    parser.add_argument(
+        "--crn",
+        action="store_true",
+        help="Common random numbers: all simulations of the config use the same "
+        "random streams and paired differences of shares are reported",
+    )
+    parser.add_argument(
+        "--ci",
+        action="store_true",
+        help="Report confidence intervals of shares from regenerative cycles "
+        "(Nakamoto) or batch means of the public blockchain (other protocols)",
+    )
+    parser.add_argument(
+        "--precision",
+        type=float,
+        required=False,
+        help="Stop a simulation early, once the confidence interval half-width of every "
+        "selfish miner's share is below this many percentage points (implies --ci)",
+    )
+    parser.add_argument(
+        "--confidence",
+        type=float,
+        default=0.95,
+        help="Confidence level of intervals (default is 0.95)",
+    )
+    parser.add_argument(
+        "--series",
+        type=int,
+        required=False,
+        metavar="K",
+        help="Record windowed shares, fork state and won rounds every K rounds "
+        "and store them in results",
+    )
+    parser.add_argument(
+        "--series-out",
+        type=str,
+        required=False,
+        help="Save the recorded time series to this .npy file "
+        "(with the run index before the suffix if there are more runs)",
+    )
+    parser.add_argument(
+        "--fork-stats",
+        action="store_true",
+        help="Record reorganization depths, orphaned blocks per miner, matches "
+        "and fork durations and store them in results",
+    )
+    parser.add_argument(
+        "--chain-out",
+        type=str,
+        required=False,
+        metavar="PATH",
+        help="Export the final blockchain of every run (with weak headers or fruits) "
+        "to the run-length encoded binary file",
+    )
+    tape_group = parser.add_mutually_exclusive_group()
+    tape_group.add_argument(
+        "--record-tape",
+        type=str,
+        required=False,
+        metavar="PATH",
+        help="Record leader choices, block type draws and tie-breaks of every run "
+        "to the binary event tape (runs get suffixes if there are more of them)",
+    )
+    tape_group.add_argument(
+        "--replay-tape",
+        type=str,
+        required=False,
+        metavar="PATH",
+        help="Replay random events of every run from the event tape",
+    )
+    parser.add_argument(
+        "--trace",
+        type=int,
+        required=False,
+        metavar="N",
+        help="Keep states of the last N rounds in a ring buffer, which is dumped "
+        "to --trace-out if the simulation fails or on SIGUSR1",
+    )
+    parser.add_argument(
+        "--trace-out",
+        type=str,
+        default="smasf_trace.bin",
+        help="Binary file for the dumped state trace (default is smasf_trace.bin)",
+    )
+    parser.add_argument(
+        "--log-level",
+        choices=["debug", "info", "warning", "error"],
+        type=str.lower,
+        required=False,
+        help="Minimal level of logged messages (default is warning or SMASF_LOG_LEVEL). "
+        "Per-round messages are logged only if SMASF_ROUND_LOGGING=1 is set",
+    )
+    parser.add_argument(
+        "--progress",
+        choices=PROGRESS_MODES,
+        default="auto",
+        help="Progress reporting: 'terminal' line with rounds/s and ETA, 'machine' "
+        "lines for sweep runners, 'off', or 'auto' (terminal if stderr is a TTY)",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Time simulation phases and print the breakdown to stderr",
+    )
+    parser.add_argument(
+        "--profile-out",
+        type=str,
+        required=False,
+        help="Save the breakdown of simulation phases to this JSON file "
+        "instead of printing it (implies --profile)",
+    )
+    parser.add_argument(
+        "--plot",
+        action="store_true",
+        help="Show block counts plots after all simulations are finished",
+    )
 
-    return parser.parse_args()
+    args = parser.parse_args(argv)
+    if args.replicas < 1:
+        parser.error("--replicas must be at least 1")
+    if args.antithetic and args.replicas % 2:
+        parser.error("--antithetic requires even number of --replicas")
+    if args.precision is not None and args.precision <= 0:
+        parser.error("--precision must be positive")
+    if args.series is not None and args.series < 1:
+        parser.error("--series must be at least 1")
+    if args.series_out and args.series is None:
+        parser.error("--series-out requires --series")
+    if getattr(args, "regenerative", False) and (args.record_tape or args.replay_tape):
+        parser.error("--regenerative can't be combined with event tapes")
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if getattr(args, "regenerative", False) and args.jobs > 1:
+        parser.error("--regenerative already runs cycles in --workers processes")
+    if getattr(args, "regenerative", False) and args.chain_out:
+        parser.error("--regenerative doesn't keep the final blockchain for --chain-out")
+    if args.trace is not None and args.trace < 1:
+        parser.error("--trace must be at least 1")
+    if not 0 < args.confidence < 1:
+        parser.error("--confidence must be between 0 and 1")
+    if getattr(args, "workers", 1) < 1:
+        parser.error("--workers must be at least 1")
+    if getattr(args, "processes", 1) < 1:
+        parser.error("--processes must be at least 1")
+    if getattr(args, "concurrency", 1) < 1:
+        parser.error("--concurrency must be at least 1")
+
+    return args
 
 
 def load_simulations_config(config_path: str) -> Dict:
@@ -62,6 +353,9 @@ def load_simulations_config(config_path: str) -> Dict:
     Returns:
         Dict: Loaded config.
     """
+    # pylint: disable=import-outside-toplevel
+    import yaml
+
     with open(config_path, "r") as file:
         config = yaml.load(file, Loader=yaml.FullLoader)
 
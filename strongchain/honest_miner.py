@@ -4,6 +4,9 @@ consensus protocol.
 Author: Jan Jakub Kubik (xkubik32)
 Date: 02.04.2023
 """
+import random
+from typing import Optional
+
 from nakamoto.honest_miner import HonestMinerStrategy as NakamotoHonestMinerStrategy
 from strongchain.blockchain import WeakHeader
 
@@ -11,8 +14,8 @@ from strongchain.blockchain import WeakHeader
 class HonestMinerStrategy(NakamotoHonestMinerStrategy):
     """Honest miner class implementation for Strongchain consensus."""
 
-    def __init__(self, mining_power: int):
-        super().__init__(mining_power)
+    def __init__(self, mining_power: int, rng: Optional[random.Random] = None):
+        super().__init__(mining_power, rng)
         self.weak_headers = list()
 
     def add_weak_header(self, data: str, miner: str, miner_id: int) -> None:
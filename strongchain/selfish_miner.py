@@ -4,6 +4,7 @@ consensus protocol.
 Author: Jan Jakub Kubik (xkubik32)
 Date: 02.04.2023
 """
+import random
 from typing import Optional, Set
 
 from base.miner_base import SelfishMinerAction as SA
@@ -14,8 +15,10 @@ from strongchain.blockchain import Blockchain, WeakHeader
 class SelfishMinerStrategy(NakamotoSelfishMinerStrategy):
     """Selfish miner class implementation for Strongchain consensus."""
 
-    def __init__(self, mining_power: int, ratio: int):
-        super().__init__(mining_power)
+    def __init__(
+        self, mining_power: int, ratio: int, rng: Optional[random.Random] = None
+    ):
+        super().__init__(mining_power, rng)
         self.blockchain = Blockchain(
             owner=self.miner_id, weak_to_strong_header_ratio=ratio
         )
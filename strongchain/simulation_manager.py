@@ -4,17 +4,14 @@ selfish mining simulation for the Strongchain consensus.
 Author: Jan Jakub Kubik (xkubik32)
 Date: 14.3.2023
 """
-import random
+from typing import Dict, List, Optional, Tuple
 
+from base.logs import ROUND_LOGGING
 from base.miner_base import MinerType
 from base.miner_base import SelfishMinerAction as SA
+from base.results import SimulationResult
+from base.rng import SeedSequence
 from nakamoto.simulation_manager import SimulationManager as NakamotoSimulationManager
-from public_blockchain_functions import (
-    calculate_percentage,
-    plot_block_counts,
-    print_attackers_success,
-    print_honest_miner_info,
-)
 from strongchain.blockchain import Blockchain
 from strongchain.honest_miner import HonestMinerStrategy
 from strongchain.selfish_miner import SelfishMinerStrategy
@@ -26,16 +23,40 @@ class SimulationManager(NakamotoSimulationManager):
     """Mediator class for running the entire selfish mining simulation
     for the Strongchain consensus."""
 
-    def __init__(self, simulation_config: dict, blockchain: str):
+    PROFILED_METHODS = NakamotoSimulationManager.PROFILED_METHODS + (
+        "one_weak_round",
+        "clear_sm_weak_headers_if_no_fork",
+    )
+    PROFILED_MINER_METHODS = NakamotoSimulationManager.PROFILED_MINER_METHODS + (
+        "add_weak_header",
+        "decide_next_action_weak",
+    )
+    # weak headers are kept between strong blocks, so there are
+    # no clean regeneration points
+    REGENERATIVE = False
+    # decisions depend on weak headers and chain strengths
+    INCREMENTAL_DECISIONS = False
+    BLOCK_CHILDREN = True
+
+    def __init__(
+        self,
+        simulation_config: dict,
+        blockchain: str,
+        seed_sequence: Optional[SeedSequence] = None,
+    ):
         super().__init__(
-            simulation_config, blockchain
+            simulation_config, blockchain, seed_sequence
         )  # create everything necessary from Nakamoto
 
         # Instantiate everything necessary for Strongchain
-        self.honest_miner = HonestMinerStrategy(mining_power=self.config.honest_miner)
+        self.honest_miner = HonestMinerStrategy(
+            mining_power=self.config.honest_miner, rng=self.rng
+        )
         self.selfish_miners = [
             SelfishMinerStrategy(
-                mining_power=sm_power, ratio=self.config.weak_to_strong_header_ratio
+                mining_power=sm_power,
+                ratio=self.config.weak_to_strong_header_ratio,
+                rng=self.rng,
             )
             for sm_power in self.config.selfish_miners
         ]
@@ -91,14 +112,15 @@ class SimulationManager(NakamotoSimulationManager):
             chain_strength = miner.blockchain.chains_pow()
             miner_and_pow.append((miner, chain_strength))
 
-        print(miner_and_pow)
+        if ROUND_LOGGING:
+            self.log.debug("Miners and their chain powers: %s", miner_and_pow)
 
         # Find the maximum value
         max_value = max(obj[1] for obj in miner_and_pow)
         # Filter the attackers with the highest value
         matching_miners = [obj for obj in miner_and_pow if obj[1] == max_value]
         # Select a random object among the ones with the highest value
-        winner = random.choice(matching_miners)
+        winner = self.rng.choice(matching_miners)
 
         return winner[0]
 
@@ -106,7 +128,8 @@ class SimulationManager(NakamotoSimulationManager):
         return self.select_miner_with_strongest_chain(attackers)
 
     def resolve_overrides_clear(self, match_obj):
-        print("Resolve matches clear strongchain")
+        if ROUND_LOGGING:
+            self.log.debug("Resolve matches clear strongchain")
         match_obj.clear_private_strong_chain()
         # need to clear weak blockchain of honest miner
         self.honest_miner.clear_private_weak_chain()
@@ -115,12 +138,17 @@ class SimulationManager(NakamotoSimulationManager):
     def selfish_override(self, leader: SelfishMinerStrategy) -> None:
         # override public blockchain by attacker's private blockchain
 
-        print("Selfish override after mine new block by him in strongchain")
+        if ROUND_LOGGING:
+            self.log.debug(
+                "Selfish override after mine new block by him in strongchain"
+            )
         self.ongoing_fork = False
-        self.log.info(
-            f"Override by attacker {leader.blockchain.fork_block_id},"
-            f" {leader.miner_id} in fork"
-        )
+        if ROUND_LOGGING:
+            self.log.debug(
+                "Override by attacker %s, %s in fork",
+                leader.blockchain.fork_block_id,
+                leader.miner_id,
+            )
         self.public_blockchain.override_chain(leader)
         self.public_blockchain.last_block_id = self.public_blockchain.size()
         # cleaning of competing SM is performed via ADOPT
@@ -155,6 +183,44 @@ class SimulationManager(NakamotoSimulationManager):
             if not selfish_miner.blockchain.fork_block_id:
                 selfish_miner.clear_private_weak_headers()
 
+    def one_weak_round(self, leader, round_id: int) -> None:
+        """One round of simulation, where is one new weak header mined.
+
+        Args:
+            leader (MinerStrategyBase): Leader of the current round.
+            round_id (int): The current round ID.
+        """
+        miner_str = "Honest" if leader.miner_type == MinerType.HONEST else "Selfish"
+        leader.add_weak_header(
+            data=f"Weak header {round_id} data",
+            miner=f"{miner_str} miner {leader.miner_id}",
+            miner_id=leader.miner_id,
+        )
+        self.weak[leader.miner_id] += 1
+        # print(leader.weak_headers)
+        # print(json.dumps([x.to_dict() for x in leader.weak_headers]))
+
+        if leader.miner_type == MinerType.HONEST:
+            while True:
+                # override loop
+                self.action_store.clear()
+
+                for selfish_miner in self.selfish_miners:
+                    action = selfish_miner.decide_next_action_weak(
+                        self.public_blockchain,
+                        leader,
+                        self.config.weak_to_strong_header_ratio,
+                    )
+                    self.action_store.add_object(action, selfish_miner)
+                all_actions = self.action_store.get_actions()
+
+                # replacement for `do-while` which is not in python
+                condition = SA.OVERRIDE in all_actions
+                if not condition:
+                    break
+
+                self.resolve_overrides()
+
     def run_simulation(self):
         """Main business logic for running selfish mining simulation."""
 
@@ -169,49 +235,24 @@ class SimulationManager(NakamotoSimulationManager):
             leader = self.choose_leader(self.miners, self.miners_info)
             self.winns[leader.miner_id] += 1
 
-            random_number = random.random()
+            random_number = self.block_type_rng.random()
             if random_number <= weak_header_probability:
-                print(
-                    f"Weak header generated in round {blocks_mined} by {leader.miner_type}"
-                )
-                miner_str = (
-                    "Honest" if leader.miner_type == MinerType.HONEST else "Selfish"
-                )
-                leader.add_weak_header(
-                    data=f"Weak header {blocks_mined} data",
-                    miner=f"{miner_str} miner {leader.miner_id}",
-                    miner_id=leader.miner_id,
-                )
-                self.weak[leader.miner_id] += 1
+                if ROUND_LOGGING:
+                    self.log.debug(
+                        "Weak header generated in round %s by %s",
+                        blocks_mined,
+                        leader.miner_type,
+                    )
+                self.one_weak_round(leader, blocks_mined)
                 weak_headers += 1
-                # print(leader.weak_headers)
-                # print(json.dumps([x.to_dict() for x in leader.weak_headers]))
-
-                if leader.miner_type == MinerType.HONEST:
-                    while True:
-                        # override loop
-                        self.action_store.clear()
-
-                        for selfish_miner in self.selfish_miners:
-                            action = selfish_miner.decide_next_action_weak(
-                                self.public_blockchain,
-                                leader,
-                                self.config.weak_to_strong_header_ratio,
-                            )
-                            self.action_store.add_object(action, selfish_miner)
-                        all_actions = self.action_store.get_actions()
-
-                        # replacement for `do-while` which is not in python
-                        condition = SA.OVERRIDE in all_actions
-                        if not condition:
-                            break
-
-                        self.resolve_overrides()
 
             else:
-                print(
-                    f"Strong header generated in round {blocks_mined} by {leader.miner_type}"
-                )
+                if ROUND_LOGGING:
+                    self.log.debug(
+                        "Strong header generated in round %s by %s",
+                        blocks_mined,
+                        leader.miner_type,
+                    )
 
                 # # this fulfills the condition, that weak header points to the
                 # previously mined strong block in main chain
@@ -222,6 +263,11 @@ class SimulationManager(NakamotoSimulationManager):
                 self.strong[leader.miner_id] += 1
                 strong_headers += 1
 
+            self.progress.update(blocks_mined)
+            if self.observed and self.observe_round(blocks_mined + 1, leader):
+                break
+
+        self.progress.finish(self.simulated_rounds)
         print(f"number of weak blocks: {weak_headers}")
         print(
             f"Their probability: {(weak_headers / (weak_headers + strong_headers)) * 100}%"
@@ -243,61 +289,63 @@ class SimulationManager(NakamotoSimulationManager):
             winner = self.select_miner_with_strongest_chain(match_attackers)
             self.public_blockchain.override_chain(winner)
 
-    def run(self):
-        """This method is entry point for running all checks for specific provider monitor."""
-        self.log.info("Mediator in Strongchain")
-        print(type(self.config))
-        print(self.config)
+    def block_children(self, block) -> List[int]:
+        """Get miner IDs of weak headers of the block for the export.
 
-        self.run_simulation()
+        Args:
+            block (Block): Block of the result chain.
+
+        Returns:
+            List[int]: Miner IDs of weak headers.
+        """
+        return [weak_header.miner_id for weak_header in block.weak_headers]
+
+    def count_blocks(
+        self, chain: List
+    ) -> Tuple[Dict[str, float], Dict[int, int], Dict[int, int]]:
+        """Count strong blocks and weighted weak headers of all miners in the given chain.
+
+        Args:
+            chain (List): List of blocks, usually the final public blockchain.
 
+        Returns:
+            Tuple[Dict[str, float], Dict[int, int], Dict[int, int]]: Block counts keyed by
+                miner names and counts of weak headers and strong blocks keyed by miner IDs.
+        """
         block_counts = {f"Honest miner {self.honest_miner.miner_id}": 0}
         for miner in self.selfish_miners:
             block_counts.update({f"Selfish miner {miner.miner_id}": 0})
+        weak_counts = {miner.miner_id: 0 for miner in self.miners}
+        strong_counts = {miner.miner_id: 0 for miner in self.miners}
 
-        block_counts_same = {f"Honest miner {self.honest_miner.miner_id} weak": 0}
-        block_counts_same.update(
-            {f"Honest miner {self.honest_miner.miner_id} strong": 0}
-        )
-        for miner in self.selfish_miners:
-            block_counts_same.update({f"Selfish miner {miner.miner_id} weak": 0})
-            block_counts_same.update({f"Selfish miner {miner.miner_id} strong": 0})
-
-        # self.log.info(block_counts)
-        for block in self.public_blockchain.chain:
-            # self.log.info(block)
+        for block in chain:
             block_counts[block.miner] += 1
-            block_counts_same[block.miner + " strong"] += 1
+            strong_counts[block.miner_id] += 1
 
             for _ in block.weak_headers:
                 block_counts[block.miner] += 1 / self.config.weak_to_strong_header_ratio
-                block_counts_same[block.miner + " weak"] += 1
+                weak_counts[block.miner_id] += 1
 
-        all_blocks_count = sum(block_counts.values())
-        print(all_blocks_count)
+        return block_counts, weak_counts, strong_counts
 
-        attacker_ids = [
-            miner.miner_id for miner in self.selfish_miners
-        ]  # List of attacker IDs
-        honest_miner_id = self.honest_miner.miner_id  # Honest miner ID
+    def run(self) -> SimulationResult:
+        """This method is entry point for running all checks for specific provider monitor."""
+        self.log.info("Mediator in Strongchain")
+        print(type(self.config))
+        print(self.config)
 
-        all_blocks_count = sum(block_counts.values())
-        percentages = calculate_percentage(block_counts, all_blocks_count)
-        print_attackers_success(
-            block_counts, percentages, self.winns, attacker_ids, block_counts_same, True
-        )
-        print_honest_miner_info(
-            block_counts,
-            percentages,
-            self.winns,
-            honest_miner_id,
-            block_counts_same,
-            True,
+        self.run_simulation()
+
+        block_counts, weak_counts, strong_counts = self.count_blocks(
+            self.public_blockchain.chain
         )
 
+        all_blocks_count = sum(block_counts.values())
+        print(all_blocks_count)
+
         # import json
         # print(json.dumps(self.public_blockchain.to_dict()))
         # self.log.info(block_counts)
         # self.log.info(self.selfish_miners[0].blockchain.to_dict())
 
-        plot_block_counts(block_counts, self.miners_info)
+        return self.build_result(block_counts, weak_counts, strong_counts)
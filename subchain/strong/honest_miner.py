@@ -4,6 +4,9 @@ honest miner for Subchain consensus protocol.
 Author: Jan Jakub Kubik (xkubik32)
 Date: 23.3.2023
 """
+import random
+from typing import Optional
+
 from nakamoto.honest_miner import HonestMinerStrategy as NakamotoHonestMinerStrategy
 from subchain.strong.blockchain import Blockchain
 
@@ -11,8 +14,8 @@ from subchain.strong.blockchain import Blockchain
 class HonestMinerStrategy(NakamotoHonestMinerStrategy):
     """Honest miner class implementation for Subchain consensus."""
 
-    def __init__(self, mining_power: int):
-        super().__init__(mining_power)
+    def __init__(self, mining_power: int, rng: Optional[random.Random] = None):
+        super().__init__(mining_power, rng)
         self.blockchain_weak = Blockchain(owner="public blockchain weak")
 
     def clear_private_weak_chain(self) -> None:
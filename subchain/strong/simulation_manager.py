@@ -4,17 +4,13 @@ whole simulation of selfish mining for Subchain consensus.
 Author: Jan Jakub Kubik (xkubik32)
 Date: 23.3.2023
 """
+from typing import Optional
 
-import random
-
+from base.logs import ROUND_LOGGING
 from base.miner_base import MinerType
+from base.results import SimulationResult
+from base.rng import SeedSequence
 from nakamoto.simulation_manager import SimulationManager as NakamotoSimulationManager
-from public_blockchain_functions import (
-    calculate_percentage,
-    plot_block_counts,
-    print_attackers_success,
-    print_honest_miner_info,
-)
 from subchain.sim_config import SimulationConfig
 from subchain.strong.blockchain import Blockchain
 from subchain.strong.honest_miner import HonestMinerStrategy
@@ -24,14 +20,27 @@ from subchain.strong.selfish_miner import SelfishMinerStrategy
 class SimulationManager(NakamotoSimulationManager):
     """Mediator class for Subchain consensus for running whole simulation."""
 
-    def __init__(self, simulation_config: dict, blockchain: str):
+    # private weak chains are kept between strong blocks, so there are
+    # no clean regeneration points
+    REGENERATIVE = False
+    # strong chains are also changed by merges of weak chains
+    INCREMENTAL_DECISIONS = False
+
+    def __init__(
+        self,
+        simulation_config: dict,
+        blockchain: str,
+        seed_sequence: Optional[SeedSequence] = None,
+    ):
         super().__init__(
-            simulation_config, blockchain
+            simulation_config, blockchain, seed_sequence
         )  # create everything necessary from Nakamoto
 
-        self.honest_miner = HonestMinerStrategy(mining_power=self.config.honest_miner)
+        self.honest_miner = HonestMinerStrategy(
+            mining_power=self.config.honest_miner, rng=self.rng
+        )
         self.selfish_miners = [
-            SelfishMinerStrategy(mining_power=sm_power)
+            SelfishMinerStrategy(mining_power=sm_power, rng=self.rng)
             for sm_power in self.config.selfish_miners
         ]
         self.miners = [self.honest_miner] + self.selfish_miners
@@ -81,10 +90,12 @@ class SimulationManager(NakamotoSimulationManager):
     def selfish_override(self, leader: SelfishMinerStrategy) -> None:
         # override public blockchain by attacker's private blockchain
         self.ongoing_fork = False
-        self.log.info(
-            f"Override by attacker {leader.blockchain.fork_block_id},"
-            f" {leader.miner_id} in fork"
-        )
+        if ROUND_LOGGING:
+            self.log.debug(
+                "Override by attacker %s, %s in fork",
+                leader.blockchain.fork_block_id,
+                leader.miner_id,
+            )
         self.public_blockchain.override_chain(leader)
         # cleaning of competing SM is performed via ADOPT
         leader.clear_private_strong_chain()
@@ -107,11 +118,14 @@ class SimulationManager(NakamotoSimulationManager):
             leader = self.choose_leader(self.miners, self.miners_info)
             self.winns[leader.miner_id] += 1
 
-            random_number = random.random()
+            random_number = self.block_type_rng.random()
             if random_number <= weak_block_probability:
-                print(
-                    f"Weak block generated in round {blocks_mined} by {leader.miner_type}"
-                )
+                if ROUND_LOGGING:
+                    self.log.debug(
+                        "Weak block generated in round %s by %s",
+                        blocks_mined,
+                        leader.miner_type,
+                    )
                 miner_str = (
                     "Honest" if leader.miner_type == MinerType.HONEST else "Selfish"
                 )
@@ -124,12 +138,20 @@ class SimulationManager(NakamotoSimulationManager):
                 weak_blocks += 1
 
             else:
-                print(
-                    f"Strong block generated in round {blocks_mined} by {leader.miner_type}"
-                )
+                if ROUND_LOGGING:
+                    self.log.debug(
+                        "Strong block generated in round %s by %s",
+                        blocks_mined,
+                        leader.miner_type,
+                    )
                 self.one_round(leader, blocks_mined, is_weak_block=False)
                 strong_blocks += 1
 
+            self.progress.update(blocks_mined)
+            if self.observed and self.observe_round(blocks_mined + 1, leader):
+                break
+
+        self.progress.finish(self.simulated_rounds)
         print(f"number of weak blocks: {weak_blocks}")
         print(
             f"Their probability: {(weak_blocks / (weak_blocks + strong_blocks)) * 100}%"
@@ -139,29 +161,16 @@ class SimulationManager(NakamotoSimulationManager):
             f"Their probability: {(strong_blocks / (weak_blocks + strong_blocks) * 100)}%"
         )
 
-    def run(self) -> None:
+    def run(self) -> SimulationResult:
         self.log.info("Mediator in Subchain STRONG blocks")
 
         self.run_simulation()
 
-        block_counts = {f"Honest miner {self.honest_miner.miner_id}": 0}
-        for miner in self.selfish_miners:
-            block_counts.update({f"Selfish miner {miner.miner_id}": 0})
-
-        for block in self.public_blockchain.chain:
-            block_counts[block.miner] += 1
-
-        attacker_ids = [
-            miner.miner_id for miner in self.selfish_miners
-        ]  # List of attacker IDs
-        honest_miner_id = self.honest_miner.miner_id  # Honest miner ID
-
-        total_blocks = sum(block_counts.values())
-        percentages = calculate_percentage(block_counts, total_blocks)
-        print_attackers_success(block_counts, percentages, self.winns, attacker_ids)
-        print_honest_miner_info(block_counts, percentages, self.winns, honest_miner_id)
+        block_counts, weak_counts, strong_counts = self.count_blocks(
+            self.public_blockchain.chain
+        )
 
         # self.log.info(block_counts)
         # self.log.info(self.selfish_miners[0].blockchain.chain)
 
-        plot_block_counts(block_counts, self.miners_info)
+        return self.build_result(block_counts, weak_counts, strong_counts)
@@ -4,8 +4,6 @@ honest miner for the Subchain consensus protocol.
 Author: Jan Jakub Kubik (xkubik32)
 Date: 23.3.2023
 """
-import random
-
 from nakamoto.honest_miner import HonestMinerStrategy as NakamotoHonestMinerStrategy
 
 
@@ -27,7 +25,7 @@ class HonestMinerStrategy(NakamotoHonestMinerStrategy):
             Subchain: The selected winning subchain.
         """
         if ongoing_fork:
-            winning_subchain = random.choice(competitors + [public_subchain])
+            winning_subchain = self.rng.choice(competitors + [public_subchain])
         else:
             winning_subchain = public_subchain
 
@@ -4,8 +4,6 @@ selfish miner for the Subchain consensus protocol.
 Author: Jan Jakub Kubik (xkubik32)
 Date: 23.3.2023
 """
-import random
-
 from nakamoto.selfish_miner import SelfishMinerStrategy as NakamotoSelfishMinerStrategy
 
 
@@ -54,7 +52,7 @@ class SelfishMinerStrategy(NakamotoSelfishMinerStrategy):
             if self.blockchain in competitors:
                 winning_subchain = self.blockchain
             else:
-                winning_subchain = random.choice(competitors + [public_subchain])
+                winning_subchain = self.rng.choice(competitors + [public_subchain])
         else:
             winning_subchain = public_subchain
 
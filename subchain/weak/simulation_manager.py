@@ -4,19 +4,15 @@ whole simulation of selfish mining for the Subchain consensus.
 Author: Jan Jakub Kubik (xkubik32)
 Date: 23.3.2023
 """
-
-import random
+from typing import List, Optional
 
 from base.blockchain import Blockchain
+from base.logs import ROUND_LOGGING
 from base.miner_base import MinerType
 from base.miner_base import SelfishMinerAction as SA
+from base.results import SimulationResult
+from base.rng import SeedSequence
 from nakamoto.simulation_manager import SimulationManager as NakamotoSimulationManager
-from public_blockchain_functions import (
-    calculate_percentage,
-    plot_block_counts,
-    print_attackers_success,
-    print_honest_miner_info,
-)
 from subchain.sim_config import SimulationConfig
 from subchain.weak.honest_miner import HonestMinerStrategy
 from subchain.weak.selfish_miner import SelfishMinerStrategy
@@ -25,14 +21,30 @@ from subchain.weak.selfish_miner import SelfishMinerStrategy
 class SimulationManager(NakamotoSimulationManager):
     """Mediator class for Subchain consensus for running the whole simulation."""
 
-    def __init__(self, simulation_config: dict, blockchain: str) -> None:
+    PROFILED_MINER_METHODS = NakamotoSimulationManager.PROFILED_MINER_METHODS + (
+        "select_subchain",
+    )
+    # weak blocks are kept until the next honest strong block, so there are
+    # no clean regeneration points
+    REGENERATIVE = False
+    # overridden updates of private chains don't report their changes
+    INCREMENTAL_DECISIONS = False
+
+    def __init__(
+        self,
+        simulation_config: dict,
+        blockchain: str,
+        seed_sequence: Optional[SeedSequence] = None,
+    ) -> None:
         super().__init__(
-            simulation_config, blockchain
+            simulation_config, blockchain, seed_sequence
         )  # create everything necessary from Nakamoto
 
-        self.honest_miner = HonestMinerStrategy(mining_power=self.config.honest_miner)
+        self.honest_miner = HonestMinerStrategy(
+            mining_power=self.config.honest_miner, rng=self.rng
+        )
         self.selfish_miners = [
-            SelfishMinerStrategy(mining_power=sm_power)
+            SelfishMinerStrategy(mining_power=sm_power, rng=self.rng)
             for sm_power in self.config.selfish_miners
         ]
         self.miners = [self.honest_miner] + self.selfish_miners
@@ -78,20 +90,23 @@ class SimulationManager(NakamotoSimulationManager):
         strong_blocks = 0
 
         for blocks_mined in range(self.config.simulation_mining_rounds):
+            self.progress.update(blocks_mined)
             leader = self.choose_leader(self.miners, self.miners_info)
             self.winns[leader.miner_id] += 1
 
             # Check if it's time to generate a weak block
-            random_number = random.random()
+            random_number = self.block_type_rng.random()
             if random_number <= weak_block_probability:
-                print(f"Weak block generated in round {blocks_mined}")
+                if ROUND_LOGGING:
+                    self.log.debug("Weak block generated in round %s", blocks_mined)
                 weak_blocks += 1
 
                 self.one_round(leader, blocks_mined, is_weak_block=True)
 
                 # Check if it's time to generate a strong block
             else:
-                print(f"Strong block generated in round {blocks_mined}")
+                if ROUND_LOGGING:
+                    self.log.debug("Strong block generated in round %s", blocks_mined)
                 strong_blocks += 1
 
                 if leader.miner_type == MinerType.SELFISH:
@@ -127,28 +142,28 @@ class SimulationManager(NakamotoSimulationManager):
                     selfish_miner.blockchain.last_block_id = 0
                     selfish_miner.blockchain.fork_block_id = None
 
-    def run(self) -> None:
-        self.log.info("Mediator in Subchain WEAK blocks")
+            if self.observed and self.observe_round(blocks_mined + 1, leader):
+                break
 
-        self.run_simulation()
+        self.progress.finish(self.simulated_rounds)
+
+    def result_chain(self) -> List:
+        """Get the chain, in which blocks are counted for results.
 
-        block_counts = {f"Honest miner {self.honest_miner.miner_id}": 0}
-        for miner in self.selfish_miners:
-            block_counts.update({f"Selfish miner {miner.miner_id}": 0})
+        Returns:
+            List: List of blocks of the public strong blockchain.
+        """
+        return self.public_blockchain_strong.chain
 
-        for block in self.public_blockchain_strong.chain:
-            block_counts[block.miner] += 1
+    def run(self) -> SimulationResult:
+        self.log.info("Mediator in Subchain WEAK blocks")
 
-        self.log.info(block_counts)
+        self.run_simulation()
 
-        attacker_ids = [
-            miner.miner_id for miner in self.selfish_miners
-        ]  # List of attacker IDs
-        honest_miner_id = self.honest_miner.miner_id  # Honest miner ID
+        block_counts, weak_counts, strong_counts = self.count_blocks(
+            self.public_blockchain_strong.chain
+        )
 
-        total_blocks = sum(block_counts.values())
-        percentages = calculate_percentage(block_counts, total_blocks)
-        print_attackers_success(block_counts, percentages, self.winns, attacker_ids)
-        print_honest_miner_info(block_counts, percentages, self.winns, honest_miner_id)
+        self.log.info(block_counts)
 
-        plot_block_counts(block_counts, self.miners_info)
+        return self.build_result(block_counts, weak_counts, strong_counts)
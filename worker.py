@@ -0,0 +1,160 @@
+"""Module with workers and the broker of sweeps distributed by work queues.
+
+Jobs have the same format as jobs of the simulation server, `{"args": [...],
+"config": [...]}`, and workers run them in-process by `server.run_job`.
+Record of a finished job has `results` and `output` of the job (or `error`
+if it failed) and `worker` with the ID of the worker (see `base.work_queue`).
+"""
+import multiprocessing
+import os
+import re
+import socket
+import sys
+import threading
+import time
+from argparse import Namespace
+from typing import Any, Callable, Dict, Optional
+
+from base.work_queue import (
+    DEFAULT_LEASE,
+    WorkQueueBase,
+    WorkQueueBroker,
+    open_work_queue,
+)
+from server import run_job
+
+
+def run_worker(queue_url: str, worker_id: str, poll: float = 1.0) -> None:
+    """Run claimed jobs of the queue until it is closed.
+
+    Args:
+        queue_url (str): URL of the work queue (see `open_work_queue`).
+        worker_id (str): Unique ID of the worker.
+        poll (float, optional): Seconds between checks of the empty queue.
+                                Defaults to 1.0.
+    """
+    queue = open_work_queue(queue_url)
+    while True:
+        claimed = queue.claim(worker_id)
+        if claimed is None:
+            if queue.is_closed():
+                return
+            time.sleep(poll)
+            continue
+
+        job_id, job = claimed
+        finished = threading.Event()
+
+        def send_heartbeats(job_id: str = job_id) -> None:
+            while not finished.wait(DEFAULT_LEASE / 4):
+                queue.heartbeat(job_id, worker_id)
+
+        heartbeats = threading.Thread(target=send_heartbeats, daemon=True)
+        heartbeats.start()
+        try:
+            record = run_job(job["args"], job.get("config"))
+        except Exception as error:  # pylint: disable=broad-except
+            record = {"error": f"{type(error).__name__}: {error}"}
+        finally:
+            finished.set()
+            heartbeats.join()
+        record["worker"] = worker_id
+        queue.complete(job_id, worker_id, record)
+
+
+def run_workers(parsed_args: Namespace) -> None:
+    """Run worker processes of the `worker` command until the queue is closed.
+
+    Args:
+        parsed_args (Namespace): Parsed arguments of the `worker` command.
+    """
+    host = re.sub(r"[^\w.-]", "_", socket.gethostname())
+    worker_ids = [
+        f"{host}-{os.getpid()}-{index}" for index in range(parsed_args.processes)
+    ]
+    if parsed_args.processes == 1:
+        run_worker(parsed_args.queue, worker_ids[0], parsed_args.poll)
+        return
+
+    processes = [
+        multiprocessing.Process(
+            target=run_worker, args=(parsed_args.queue, worker_id, parsed_args.poll)
+        )
+        for worker_id in worker_ids
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+
+
+def run_broker(parsed_args: Namespace) -> None:
+    """Serve the in-memory work queue until it is interrupted.
+
+    Args:
+        parsed_args (Namespace): Parsed arguments of the `broker` command.
+    """
+    broker = WorkQueueBroker(parsed_args.host, parsed_args.port)
+    print(
+        f"Work queue broker listening on tcp://{broker.host}:{broker.port}",
+        file=sys.stderr,
+    )
+    try:
+        broker.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+def run_queued_jobs(
+    queue: WorkQueueBase,
+    jobs: Dict[str, Dict[str, Any]],
+    retries: int = 2,
+    poll: float = 1.0,
+    on_record: Optional[Callable[[str, Dict[str, Any]], Any]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """Submit jobs to the queue and collect their records, then close the queue.
+
+    Args:
+        queue (WorkQueueBase): Work queue.
+        jobs (Dict[str, Dict[str, Any]]): Jobs keyed by their IDs in the order
+                                          of submission.
+        retries (int, optional): Maximal number of repeated submissions of a failed
+                                 job. Defaults to 2.
+        poll (float, optional): Seconds between two collections of records.
+                                Defaults to 1.0.
+        on_record (Optional[Callable[[str, Dict[str, Any]], Any]], optional):
+            Callback of final records of jobs. Defaults to None.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Final records keyed by IDs of jobs.
+    """
+    for job_id, job in jobs.items():
+        queue.submit(job_id, job)
+
+    attempts = {job_id: 1 for job_id in jobs}
+    records: Dict[str, Dict[str, Any]] = {}
+    while len(records) < len(jobs):
+        collected = queue.collect()
+        if not collected:
+            # claims of crashed workers are returned to pending jobs
+            queue.requeue_stale()
+            time.sleep(poll)
+            continue
+        for job_id, record in collected:
+            if job_id in records or job_id not in jobs:
+                # duplicate record of a requeued job
+                continue
+            if "error" in record and attempts[job_id] <= retries:
+                attempts[job_id] += 1
+                queue.submit(job_id, jobs[job_id])
+                continue
+            records[job_id] = record
+            if on_record is not None:
+                on_record(job_id, record)
+
+    queue.close()
+    return records